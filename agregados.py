@@ -0,0 +1,245 @@
+import os
+import threading
+import pandas as pd
+from dados import (
+    COLUNAS_DERIVADAS,
+    COLUNAS_ORDENADAS,
+    adicionar_colunas_derivadas,
+    ler_em_blocos,
+    ler_particao,
+    ordem_exibicao,
+    particoes_armazem,
+)
+from caches import CacheLimitado
+from metricas import contar
+
+# Dimensões contadas por ano; tuplas geram contagens cruzadas
+DIMENSOES = [
+    'Tipo de Sinistro',
+    'Dia da Semana',
+    'Meio de locomocao da vitima',
+    'Faixa etaria',
+    'Tipo de Via',
+    'Bairro',
+    'Sexo',
+    'Mes do Sinistro',
+    'Nome do Mes',
+    'Dia do Sinistro',
+    'Hora do Sinistro',
+    'Turno',
+    'Turno Calculado',
+    'Tipo de vitima',
+    ('Turno', 'Tipo de Via'),
+]
+
+# Colunas numéricas guardadas como soma e contagem por ano, para médias sem varrer as linhas
+MEDIDAS = ['Idade da vitima']
+
+# Um cubo por versão do dataset e por combinação de filtros da barra lateral
+MAX_CUBOS_EM_CACHE = 32
+
+_cubos = CacheLimitado('cubos', MAX_CUBOS_EM_CACHE)
+
+# (armazém, municípios, partição) -> (impressão da partição, cubo da partição)
+_cubos_particoes = {}
+_cubos_particoes_lock = threading.Lock()
+
+
+def _chave(dimensao):
+    return dimensao if isinstance(dimensao, tuple) else (dimensao,)
+
+
+def anos_do_periodo(ano):
+    """
+    Anos de um período: um ano só ou uma tupla de anos (ex.: um intervalo filtrado).
+    """
+    return ano if isinstance(ano, tuple) else (ano,)
+
+
+def colunas_necessarias(dimensoes=DIMENSOES, medidas=MEDIDAS):
+    """
+    Colunas do extrato que o cubo usa, para ler apenas elas (as derivadas vêm da coluna de origem).
+    """
+    colunas = ['Ano']
+    for dimensao in dimensoes:
+        for coluna in _chave(dimensao):
+            coluna = COLUNAS_DERIVADAS.get(coluna, coluna)
+            if coluna not in colunas:
+                colunas.append(coluna)
+    return colunas + [coluna for coluna in medidas if coluna not in colunas]
+
+
+def ordenar_para_exibicao(serie):
+    # Blocos diferentes têm categorias diferentes e a soma volta a texto: restaura as categorias
+    # na ordem dos gráficos, como num cubo construído de uma vez
+    indice = serie.index.to_frame(index=False)
+    for coluna in indice.columns:
+        if indice[coluna].dtype == object or isinstance(indice[coluna].dtype, pd.CategoricalDtype):
+            categorias = ordem_exibicao(coluna, indice[coluna].dropna().astype(str))
+            indice[coluna] = pd.Categorical(indice[coluna].astype(str), categories=categorias, ordered=coluna in COLUNAS_ORDENADAS)
+    serie.index = pd.MultiIndex.from_frame(indice) if serie.index.nlevels > 1 else pd.Index(indice.iloc[:, 0])
+    return serie.sort_index()
+
+
+class Cubo:
+    """
+    Contagens materializadas de óbitos por Ano x dimensão.
+    Os gráficos, os cartões de KPI e a visão "Todos" são respondidos fatiando as tabelas,
+    sem varrer as linhas do dataset. Onde se pede um `ano`, vale None (todos os anos),
+    um ano ou uma tupla de anos.
+    """
+
+    def __init__(self, tabelas, medidas=None):
+        self.tabelas = tabelas
+        self.medidas = medidas or {}
+
+    @classmethod
+    def construir(cls, data, dimensoes=DIMENSOES, medidas=MEDIDAS):
+        tabelas = {('Ano',): data.groupby('Ano').size()}
+        for dimensao in dimensoes:
+            colunas = _chave(dimensao)
+            if all(coluna in data.columns for coluna in colunas):
+                tabelas[colunas] = data.groupby(['Ano', *colunas], observed=True).size()
+        somas = {
+            coluna: data.groupby('Ano')[coluna].agg(['sum', 'count'])
+            for coluna in medidas if coluna in data.columns
+        }
+        return cls(tabelas, somas)
+
+    @classmethod
+    def combinar(cls, cubos):
+        """
+        Soma cubos parciais (ex.: um por bloco de linhas) em um único cubo.
+        """
+        tabelas = {}
+        for chave in dict.fromkeys(chave for cubo in cubos for chave in cubo.tabelas):
+            partes = pd.concat([cubo.tabelas[chave] for cubo in cubos if chave in cubo.tabelas])
+            soma = partes.groupby(level=list(range(partes.index.nlevels)), observed=True).sum()
+            tabelas[chave] = soma if chave == ('Ano',) else ordenar_para_exibicao(soma)
+        medidas = {}
+        for coluna in dict.fromkeys(coluna for cubo in cubos for coluna in cubo.medidas):
+            medidas[coluna] = pd.concat([cubo.medidas[coluna] for cubo in cubos if coluna in cubo.medidas]).groupby(level=0).sum()
+        return cls(tabelas, medidas)
+
+    @classmethod
+    def construir_em_blocos(cls, blocos, dimensoes=DIMENSOES, medidas=MEDIDAS):
+        """
+        Constrói o cubo somando as contagens de cada bloco, sem manter as linhas em memória.
+        """
+        cubo = None
+        for bloco in blocos:
+            parcial = cls.construir(adicionar_colunas_derivadas(bloco), dimensoes, medidas)
+            cubo = parcial if cubo is None else cls.combinar([cubo, parcial])
+        return cubo if cubo is not None else cls.construir(pd.DataFrame({'Ano': pd.Series(dtype='int16')}), dimensoes, medidas)
+
+    def __contains__(self, dimensao):
+        return _chave(dimensao) in self.tabelas
+
+    def anos(self):
+        return [int(ano) for ano in self.tabelas[('Ano',)].index]
+
+    def total(self, ano=None):
+        por_ano = self.tabelas[('Ano',)]
+        if ano is None:
+            return int(por_ano.sum())
+        return int(por_ano[por_ano.index.isin(anos_do_periodo(ano))].sum())
+
+    def contagens(self, dimensao, ano=None, excluir=()):
+        """
+        Série de contagens da dimensão (somando todos os anos quando ano=None),
+        sem as categorias ausentes e sem os valores em `excluir`.
+        """
+        colunas = _chave(dimensao)
+        if colunas == ('Ano',):
+            serie = self.tabelas[colunas]
+            return serie if ano is None else serie[serie.index.isin(anos_do_periodo(ano))]
+
+        tabela = self.tabelas[colunas]
+        if ano is None or isinstance(ano, tuple):
+            if ano is not None:
+                tabela = tabela[tabela.index.get_level_values(0).isin(ano)]
+            niveis = list(range(1, tabela.index.nlevels))
+            serie = tabela.groupby(level=niveis, observed=True).sum()
+        elif ano in tabela.index.get_level_values(0):
+            serie = tabela.xs(ano, level=0)
+        else:
+            serie = tabela.iloc[:0].droplevel(0)
+
+        serie = serie[serie > 0]
+        if excluir:
+            if serie.index.nlevels == 1:
+                serie = serie[~serie.index.isin(excluir)]
+            else:
+                manter = pd.Series(True, index=serie.index)
+                for nivel in range(serie.index.nlevels):
+                    manter &= ~serie.index.get_level_values(nivel).isin(excluir)
+                serie = serie[manter.values]
+        return serie
+
+    def por_ano(self, dimensao, valores):
+        """
+        Série Ano -> óbitos com a dimensão em um dos `valores`, com zero nos anos sem nenhum.
+        """
+        tabela = self.tabelas[_chave(dimensao)]
+        selecionadas = tabela[tabela.index.get_level_values(1).isin(valores)]
+        serie = selecionadas.groupby(level=0).sum()
+        return serie.reindex(self.tabelas[('Ano',)].index, fill_value=0)
+
+    def quantidade(self, dimensao, valores, ano=None):
+        serie = self.contagens(dimensao, ano)
+        return int(serie[serie.index.isin(valores)].sum())
+
+    def media(self, coluna, ano=None):
+        """
+        Média da medida (ignorando valores ausentes), no ano informado ou em todos os anos.
+        """
+        somas = self.medidas[coluna]
+        if ano is not None:
+            somas = somas[somas.index.isin(anos_do_periodo(ano))]
+        quantidade = int(somas['count'].sum())
+        return float(somas['sum'].sum()) / quantidade if quantidade else float('nan')
+
+
+def cubo_da_fonte(caminho, municipios=None, anos=None):
+    """
+    Cubo direto do CSV ou do armazém, lido em blocos só com as colunas usadas e já filtrado
+    por município e ano; serve para extratos do estado inteiro que não cabem em memória.
+    """
+    return Cubo.construir_em_blocos(ler_em_blocos(caminho, colunas_necessarias(), municipios, anos))
+
+
+def cubo_do_armazem(diretorio, municipios=None):
+    """
+    Cubo do armazém particionado, somando um cubo por partição Ano/Mês. Cada cubo parcial fica em
+    memória com a impressão da partição nos metadados: depois de uma ingestão, só as partições
+    alteradas são lidas e agregadas de novo.
+    """
+    origem = (os.path.abspath(diretorio), None if municipios is None else tuple(sorted(municipios)))
+    particoes = particoes_armazem(diretorio)
+    cubos = []
+    with _cubos_particoes_lock:
+        for particao in particoes:
+            chave = (*origem, particao['arquivo'])
+            em_cache = _cubos_particoes.get(chave)
+            if em_cache is not None and em_cache[0] == particao['impressao']:
+                contar('cache_cubos_particoes_acertos')
+                cubos.append(em_cache[1])
+                continue
+            contar('cache_cubos_particoes_falhas')
+            bloco = ler_particao(diretorio, particao, colunas_necessarias(), municipios)
+            cubo = Cubo.construir(adicionar_colunas_derivadas(bloco))
+            _cubos_particoes[chave] = (particao['impressao'], cubo)
+            cubos.append(cubo)
+        # Partições que saíram do armazém não voltam a ser usadas
+        atuais = {(*origem, particao['arquivo']) for particao in particoes}
+        for chave in [chave for chave in _cubos_particoes if chave[:2] == origem and chave not in atuais]:
+            del _cubos_particoes[chave]
+    return Cubo.combinar(cubos) if cubos else Cubo.construir_em_blocos([])
+
+
+def obter_cubo(data, versao, construir=Cubo.construir):
+    """
+    Cubo da versão informada do dataset (e do filtro), guardado no cache do processo.
+    `construir` recebe `data` e permite montar o cubo por outro meio (ex.: consultas.construir_cubo_sql).
+    """
+    return _cubos.obter(versao, lambda: construir(data))
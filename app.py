@@ -1,205 +1,164 @@
-import re
 import time
+import itertools
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import maritalk
 import os
-from dotenv import load_dotenv
-from PIL import Image
-Image.MAX_IMAGE_PIXELS = None  
+from dados import CAMINHO_CSV, DIRETORIO_ARMAZEM, caminho_snapshot, carregar_dados, impressao_digital
+from armazem import resumo_armazem
+from agregados import Cubo, cubo_do_armazem, obter_cubo
+from consultas import BACKEND_CONSULTAS, construir_cubo_sql, duckdb_disponivel
+from graficos import obter_figura
+from mapa import NIVEIS_ZOOM, ZOOM_PADRAO, obter_mapa
+from explorador import TAMANHOS_PAGINA, obter_explorador
+from filtros import DIMENSOES_FILTRO, criar_filtro, obter_indice, rotulo_filtro
+from kpis import KPIS, obter_tabela_kpis, periodo_anterior
+from exportacao import MAX_BYTES_DOWNLOAD, FORMATOS_EXPORTACAO, cabe_no_download, caminho_exportacao, exportar, nome_arquivo
+from metricas import medir, obter_metricas
+from recursos import carregar_variaveis_ambiente, miniatura
+from contextos import (
+    contexto_bairro_mais_obitos,
+    contexto_comparativo_dezembro_janeiro,
+    contexto_comparativo_obitos_por_mes,
+    contexto_dia_mes_mais_acidentes,
+    contexto_faixa_etaria_mais_afetada,
+    contexto_horario_mais_obitos,
+    contexto_idade_media_vitimas,
+    contexto_media_obitos_por_bairro,
+    contexto_meio_locomocao_mais_obitos,
+    contexto_mes_mais_acidentes,
+    contexto_obitos_2021,
+    contexto_obitos_por_dia_semana,
+    contexto_periodo_dia_mais_obitos,
+    contexto_proporcao_obitos_por_tipo_vitima,
+    contexto_sexo_mais_acidentes,
+    contexto_tipo_via_mais_obitos,
+    contexto_tipos_acidentes_mais_comuns,
+    obter_frequencias,
+    pergunta_para_funcao,
+)
+from roteamento import montar_prompt as montar_prompt_roteado, rotear
+from assistente import MODELO_MARITACA, StreamingIndisponivel, iniciar_pre_busca, obter_cache_respostas, obter_cliente_maritaca
+
+# Início da execução do script, para o tempo total da página (ver o painel de depuração)
+inicio_execucao = time.perf_counter()
+
+# Carregar variáveis de ambiente do arquivo .env (uma vez por processo, só se ele existir)
+carregar_variaveis_ambiente()
+
+# Carregar a chave da API Maritaca: secrets do Streamlit ou, para uso local (e nos testes), a variável de ambiente
+if st.secrets.load_if_toml_exists() and "MARITACA_API_KEY" in st.secrets:
+    MARITACA_API_KEY = st.secrets["MARITACA_API_KEY"]
+else:
+    MARITACA_API_KEY = os.getenv("MARITACA_API_KEY")
+
+# Exibir a resposta da IA token a token (MARITACA_STREAMING=0 volta para a chamada bloqueante)
+RESPOSTA_EM_STREAMING = os.getenv("MARITACA_STREAMING", "1") != "0"
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Pré-calcular em segundo plano as respostas de todas as perguntas (MARITACA_PRE_BUSCA=1 ativa).
+# Desligada por padrão: cada versão nova do dataset custa uma chamada paga por pergunta e ano
+PRE_BUSCA_RESPOSTAS = os.getenv("MARITACA_PRE_BUSCA", "0") == "1"
 
-# Carregar a chave da API Maritaca
-MARITACA_API_KEY = st.secrets["MARITACA_API_KEY"] # Para armazenar a chave no streamlit
-#MARITACA_API_KEY = os.getenv("MARITACA_API_KEY") # Para uso local
+# Intervalo, em segundos, entre as atualizações da barra de progresso da pré-busca
+INTERVALO_PROGRESSO_PRE_BUSCA = 2
+
+# Resposta para perguntas livres que não correspondem a nenhum contexto: nada é enviado à IA
+SEM_CONTEXTO = "Não encontrei dados para essa pergunta. Tente reformulá-la ou escolha uma das perguntas da lista."
+
+# Painel de depuração com os tempos e contadores na sidebar (ou ?depuracao=1 na URL)
+PAINEL_DEPURACAO = os.getenv("INFOSIGA_DEPURACAO") == "1"
+
+# Arquivo JSON lines que recebe um retrato das métricas ao fim de cada execução completa
+METRICAS_JSONL = os.getenv("INFOSIGA_METRICAS_JSONL")
 
 # Configuração da página
 st.set_page_config(page_title='Análise de Óbitos em Franca/SP', layout='wide', page_icon=':bar_chart:')
 
-# Função para carregar os dados
+# Usa o armazém particionado (ver armazem.py) quando existir; senão, o CSV do repositório
+# INFOSIGA_DADOS aponta para outro extrato ou armazém (ex.: os extratos ampliados do benchmark.py)
+CAMINHO_DADOS = os.getenv("INFOSIGA_DADOS") or (DIRETORIO_ARMAZEM if resumo_armazem(DIRETORIO_ARMAZEM) else CAMINHO_CSV)
+resumo_dados = resumo_armazem(CAMINHO_DADOS)
+DATA_ATUALIZACAO_CSV = "18/11/2024"
+
+# Município analisado: extratos do estado inteiro são lidos em blocos, só com as linhas dele
+MUNICIPIOS_ANALISADOS = [os.getenv("INFOSIGA_MUNICIPIO", "FRANCA")]
+
+# Função para carregar os dados (tipados e em cache por processo, ver dados.py)
+@medir('load_data')
 def load_data():
-    data = pd.read_csv('obitos_final.csv', delimiter=';')
-    return data
+    return carregar_dados(CAMINHO_DADOS, municipios=MUNICIPIOS_ANALISADOS)
 
 data = load_data()
 
-# Funções de contexto para cada pergunta
-def contexto_obitos_2021(data):
-    total_obitos = data[data['Ano'] == 2021].shape[0]
-    contexto = f"No ano de 2021, ocorreram {total_obitos} óbitos em Franca."
-    return contexto
-
-def contexto_faixa_etaria_mais_afetada(data):
-    faixa_etaria_mais_afetada = data['Faixa etaria'].value_counts().idxmax()
-    total = data['Faixa etaria'].value_counts().max()
-    contexto = f"A faixa etária mais afetada por acidentes é entre {faixa_etaria_mais_afetada}, com {total} óbitos."
-    return contexto
-
-def contexto_bairro_mais_obitos(data):
-    data_bairro = data[data['Bairro'] != 'Bairro não identificado']
-    if data_bairro.empty:
-        contexto = "Não há dados disponíveis sobre os bairros identificados."
+# Cubo de contagens por Ano x dimensão, construído uma vez por versão do dataset
+versao_dados = impressao_digital(CAMINHO_DADOS, MUNICIPIOS_ANALISADOS)
+snapshot_dados = caminho_snapshot(CAMINHO_DADOS, versao_dados, municipios=MUNICIPIOS_ANALISADOS)
+with medir('cubo'):
+    if BACKEND_CONSULTAS == "duckdb" and duckdb_disponivel() and os.path.exists(snapshot_dados):
+        # Agregações em SQL sobre o snapshot Parquet (ver consultas.py); sem DuckDB, segue com o pandas
+        cubo_dados = obter_cubo(snapshot_dados, f"duckdb:{versao_dados}", construir_cubo_sql)
+    elif os.path.isdir(CAMINHO_DADOS):
+        # Armazém particionado: depois de uma ingestão, só as partições alteradas são agregadas de novo
+        cubo_dados = obter_cubo(data, versao_dados, lambda data: cubo_do_armazem(CAMINHO_DADOS, MUNICIPIOS_ANALISADOS))
     else:
-        bairro_mais_obitos = data_bairro['Bairro'].value_counts().idxmax()
-        total = data_bairro['Bairro'].value_counts().max()
-        contexto = f"O bairro com mais óbitos é {bairro_mais_obitos}, com {total} óbitos."
-    return contexto
-
-def contexto_tipo_via_mais_obitos(data):
-    tipo_via_mais_obitos = data['Tipo de Via'].value_counts().idxmax()
-    total = data['Tipo de Via'].value_counts().max()
-    contexto = f"O tipo de via com mais óbitos são as {tipo_via_mais_obitos}, com {total} óbitos."
-    return contexto
-
-def contexto_obitos_por_dia_semana(data):
-    obitos_por_dia = data['Dia da Semana'].value_counts().to_dict()
-    contexto = "Número de óbitos por dia da semana:\n"
-    for dia, total in obitos_por_dia.items():
-        contexto += f"{dia}: {total} óbitos\n"
-    return contexto
-
-def contexto_horario_mais_obitos(data):
-    horario_mais_obitos = data['Hora do Sinistro'].value_counts().idxmax()
-    total = data['Hora do Sinistro'].value_counts().max()
-    contexto = f"O horário com mais óbitos é às {horario_mais_obitos} horas, com {total} óbitos."
-    return contexto
-
-def contexto_sexo_mais_acidentes(data):
-    sexo_mais_acidentes = data['Sexo'].value_counts().idxmax()
-    total = data['Sexo'].value_counts().max()
-    contexto = f"O sexo com mais acidentes é {sexo_mais_acidentes}, com {total} ocorrências."
-    return contexto
-
-def contexto_mes_mais_acidentes(data):
-    mes_mais_acidentes = data['Mes do Sinistro'].value_counts().idxmax()
-    total = data['Mes do Sinistro'].value_counts().max()
-    contexto = f"O mês com mais acidentes é o mês {mes_mais_acidentes}, com {total} acidentes."
-    return contexto
-
-def contexto_dia_mes_mais_acidentes(data):
-    dia_mes_mais_acidentes = data['Dia do Sinistro'].value_counts().idxmax()
-    total = data['Dia do Sinistro'].value_counts().max()
-    contexto = f"O dia do mês com mais acidentes é o dia {dia_mes_mais_acidentes}, com {total} acidentes."
-    return contexto
-
-def contexto_periodo_dia_mais_obitos(data):
-    periodo_mais_obitos = data['Turno'].value_counts().idxmax()
-    total = data['Turno'].value_counts().max()
-    contexto = f"O período do dia com mais óbitos é o período da {periodo_mais_obitos}, com {total} óbitos."
-    return contexto
-
-def contexto_meio_locomocao_mais_obitos(data):
-    meio_locomocao_mais_obitos = data['Meio de locomocao da vitima'].value_counts().idxmax()
-    total = data['Meio de locomocao da vitima'].value_counts().max()
-    contexto = f"O meio de locomoção com mais óbitos é {meio_locomocao_mais_obitos}, com {total} óbitos."
-    return contexto
-
-def contexto_tipos_acidentes_mais_comuns(data):
-    tipos_acidentes = data['Tipo de Sinistro'].value_counts().head(5).to_dict()
-    contexto = "Os tipos de acidentes mais comuns são:\n"
-    for tipo, total in tipos_acidentes.items():
-        contexto += f"{tipo}: {total} ocorrências\n"
-    return contexto
-
-def contexto_comparativo_obitos_por_mes(data):
-    obitos_por_mes_ano = data.groupby(['Mes do Sinistro', 'Ano']).size().unstack().T.fillna(0)
-    
-    picos_obitos = {}
-    for mes, anos in obitos_por_mes_ano.iterrows():
-        mes_max = anos.idxmax()  
-        picos_obitos[mes] = f"{mes_max} - {int(anos[mes_max])} óbitos"
-    
-    contexto = "Meses com os maiores picos de óbitos por ano:\n"
-    for mes, resultado in picos_obitos.items():
-        contexto += f"{mes}: {resultado}\n"
-    
-    return contexto
-
-def contexto_media_obitos_por_bairro(data):
-    obitos_por_bairro = data.groupby('Bairro').size()
-    media_obitos = round(obitos_por_bairro.mean())
-    contexto = f"A média de óbitos por bairro é de {media_obitos} óbitos por bairro."
-    return contexto
-
-def contexto_proporcao_obitos_por_tipo_vitima(data):
-    tipos_vitima = data['Tipo de vitima'].value_counts(normalize=True) * 100
-    contexto = "Proporção de óbitos por tipo de vítima (em %):\n"
-    for tipo, proporcao in tipos_vitima.items():
-        contexto += f"{tipo}: {proporcao:.2f}%\n"
-    return contexto
-
-def contexto_idade_media_vitimas(data):
-    idade_media = round(data['Idade da vitima'].mean())
-    contexto = f"A idade média das vítimas de acidentes de trânsito é de {idade_media} anos."
-    return contexto
-
-def contexto_comparativo_dezembro_janeiro(data):
-    meses_comparados = data[data['Mes do Sinistro'].isin([12, 1])]
-    obitos_dezembro_janeiro = meses_comparados.groupby(['Ano', 'Mes do Sinistro']).size().unstack(fill_value=0)
-    if obitos_dezembro_janeiro.empty:
-        return "Não há dados suficientes para comparar os óbitos entre dezembro e janeiro nos anos de 2019 a 2023."
-    
-    contexto = "Comparativo de óbitos entre dezembro e janeiro (2019-2023):\n"
-    resumo = [] 
-    for ano, meses in obitos_dezembro_janeiro.iterrows():
-        dezembro = meses[12]
-        janeiro = meses[1]
-        delta = janeiro - dezembro
-        contexto += f"Ano: {ano} - Dezembro: {dezembro} óbitos, Janeiro: {janeiro} óbitos - Diferença: {delta} óbitos\n"
-        resumo.append(f"{ano}: {delta} óbitos")
-
-    insight = """
-    Embora os meses de dezembro e janeiro sejam frequentemente associados a festividades e férias, os dados indicam uma variação nos óbitos ao longo dos anos. 
-    Nos últimos dois anos (2022 e 2023), houve uma leve redução, embora não muito expressiva. Em contraste, 2020 e 2021 registraram um aumento no número de óbitos. 
-    Esse padrão sugere uma tendência de estabilização nas ocorrências de óbitos durante esse período, com uma diminuição gradual ao longo dos últimos anos, apesar das 
-    festividades típicas desse período.
-    """
-    resumo_sucinto = f"\nResumo: {', '.join(resumo)}"
-    return contexto + insight + resumo_sucinto
-
-def obter_resposta_maritaca_ai(pergunta, data):
-    # Gerar o contexto com base na pergunta
-    contexto = pergunta_para_funcao.get(pergunta)(data)
-    # Preparar o prompt para a Maritaca AI
-    prompt = f"{contexto}\n\nCom base nas informações acima, responda à seguinte pergunta:\n{pergunta}\nResposta:"
+        cubo_dados = obter_cubo(data, versao_dados)
+
+# Os contextos de cada pergunta ficam em contextos.py, registrados em pergunta_para_funcao;
+# roteamento.py escolhe quais deles entram no prompt de uma pergunta livre
+def montar_prompt(pergunta, data, rotas=None):
+    return montar_prompt_roteado(pergunta, data, rotas)
+
+def obter_resposta_maritaca_ai(pergunta, data, rotas=None):
+    prompt = montar_prompt(pergunta, data, rotas)
+    if prompt is None:
+        return SEM_CONTEXTO
+
+    # A resposta depende apenas do modelo e do prompt: reaproveitar respostas já obtidas
+    cache_respostas = obter_cache_respostas()
+    resposta_em_cache = cache_respostas.obter(MODELO_MARITACA, prompt)
+    if resposta_em_cache is not None:
+        return resposta_em_cache
 
     # Fazer a chamada para a Maritaca AI
     try:
-        # Configurar o modelo Maritaca AI
-        model = maritalk.MariTalk(
-            key=MARITACA_API_KEY,
-            model="sabia-3"
-        )
-
-        response = model.generate(prompt, max_tokens=500)
-        answer = response["answer"]
+        # Cliente único por processo, com conexões reaproveitadas, timeouts e novas tentativas
+        cliente = obter_cliente_maritaca(MARITACA_API_KEY, MODELO_MARITACA)
+        answer = cliente.gerar(prompt, max_tokens=500)
 
+        cache_respostas.salvar(MODELO_MARITACA, prompt, answer)
         return answer
     except Exception as e:
         return f"Erro ao conectar com a API: {e}"
-    
-pergunta_para_funcao = {
-    "Quantos óbitos ocorreram em 2021?": contexto_obitos_2021,
-    "Qual a faixa etária mais afetada por acidentes?": contexto_faixa_etaria_mais_afetada,
-    "Em qual bairro ocorreram mais óbitos?": contexto_bairro_mais_obitos,
-    "Qual o tipo de via com mais óbitos?": contexto_tipo_via_mais_obitos,
-    "Quantos óbitos ocorreram em cada dia da semana?": contexto_obitos_por_dia_semana,
-    "Qual o horário com mais óbitos?": contexto_horario_mais_obitos,
-    "Qual o sexo com mais acidentes?": contexto_sexo_mais_acidentes,
-    "Qual o mês com mais acidentes?": contexto_mes_mais_acidentes,
-    "Qual o dia do mês com mais acidentes?": contexto_dia_mes_mais_acidentes,
-    "Qual o período do dia com mais óbitos?": contexto_periodo_dia_mais_obitos,
-    "Qual o meio de locomoção com mais óbitos?": contexto_meio_locomocao_mais_obitos,
-    "Quais os tipos de acidentes mais comuns?": contexto_tipos_acidentes_mais_comuns,
-    "Em quais meses ocorrem mais óbitos em comparação com outros anos?": contexto_comparativo_obitos_por_mes,
-    "Qual a média de óbitos por bairro?": contexto_media_obitos_por_bairro,
-    "Qual a proporção de óbitos por tipo de vítima (condutor, passageiro, pedestre)?": contexto_proporcao_obitos_por_tipo_vitima,
-    "Qual a idade média das vítimas de acidentes de trânsito?": contexto_idade_media_vitimas,
-    "Como foi o comparativo de óbitos entre dezembro e janeiro nos anos de 2019 a 2023?": contexto_comparativo_dezembro_janeiro
-}
+
+# Versão em streaming: gera a resposta em partes, à medida que os tokens chegam
+def obter_resposta_maritaca_ai_stream(pergunta, data, rotas=None):
+    prompt = montar_prompt(pergunta, data, rotas)
+    if prompt is None:
+        yield SEM_CONTEXTO
+        return
+
+    cache_respostas = obter_cache_respostas()
+    resposta_em_cache = cache_respostas.obter(MODELO_MARITACA, prompt)
+    if resposta_em_cache is not None:
+        yield resposta_em_cache
+        return
+
+    partes = []
+    try:
+        cliente = obter_cliente_maritaca(MARITACA_API_KEY, MODELO_MARITACA)
+        try:
+            for parte in cliente.gerar_stream(prompt, max_tokens=500):
+                partes.append(parte)
+                yield parte
+        except StreamingIndisponivel:
+            # Endpoint sem suporte a streaming: volta para a chamada bloqueante
+            partes = [cliente.gerar(prompt, max_tokens=500)]
+            yield partes[0]
+    except Exception as e:
+        separador = "\n\n" if partes else ""
+        yield f"{separador}Erro ao conectar com a API: {e}"
+        return
+
+    cache_respostas.salvar(MODELO_MARITACA, prompt, "".join(partes))
 
 # Sidebar 
 st.sidebar.header("Informações Importantes")
@@ -228,95 +187,170 @@ with st.sidebar.expander("O que você precisa saber sobre os dados disponíveis
     )
 st.sidebar.markdown("---") 
 
-# Sidebar para filtro de ano
-st.sidebar.header("Filtrar por Ano")
-anos_disponiveis = [2019, 2020, 2021, 2022, 2023]
-ano_selecionado = st.sidebar.selectbox("Escolha o Ano", ["Todos"] + [str(ano) for ano in anos_disponiveis], index=0)
-
-# Carregar os dados e filtrar entre os anos de 2019 a 2023
-data = data[data['Ano'].isin([2019, 2020, 2021, 2022, 2023])]
-
-# Filtrar os dados de acordo com o ano selecionado
-if ano_selecionado != "Todos":
-    ano_selecionado = int(ano_selecionado)
-    data_filtrada = data.loc[data['Ano'] == ano_selecionado]
+# Sidebar com os filtros: período e dimensões, combinados pelos bitmaps de filtros.py
+st.sidebar.header("Filtros")
+# Anos descobertos nos metadados das partições (ou nos próprios dados, sem armazém)
+anos_disponiveis = resumo_dados.anos if resumo_dados else cubo_dados.anos()
+indice_filtros = obter_indice(data, versao_dados)
+if len(anos_disponiveis) > 1:
+    ano_inicial, ano_final = st.sidebar.select_slider("Período", anos_disponiveis, value=(anos_disponiveis[0], anos_disponiveis[-1]))
 else:
-    data_filtrada = data
+    ano_inicial = ano_final = anos_disponiveis[0]
+selecoes = {
+    coluna: st.sidebar.multiselect(rotulo, indice_filtros.valores(coluna), placeholder="Todos")
+    for coluna, rotulo in DIMENSOES_FILTRO.items() if indice_filtros.valores(coluna)
+}
 
-# Definir o ano anterior para cálculo dos deltas
-if ano_selecionado != "Todos" and ano_selecionado > 2019:
-    ano_anterior = ano_selecionado - 1
-    dados_ano_anterior = data[data['Ano'] == ano_anterior]
+# Período no formato do cubo: None (todos os anos), um ano ou a tupla dos anos do intervalo
+anos_periodo = tuple(ano for ano in anos_disponiveis if ano_inicial <= ano <= ano_final)
+if len(anos_periodo) == len(anos_disponiveis):
+    ano_cubo = None
+elif len(anos_periodo) == 1:
+    ano_cubo = anos_periodo[0]
 else:
-    ano_anterior = None
-    dados_ano_anterior = pd.DataFrame()
-
-# Adicionar checkbox para exibir os dados brutos
-exibir_dados_brutos = st.sidebar.checkbox("Exibir Dados Brutos")
+    ano_cubo = anos_periodo
+filtro = criar_filtro(None if ano_cubo is None else (ano_inicial, ano_final), selecoes)
+
+# Com filtros de dimensão, o cubo (de todos os anos, para os deltas) vem só das linhas selecionadas
+filtro_dimensoes = filtro._replace(anos=None)
+if filtro_dimensoes.valores:
+    versao_filtro = f"{versao_dados}-{rotulo_filtro(filtro_dimensoes)}"
+    with medir('cubo_filtro'):
+        cubo = obter_cubo(data, versao_filtro, lambda data: Cubo.construir(indice_filtros.filtrar(data, filtro_dimensoes)))
+else:
+    versao_filtro = versao_dados
+    cubo = cubo_dados
+
+with medir('filtro'):
+    data_filtrada = indice_filtros.filtrar(data, filtro)
+
+# Período anterior de mesma duração (ano ou intervalo) para cálculo dos deltas
+ano_anterior = periodo_anterior(ano_cubo, anos_disponiveis)
+
+# Download dos dados filtrados: o arquivo só é gerado quando pedido, uma vez por (filtro, formato)
+@st.fragment
+@medir('secao_download')
+def secao_download(data_filtrada, filtro, versao):
+    id_formato = st.selectbox(
+        "Formato do arquivo",
+        list(FORMATOS_EXPORTACAO),
+        format_func=lambda id_formato: FORMATOS_EXPORTACAO[id_formato].rotulo,
+    )
+    caminho = caminho_exportacao(id_formato, versao, filtro)
+    # O arquivo só é lido para o botão de download depois que a sessão o pede, não a cada rerun
+    if st.session_state.get("arquivo_download") != caminho:
+        if not st.button("Preparar arquivo para download"):
+            return
+        if not os.path.exists(caminho):
+            try:
+                with st.spinner("Gerando o arquivo..."), medir(f"exportar:{id_formato}"):
+                    caminho = exportar(data_filtrada, id_formato, versao, filtro)
+            except (OSError, ValueError) as erro:
+                st.warning(f"Não foi possível gerar o arquivo: {erro}")
+                return
+        st.session_state["arquivo_download"] = caminho
+    if not cabe_no_download(caminho):
+        st.warning(f"O arquivo passa de {MAX_BYTES_DOWNLOAD // (1024 * 1024)} MB. Selecione um filtro menor para baixá-lo.")
+        return
+    with open(caminho, "rb") as arquivo:
+        baixado = st.download_button(
+            label="Dados disponíveis para download",
+            data=arquivo,
+            file_name=nome_arquivo(id_formato, filtro),
+            mime=FORMATOS_EXPORTACAO[id_formato].mime,
+        )
+    if baixado:
+        st.session_state.pop("arquivo_download", None)
 
-# Função para converter DataFrame em CSV
-@st.cache_data
-def convert_df(df):
-    return df.to_csv().encode("utf-8")
+with st.sidebar:
+    secao_download(data_filtrada, rotulo_filtro(filtro), versao_dados)
 
-csv = convert_df(data_filtrada)
+st.sidebar.header("Assistente de IA")
 
-# Botão de download na sidebar
-st.sidebar.download_button(
-    label="Dados disponíveis para download em CSV",
-    data=csv,
-    file_name="obitos_final.csv",
-    mime="text/csv",
-)    
+# Pré-busca das respostas de cada (pergunta, ano), disparada uma vez por versão do dataset
+def montar_prompt_por_ano(pergunta, ano):
+    return montar_prompt(pergunta, obter_frequencias(cubo_dados, versao_dados, None if ano == "Todos" else ano))
 
-st.sidebar.header("Assistente de IA")
-pergunta_selecionada = st.sidebar.selectbox(
-    "Selecione uma pergunta:",
-    [
-        "Selecione uma pergunta...",  
-        "Quantos óbitos ocorreram em 2021?",
-        "Como foi o comparativo de óbitos entre dezembro e janeiro nos anos de 2019 a 2023?",
-        "Qual a faixa etária mais afetada por acidentes?",
-        "Em qual bairro ocorreram mais óbitos?",
-        "Qual a proporção de óbitos por tipo de vítima (condutor, passageiro, pedestre)?",
-        "Qual o tipo de via com mais óbitos?",
-        "Quantos óbitos ocorreram em cada dia da semana?",
-        "Qual o horário com mais óbitos?",
-        "Qual o sexo com mais acidentes?",
-        "Qual o mês com mais acidentes?",
-        "Qual o dia do mês com mais acidentes?",
-        "Qual o período do dia com mais óbitos?",
-        "Qual o meio de locomoção com mais óbitos?",
-        "Quais os tipos de acidentes mais comuns?",
-        "Em quais meses ocorrem mais óbitos em comparação com outros anos?", 
-        "Qual a média de óbitos por bairro?",  
-        "Qual a idade média das vítimas de acidentes de trânsito?", 
-    ]
-)
+def progresso_pre_busca(pre_busca):
+    progresso = pre_busca.progresso()
+    if not pre_busca.concluida:
+        st.progress(
+            progresso['concluidas'] / progresso['total'],
+            text=f"Preparando respostas: {progresso['concluidas']}/{progresso['total']}",
+        )
 
-if st.sidebar.button("Enviar"):
-    with st.sidebar:
+if PRE_BUSCA_RESPOSTAS and MARITACA_API_KEY:
+    pre_busca = iniciar_pre_busca(
+        versao_dados,
+        obter_cliente_maritaca(MARITACA_API_KEY, MODELO_MARITACA),
+        [(pergunta, ano) for ano in ["Todos"] + anos_disponiveis for pergunta in pergunta_para_funcao],
+        montar_prompt_por_ano,
+    )
+    if not pre_busca.concluida:
+        with st.sidebar:
+            # Enquanto a pré-busca roda, só a barra de progresso é atualizada periodicamente
+            st.fragment(progresso_pre_busca, run_every=INTERVALO_PROGRESSO_PRE_BUSCA)(pre_busca)
+
+# Interagir com o assistente (escolher a pergunta, enviar) reexecuta só esta seção
+@st.fragment
+@medir('secao_assistente')
+def secao_assistente(ano, versao):
+    # Tabelas de frequência do filtro, compartilhadas pelos contextos do assistente
+    frequencias_filtro = obter_frequencias(cubo, versao, ano)
+
+    # As opções vêm do registro de contextos: uma pergunta nova em contextos.py aparece aqui
+    pergunta_selecionada = st.selectbox(
+        "Selecione uma pergunta:",
+        ["Selecione uma pergunta..."] + list(pergunta_para_funcao),
+    )
+    pergunta_livre = st.text_input("Ou escreva a sua pergunta:", placeholder="Ex.: Quantos pedestres morreram à noite?")
+
+    if st.button("Enviar"):
+        # O texto livre, quando preenchido, tem preferência sobre a pergunta da lista
+        pergunta = pergunta_livre.strip() or pergunta_selecionada
+        if pergunta not in pergunta_para_funcao and not pergunta_livre.strip():
+            st.write("Por favor, selecione ou escreva uma pergunta.")
+            return
+        rotas = rotear(pergunta)
+        if not rotas:
+            st.write(SEM_CONTEXTO)
+            return
         placeholder = st.empty()
         placeholder.write("Aguarde, processando a resposta...") 
-        if pergunta_selecionada:
-            resposta_ia = obter_resposta_maritaca_ai(pergunta_selecionada, data_filtrada)
-            placeholder.empty() 
+        if RESPOSTA_EM_STREAMING:
+            partes = obter_resposta_maritaca_ai_stream(pergunta, frequencias_filtro, rotas)
+            # Mantém o aviso de espera até o primeiro token chegar
+            primeira_parte = next(partes, "")
+            placeholder.empty()
             st.write("**Resposta da IA:**")
-            st.write(resposta_ia)
+            st.write_stream(itertools.chain([primeira_parte], partes))
         else:
+            resposta_ia = obter_resposta_maritaca_ai(pergunta, frequencias_filtro, rotas)
             placeholder.empty() 
-            st.write("Por favor, selecione uma pergunta.")
+            st.write("**Resposta da IA:**")
+            st.write(resposta_ia)
+        if rotas != [pergunta]:
+            st.caption("Respondida com os dados de: " + "; ".join(rotas))
+        estatisticas_cache = obter_cache_respostas().estatisticas()
+        st.caption(f"Cache de respostas: {estatisticas_cache['acertos']} acertos, {estatisticas_cache['falhas']} falhas")
+
+with st.sidebar:
+    secao_assistente(ano_cubo, versao_filtro)
 
 
 col1, col2 = st.columns([0.15, 0.80])  
 
 with col1:
-    st.image('images/escudo.png', use_column_width=True)     
+    # Miniatura gerada uma vez em .cache/ (ver recursos.py): a imagem original não é decodificada a cada execução
+    escudo = miniatura('images/escudo.png')
+    if escudo is not None:
+        st.image(escudo, use_column_width=True)
 with col2:
-    st.title("*Estatísticas de Óbitos em Acidentes de Trânsito em Franca*", help="Dados de 2019 a 2023")
+    st.title("*Estatísticas de Óbitos em Acidentes de Trânsito em Franca*", help=f"Dados de {anos_disponiveis[0]} a {anos_disponiveis[-1]}")
     st.markdown(":bar_chart: **Fonte dos Dados Brutos**: [Infosiga SP](https://www.infosiga.sp.gov.br/?name=identificacao4&contextId=8a80809939587c0901395881fc2b0004)")
     st.markdown(":computer: **Código Fonte**: [GitHub](https://github.com/gabriellmelo/analise-exploratoria-tcc)")
-    st.markdown(":calendar: **Data de Atualização**: 18/11/2024")
+    data_atualizacao = resumo_dados.ultima_atualizacao.strftime("%d/%m/%Y") if resumo_dados else DATA_ATUALIZACAO_CSV
+    st.markdown(f":calendar: **Data de Atualização**: {data_atualizacao}")
     
     st.markdown("---")
 
@@ -332,234 +366,213 @@ st.markdown("O projeto está alinhado com os [Objetivos de Desenvolvimento Suste
 # Insights Section
 st.subheader(":bar_chart: Visão Comparativa dos Óbitos por Acidente de Trânsito")
 
-col1, col2, col3 = st.columns(3)
+@st.fragment
+@medir('linha_indicadores')
+def linha_indicadores(ano, anterior, versao):
+    # Tabela Ano x KPI calculada uma vez por (dataset, filtro), ver kpis.py
+    tabela_kpis = obter_tabela_kpis(cubo, versao, anos_disponiveis)
+    ids_kpis = [id_kpi for id_kpi in KPIS if id_kpi in tabela_kpis]
+    for coluna, id_kpi in zip(st.columns(len(ids_kpis)), ids_kpis):
+        definicao = KPIS[id_kpi]
+        valor = tabela_kpis.valor(id_kpi, ano)
+        tendencia = tabela_kpis.tendencia(id_kpi, ano)
+        ajuda = definicao.ajuda if tendencia is None else f"{definicao.ajuda}. Tendência no período: {tendencia:+.1f} por ano"
+
+        # Comparando com o período anterior de mesma duração
+        if anterior is not None:
+            delta = tabela_kpis.delta(id_kpi, ano, anterior)
+            variacao = tabela_kpis.variacao_percentual(id_kpi, ano, anterior)
+            percentual = "" if variacao is None else f" ({variacao:+.0f}%)"
+            referencia = "ano anterior" if isinstance(anterior, int) else "período anterior"
+            coluna.metric(definicao.rotulo, valor, delta=f"{delta}{percentual} comparado ao {referencia}", help=ajuda)
+        else:
+            with coluna:
+                st.metric(definicao.rotulo, valor, help=ajuda)
+                st.markdown("<div style='color:orange; font-size: 14px; margin-top: -15px;'>Sem comparação</div>", unsafe_allow_html=True)
+
+linha_indicadores(ano_cubo, ano_anterior, versao_filtro)
+
+# O checkbox fica dentro da seção: marcá-lo reexecuta só a exibição dos dados brutos
+@st.fragment
+@medir('secao_dados_brutos')
+def secao_dados_brutos(data_filtrada, ano, versao):
+    # Exibir os dados brutos se o checkbox for marcado
+    if not st.checkbox("Exibir Dados Brutos"):
+        return
+    st.subheader(":clipboard: Dados Brutos")
+    # Paginação no servidor (ver explorador.py): só a página visível é enviada ao navegador
+    explorador = obter_explorador(data_filtrada, versao, ano)
+    colunas = st.multiselect("Colunas", list(data_filtrada.columns), default=list(data_filtrada.columns))
+    busca_col, ordem_col, sentido_col, tamanho_col = st.columns([0.4, 0.3, 0.15, 0.15])
+    busca = busca_col.text_input("Buscar", placeholder="Ex.: CENTRO, PEDESTRE")
+    ordenar_por = ordem_col.selectbox("Ordenar por", ["Ordem original"] + list(data_filtrada.columns))
+    crescente = sentido_col.radio("Sentido", ["Crescente", "Decrescente"]) == "Crescente"
+    tamanho = tamanho_col.selectbox("Linhas por página", TAMANHOS_PAGINA)
+    numero = st.number_input("Página", min_value=1, value=1, step=1)
+
+    pagina = explorador.pagina(
+        numero,
+        tamanho,
+        colunas or list(data_filtrada.columns),
+        None if ordenar_por == "Ordem original" else ordenar_por,
+        crescente,
+        busca.strip(),
+    )
+    st.dataframe(pagina.dados, use_container_width=True)
+    st.caption(f"Página {pagina.numero} de {pagina.total_paginas} ({pagina.total_linhas} linhas)")
 
-# Contagem total de óbitos
-total_obitos = len(data_filtrada)
+secao_dados_brutos(data_filtrada, ano_cubo, versao_filtro)
 
-# Exibir os dados brutos se o checkbox for marcado
-if exibir_dados_brutos:
-    st.subheader(":clipboard: Dados Brutos")
-    st.write(data_filtrada)
+# Figuras montadas uma vez por (gráfico, ano, versão do dataset) e reaproveitadas entre reruns (ver graficos.py)
+def figura(id_grafico, ano, versao):
+    return obter_figura(id_grafico, cubo, versao, ano)
 
-# Comparando com o ano anterior
-if ano_anterior is not None and not dados_ano_anterior.empty:
-    total_obitos_anterior = len(dados_ano_anterior)
-    delta_obitos = total_obitos - total_obitos_anterior
-    col1.metric(":coffin: Total de Óbitos", total_obitos, delta=f"{delta_obitos} comparado ao ano anterior", help="Total de óbitos")
-else:
+@st.fragment
+@medir('linha_graficos_acidentes_tipo')
+def linha_graficos_acidentes_tipo(ano, versao):
+    col1, col2 = st.columns(2)
+    # Gráfico 1: Quantidade de Acidentes por Ano 
     with col1:
-        st.metric(":coffin: Total de Óbitos", total_obitos)
-        st.markdown("<div style='color:orange; font-size: 14px; margin-top: -15px;'>Sem comparação</div>", unsafe_allow_html=True)
-
-# Óbitos por Motoristas e Condutores
-motoristas_condutores = data_filtrada[data_filtrada['Tipo de vitima'].isin(['CONDUTOR', 'PASSAGEIRO'])]
-total_motoristas_condutores = len(motoristas_condutores)
+        st.info("📊 Este gráfico mostra a quantidade de acidentes ao longo dos anos.")
+        st.plotly_chart(figura('acidentes_por_ano', ano, versao), use_container_width=True)
 
-if ano_anterior is not None and not dados_ano_anterior.empty:
-    motoristas_condutores_anterior = dados_ano_anterior[dados_ano_anterior['Tipo de vitima'].isin(['CONDUTOR', 'PASSAGEIRO'])]
-    delta_motoristas_condutores = total_motoristas_condutores - len(motoristas_condutores_anterior)
-    col2.metric(":car: Óbitos por Motoristas e Condutores", total_motoristas_condutores, delta=f"{delta_motoristas_condutores} comparado ao ano anterior", help="Óbitos envolvendo motoristas e condutores")
-else:
+    # Gráfico 2: Distribuição de Óbitos por Tipo de Sinistro
     with col2:
-        st.metric(":car: Óbitos por Motoristas e Condutores", total_motoristas_condutores)
-        st.markdown("<div style='color:orange; font-size: 14px; margin-top: -15px;'>Sem comparação</div>", unsafe_allow_html=True)
+        st.info("🚧 Este gráfico exibe a distribuição de óbitos por tipo de acidente.")
+        st.plotly_chart(figura('obitos_por_tipo_sinistro', ano, versao), use_container_width=True)
 
-# Óbitos de Pedestres
-pedestres = data_filtrada[data_filtrada['Meio de locomocao da vitima'] == 'PEDESTRE']
-total_pedestres = len(pedestres)
+@st.fragment
+@medir('linha_graficos_dia_veiculo')
+def linha_graficos_dia_veiculo(ano, versao):
+    col3, col4 = st.columns(2)
 
-if ano_anterior is not None and not dados_ano_anterior.empty:
-    pedestres_anterior = dados_ano_anterior[dados_ano_anterior['Meio de locomocao da vitima'] == 'PEDESTRE']
-    delta_pedestres = total_pedestres - len(pedestres_anterior)
-    col3.metric(":walking: Óbitos de Pedestres", total_pedestres, delta=f"{delta_pedestres} comparado ao ano anterior", help="Óbitos envolvendo pedestres em acidentes")
-else:
+    # Gráfico 3: Distribuição de Acidentes por Dia da Semana 
     with col3:
-        st.metric(":walking: Óbitos de Pedestres", total_pedestres)
-        st.markdown("<div style='color:orange; font-size: 14px; margin-top: -15px;'>Sem comparação</div>", unsafe_allow_html=True)
-
-# Função para criar gráfico de barras com cores gradientes
-def create_colored_bar_chart(data, x_column, y_column, title, color_column, color_scale):
-    fig = px.bar(data, x=x_column, y=y_column, color=color_column, template='seaborn', color_continuous_scale=color_scale)
-    fig.update_layout(
-        title_text=title, 
-        title_x=0, 
-        margin=dict(l=0, r=10, b=10, t=30),
-        yaxis_title=None, 
-        xaxis_title=None,
-        xaxis=dict(tickmode='linear', tick0=2019, dtick=1)
-    )
-    return fig
-
-col1, col2 = st.columns(2)
-# Gráfico 1: Quantidade de Acidentes por Ano 
-with col1:
-    st.info("📊 Este gráfico mostra a quantidade de acidentes ao longo dos anos.")
-    sinistros_por_ano = data_filtrada.groupby('Ano').size().reset_index(name='Quantidade')
-    fig1 = create_colored_bar_chart(sinistros_por_ano, x_column='Ano', y_column='Quantidade', title='Quantidade de Acidentes por Ano', color_column='Quantidade', color_scale='Blues')
-    st.plotly_chart(fig1, use_container_width=True)
-
-# Gráfico 2: Distribuição de Óbitos por Tipo de Sinistro
-with col2:
-    st.info("🚧 Este gráfico exibe a distribuição de óbitos por tipo de acidente.")
-    obitos_por_tipo_sinistro = data_filtrada['Tipo de Sinistro'].value_counts().reset_index(name='Quantidade')
-    obitos_por_tipo_sinistro = obitos_por_tipo_sinistro.rename(columns={'index': 'Tipo de Sinistro'})
-    fig2 = create_colored_bar_chart(obitos_por_tipo_sinistro, x_column='Tipo de Sinistro', y_column='Quantidade', title='Distribuição de Óbitos por Tipo de Acidente', color_column='Quantidade', color_scale='Reds')
-    st.plotly_chart(fig2, use_container_width=True)
-
-col3, col4 = st.columns(2)
-
-# Gráfico 3: Distribuição de Acidentes por Dia da Semana 
-with col3:
-    st.info("📅 Este gráfico mostra a distribuição dos acidentes fatais em diferentes dias da semana.")
-    sinistros_por_dia_semana = data_filtrada.groupby('Dia da Semana').size().reset_index(name='Quantidade')
-    fig3 = create_colored_bar_chart(sinistros_por_dia_semana, x_column='Dia da Semana', y_column='Quantidade', title='Distribuição de Acidentes por Dia da Semana', color_column='Quantidade', color_scale='Greens')
-    st.plotly_chart(fig3, use_container_width=True)
-
-# Gráfico 4: Distribuição de Acidentes por Tipo de Veículo 
-with col4:
-    st.info("🚗 Este gráfico apresenta os tipos de veículos mais envolvidos em acidentes fatais.")
-    if 'Meio de locomocao da vitima' in data_filtrada.columns:
-        data_filtrada = data_filtrada[data_filtrada['Meio de locomocao da vitima'] != 'NAO DISPONIVEL']
-        sinistros_por_veiculo = data_filtrada.groupby('Meio de locomocao da vitima').size().reset_index(name='Quantidade')
-        fig4 = create_colored_bar_chart(sinistros_por_veiculo, x_column='Meio de locomocao da vitima', y_column='Quantidade', title='Distribuição de Acidentes por Tipo de Veículo', color_column='Quantidade', color_scale='Oranges')
-        st.plotly_chart(fig4, use_container_width=True)
-    else:
-        st.write("Coluna 'Meio de locomocao da vitima' não encontrada nos dados.")
-
-col5, col6 = st.columns(2)
-
-# Gráfico 5: Comparação de Turno x Tipo de Via
-with col5:
-    st.info("🚧 Compare a ocorrência de acidentes fatais por turno do dia e tipo de via.")
-    if 'Turno' in data_filtrada.columns and 'Tipo de Via' in data_filtrada.columns:
-        data_filtrada = data_filtrada[(data_filtrada['Turno'] != 'NAO DISPONIVEL') & (data_filtrada['Tipo de Via'] != 'NAO DISPONIVEL')]
-        
-        turno_tipo_via = data_filtrada.groupby(['Turno', 'Tipo de Via']).size().reset_index(name='Quantidade')
-        fig5 = px.bar(turno_tipo_via, x='Tipo de Via', y='Quantidade', color='Turno', 
-                      title='Comparação de Turno x Tipo de Via', 
-                      labels={'Quantidade':'Número de Acidentes', 'Tipo de Via':'Tipo de Via'},
-                      template='seaborn')
-
-        fig5.update_layout(
-            title_x=0,
-            margin=dict(l=0, r=10, b=10, t=30),
-            xaxis_title='Tipo de Via',
-            yaxis_title='Número de Acidentes',
-            legend_title_text='Turno'
-        )
-        
-        st.plotly_chart(fig5, use_container_width=True)
-    else:
-        st.write("Colunas 'Turno' ou 'Tipo de Via' não encontradas nos dados.")
-
-# Gráfico 6: Turno com Maior Incidência de Acidentes 
-with col6:
-    st.info("⏳ Veja em quais turnos do dia ocorrem mais acidentes fatais.")
-    def classificar_turno(hora):
-        if pd.isna(hora):
-            return 'Desconhecido'
-        if 6 <= hora < 12:
-            return 'Manhã'
-        elif 12 <= hora < 18:
-            return 'Tarde'
-        elif 18 <= hora < 24:
-            return 'Noite'
+        st.info("📅 Este gráfico mostra a distribuição dos acidentes fatais em diferentes dias da semana.")
+        st.plotly_chart(figura('acidentes_por_dia_semana', ano, versao), use_container_width=True)
+
+    # Gráfico 4: Distribuição de Acidentes por Tipo de Veículo 
+    with col4:
+        st.info("🚗 Este gráfico apresenta os tipos de veículos mais envolvidos em acidentes fatais.")
+        if 'Meio de locomocao da vitima' in cubo:
+            st.plotly_chart(figura('acidentes_por_veiculo', ano, versao), use_container_width=True)
         else:
-            return 'Madrugada'
-
-    if 'Hora do Sinistro' in data_filtrada.columns:
-        data_filtrada['Turno'] = data_filtrada['Hora do Sinistro'].apply(classificar_turno)
-        sinistros_por_turno = data_filtrada.groupby('Turno').size().reset_index(name='Quantidade')
-        fig6 = create_colored_bar_chart(sinistros_por_turno, x_column='Turno', y_column='Quantidade', title='Turno com Maior Incidência de Acidentes', color_column='Quantidade', color_scale='YlOrBr')
-        st.plotly_chart(fig6, use_container_width=True)
-    else:
-        st.write("Coluna 'Hora do Sinistro' não encontrada nos dados.")
+            st.write("Coluna 'Meio de locomocao da vitima' não encontrada nos dados.")
+
+@st.fragment
+@medir('linha_graficos_turno_via')
+def linha_graficos_turno_via(ano, versao):
+    col5, col6 = st.columns(2)
+
+    # Gráfico 5: Comparação de Turno x Tipo de Via
+    with col5:
+        st.info("🚧 Compare a ocorrência de acidentes fatais por turno do dia e tipo de via.")
+        if ('Turno', 'Tipo de Via') in cubo:
+            st.plotly_chart(figura('turno_tipo_via', ano, versao), use_container_width=True)
+        else:
+            st.write("Colunas 'Turno' ou 'Tipo de Via' não encontradas nos dados.")
 
-col7, col8 = st.columns(2)
+    # Gráfico 6: Turno com Maior Incidência de Acidentes 
+    with col6:
+        st.info("⏳ Veja em quais turnos do dia ocorrem mais acidentes fatais.")
+        if 'Turno Calculado' in cubo:
+            st.plotly_chart(figura('acidentes_por_turno', ano, versao), use_container_width=True)
+        else:
+            st.write("Coluna 'Hora do Sinistro' não encontrada nos dados.")
+
+@st.fragment
+@medir('linha_graficos_faixa_etaria_via')
+def linha_graficos_faixa_etaria_via(ano, versao):
+    col7, col8 = st.columns(2)
+
+    # Gráfico 7: Distribuição de Óbitos por Faixa Etária 
+    with col7:
+        st.info("👶👵 Este gráfico exibe a distribuição de acidentes fatais de acordo com a faixa etária.")
+        if 'Faixa etaria' in cubo:
+            st.plotly_chart(figura('obitos_por_faixa_etaria', ano, versao), use_container_width=True)
+        else:
+            st.write("Coluna 'Faixa etaria' não encontrada nos dados.")
 
-# Gráfico 7: Distribuição de Óbitos por Faixa Etária 
-with col7:
-    st.info("👶👵 Este gráfico exibe a distribuição de acidentes fatais de acordo com a faixa etária.")
-    if 'Faixa etaria' in data_filtrada.columns:
-        data_filtrada = data_filtrada[data_filtrada['Faixa etaria'] != 'NAO DISPONIVEL']
-        
-        faixa_etaria = data_filtrada.groupby('Faixa etaria').size().reset_index(name='Quantidade')
-        fig7 = create_colored_bar_chart(faixa_etaria, x_column='Faixa etaria', y_column='Quantidade', title='Distribuição de Óbitos por Faixa Etária', color_column='Quantidade', color_scale='Blues')
-        st.plotly_chart(fig7, use_container_width=True)
-    else:
-        st.write("Coluna 'Faixa etaria' não encontrada nos dados.")
-
-# Gráfico 8: Óbitos por Tipo de Via 
-with col8:
-    st.info("🚧 Visualize os tipos de vias mais associados a acidentes fatais.")
-    if 'Tipo de Via' in data_filtrada.columns:
-        tipo_via = data_filtrada.groupby('Tipo de Via').size().reset_index(name='Quantidade')
-        fig8 = create_colored_bar_chart(tipo_via, x_column='Tipo de Via', y_column='Quantidade', title='Óbitos por Tipo de Via', color_column='Quantidade', color_scale='Reds')
-        st.plotly_chart(fig8, use_container_width=True)
-    else:
-        st.write("Coluna 'Tipo de Via' não encontrada nos dados.")
-
-col9, col10 = st.columns(2)
-
-# 3 bairros com maiores índices de acidentes
-with col9:
-    st.info("🏘️ Este gráfico exibe os 3 bairros com maiores índices de acidentes.")
-    if 'Bairro' in data_filtrada.columns:
-        top3_bairros = data_filtrada['Bairro'].value_counts().reset_index(name='Quantidade')
-        top3_bairros = top3_bairros.rename(columns={'index': 'Bairro'})
-        top3_bairros = top3_bairros[top3_bairros['Bairro'] != 'Bairro não identificado'].head(3)
-        if not top3_bairros.empty:
-            fig_top3 = create_colored_bar_chart(top3_bairros, x_column='Bairro', y_column='Quantidade', title='Top 3 Bairros com Mais Acidentes', color_column='Quantidade', color_scale='Oranges')
-            fig_top3.update_layout(
-                yaxis=dict(
-                    tickmode='linear',
-                    dtick=1 
-                )
-            )
-            st.plotly_chart(fig_top3, use_container_width=True)
+    # Gráfico 8: Óbitos por Tipo de Via 
+    with col8:
+        st.info("🚧 Visualize os tipos de vias mais associados a acidentes fatais.")
+        if 'Tipo de Via' in cubo:
+            st.plotly_chart(figura('obitos_por_tipo_via', ano, versao), use_container_width=True)
         else:
-            st.write("Nenhum dado disponível para os bairros.")
-    else:
-        st.write("Coluna 'Bairro' não encontrada nos dados.")
-
-# Gráfico 9: Óbitos por Gênero 
-with col10:
-    st.info("👫 Compare o número de óbitos por gênero.")
-    if 'Sexo' in data_filtrada.columns:
-        obitos_por_sexo = data_filtrada.groupby('Sexo').size().reset_index(name='Quantidade')
-        fig10 = create_colored_bar_chart(obitos_por_sexo, x_column='Sexo', y_column='Quantidade', title='Óbitos por Gênero', color_column='Quantidade', color_scale='Greys')
-        st.plotly_chart(fig10, use_container_width=True)
-    else:
-        st.write("Coluna 'Gênero' não encontrada nos dados.")
+            st.write("Coluna 'Tipo de Via' não encontrada nos dados.")
+
+@st.fragment
+@medir('linha_graficos_bairros_genero')
+def linha_graficos_bairros_genero(ano, versao):
+    col9, col10 = st.columns(2)
+
+    # 3 bairros com maiores índices de acidentes
+    with col9:
+        st.info("🏘️ Este gráfico exibe os 3 bairros com maiores índices de acidentes.")
+        if 'Bairro' in cubo:
+            fig_top3 = figura('top3_bairros', ano, versao)
+            if fig_top3 is not None:
+                st.plotly_chart(fig_top3, use_container_width=True)
+            else:
+                st.write("Nenhum dado disponível para os bairros.")
+        else:
+            st.write("Coluna 'Bairro' não encontrada nos dados.")
 
-col11, col12 = st.columns(2)
+    # Gráfico 9: Óbitos por Gênero 
+    with col10:
+        st.info("👫 Compare o número de óbitos por gênero.")
+        if 'Sexo' in cubo:
+            st.plotly_chart(figura('obitos_por_sexo', ano, versao), use_container_width=True)
+        else:
+            st.write("Coluna 'Gênero' não encontrada nos dados.")
+
+@st.fragment
+@medir('linha_graficos_mes_dia')
+def linha_graficos_mes_dia(ano, versao):
+    col11, col12 = st.columns(2)
+
+    # Gráfico 11: Óbitos por Mês do Ano
+    with col11:
+        st.info("📅 Este gráfico mostra a distribuição de óbitos ao longo dos meses do ano.")
+        if 'Nome do Mes' in cubo:
+            st.plotly_chart(figura('obitos_por_mes', ano, versao), use_container_width=True)
+        else:
+            st.write("Coluna 'Mes do Sinistro' não encontrada nos dados.")
 
-# Gráfico 11: Óbitos por Mês do Ano
-with col11:
-    st.info("📅 Este gráfico mostra a distribuição de óbitos ao longo dos meses do ano.")
-    if 'Mes do Sinistro' in data_filtrada.columns:
-        mes_do_ano = data_filtrada.groupby('Mes do Sinistro').size().reset_index(name='Quantidade')
-        fig11 = create_colored_bar_chart(mes_do_ano, x_column='Mes do Sinistro', y_column='Quantidade', title='Acidentes por Mês do Ano', color_column='Quantidade', color_scale='BuGn')
-        st.plotly_chart(fig11, use_container_width=True)
-    else:
-        st.write("Coluna 'Mes do Sinistro' não encontrada nos dados.")
-
-# Gráfico 12: Óbitos por Dia do Mês
-with col12:
-    st.info("📆 Veja como os óbitos se distribuem ao longo dos dias de cada mês.")
-    if 'Dia do Sinistro' in data_filtrada.columns:
-        dia_do_mes = data_filtrada.groupby('Dia do Sinistro').size().reset_index(name='Quantidade')
-        fig12 = create_colored_bar_chart(dia_do_mes, x_column='Dia do Sinistro', y_column='Quantidade', title='Acidentes por Dia do Mês', color_column='Quantidade', color_scale='YlGnBu')
-        fig12.update_layout(
-            yaxis=dict(
-                tickmode='linear',
-                dtick=1  
-            )
-        )
-        st.plotly_chart(fig12, use_container_width=True)
-    else:
-        st.write("Coluna 'Dia do Sinistro' não encontrada nos dados.")
+    # Gráfico 12: Óbitos por Dia do Mês
+    with col12:
+        st.info("📆 Veja como os óbitos se distribuem ao longo dos dias de cada mês.")
+        if 'Dia do Sinistro' in cubo:
+            st.plotly_chart(figura('obitos_por_dia_mes', ano, versao), use_container_width=True)
+        else:
+            st.write("Coluna 'Dia do Sinistro' não encontrada nos dados.")
+
+linha_graficos_acidentes_tipo(ano_cubo, versao_filtro)
+linha_graficos_dia_veiculo(ano_cubo, versao_filtro)
+linha_graficos_turno_via(ano_cubo, versao_filtro)
+linha_graficos_faixa_etaria_via(ano_cubo, versao_filtro)
+linha_graficos_bairros_genero(ano_cubo, versao_filtro)
+linha_graficos_mes_dia(ano_cubo, versao_filtro)
+
+# Mapa dos óbitos: as coordenadas são agrupadas em grade no servidor para o zoom escolhido
+@st.fragment
+@medir('secao_mapa')
+def secao_mapa(data_filtrada, ano, versao):
+    st.info("🗺️ Veja onde os óbitos se concentram na cidade. Aproxime para ver a distribuição com mais detalhe.")
+    if 'Latitude' not in data_filtrada.columns or 'Longitude' not in data_filtrada.columns:
+        st.write("Colunas 'Latitude' e 'Longitude' não encontradas nos dados.")
+        return
+    zoom = st.select_slider("Nível de zoom do mapa", NIVEIS_ZOOM, value=ZOOM_PADRAO)
+    fig_mapa = obter_mapa(data_filtrada, versao, ano, zoom)
+    if fig_mapa is None:
+        st.write("Nenhum óbito com coordenadas para o filtro selecionado.")
+        return
+    st.plotly_chart(fig_mapa, use_container_width=True)
+    sem_coordenadas = int((data_filtrada['Latitude'].isna() | data_filtrada['Longitude'].isna()).sum())
+    if sem_coordenadas:
+        st.caption(f"{sem_coordenadas} óbitos sem coordenadas não aparecem no mapa.")
+
+secao_mapa(data_filtrada, ano_cubo, versao_filtro)
 
 # Lista de Contatos Úteis
 with st.expander("Contatos Úteis"):
@@ -587,4 +600,33 @@ with st.expander("Contatos Úteis"):
     
     - **CET (Companhia de Engenharia de Tráfego)**
         - Telefone: 1188
-    """)
\ No newline at end of file
+    """)
+# Painel de depuração: tempos das seções, contadores dos caches e exportação das métricas
+def painel_depuracao():
+    metricas = obter_metricas()
+    with st.expander("Depuração: tempos e contadores"):
+        tempos = pd.DataFrame.from_dict(metricas.tempos(), orient='index')
+        if not tempos.empty:
+            st.caption("Tempos das seções, em ms")
+            colunas_ms = ['ultima', 'media', 'p50', 'p90', 'p99']
+            st.dataframe(
+                (tempos[colunas_ms] * 1000).round(1).join(tempos['quantidade'].astype(int)),
+                use_container_width=True,
+            )
+        contadores = metricas.contadores()
+        if contadores:
+            st.caption("Contadores")
+            st.dataframe(pd.Series(contadores, name='quantidade'), use_container_width=True)
+        st.download_button("Métricas em JSON lines", metricas.linhas_jsonl(), file_name="metricas.jsonl", mime="application/x-ndjson")
+        st.download_button("Métricas no formato Prometheus", metricas.texto_prometheus(), file_name="metricas.prom", mime="text/plain")
+
+obter_metricas().registrar_tempo('pagina', time.perf_counter() - inicio_execucao)
+if METRICAS_JSONL:
+    try:
+        obter_metricas().exportar_jsonl(METRICAS_JSONL)
+    except OSError:
+        pass
+
+if PAINEL_DEPURACAO or st.query_params.get("depuracao") == "1":
+    with st.sidebar:
+        painel_depuracao()
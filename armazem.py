@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+import pandas as pd
+from dados import ARQUIVO_METADADOS, DIRETORIO_ARMAZEM, converter_tipos, ler_fonte
+
+# Campos que identificam um óbito no extrato do Infosiga (o extrato não tem um id próprio)
+COLUNAS_CHAVE = [
+    'Data do Sinistro', 'Hora do Sinistro', 'Municipio', 'Logradouro', 'Numeral / KM',
+    'Latitude', 'Longitude', 'Tipo de vitima', 'Meio de locomocao da vitima', 'Sexo', 'Idade da vitima',
+]
+
+COLUNA_CHAVE = '_chave'
+
+ResumoArmazem = namedtuple('ResumoArmazem', ['anos', 'ultima_atualizacao', 'linhas'])
+
+
+def chaves_registros(data):
+    """
+    Chave de cada óbito: hash dos campos de COLUNAS_CHAVE mais a ordem de aparição entre linhas
+    idênticas, para que vítimas indistinguíveis do mesmo sinistro não sejam descartadas.
+    """
+    colunas = [coluna for coluna in COLUNAS_CHAVE if coluna in data.columns]
+    hashes = pd.util.hash_pandas_object(data[colunas].astype(str), index=False)
+    ordem = hashes.groupby(hashes).cumcount()
+    return pd.Series(
+        [f"{valor:016x}-{posicao}" for valor, posicao in zip(hashes, ordem)],
+        index=data.index,
+    )
+
+
+def ler_metadados(diretorio=DIRETORIO_ARMAZEM):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_METADADOS), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def resumo_armazem(diretorio=DIRETORIO_ARMAZEM):
+    """
+    Anos disponíveis, data da última ingestão e total de linhas, lidos só dos metadados.
+    Retorna None se o armazém ainda não existir (ou se `diretorio` for um arquivo, como um CSV).
+    """
+    metadados = ler_metadados(diretorio)
+    if metadados is None:
+        return None
+    particoes = metadados['particoes'].values()
+    return ResumoArmazem(
+        anos=sorted({particao['ano'] for particao in particoes}),
+        ultima_atualizacao=datetime.fromisoformat(metadados['atualizado_em']),
+        linhas=sum(particao['linhas'] for particao in particoes),
+    )
+
+
+def _substituir(caminho, escrever):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def _resumo_particao(ano, mes, arquivo, data, agora):
+    impressao = hashlib.sha1("\n".join(sorted(data[COLUNA_CHAVE])).encode('utf-8')).hexdigest()[:16]
+    datas = data['Data do Sinistro'] if 'Data do Sinistro' in data.columns else pd.Series(dtype='datetime64[ns]')
+    return {
+        'ano': ano,
+        'mes': mes,
+        'arquivo': arquivo,
+        'linhas': len(data),
+        'impressao': impressao,
+        'data_inicial': None if datas.isna().all() else datas.min().date().isoformat(),
+        'data_final': None if datas.isna().all() else datas.max().date().isoformat(),
+        'atualizado_em': agora,
+    }
+
+
+def ingerir(data, diretorio=DIRETORIO_ARMAZEM, agora=None):
+    """
+    Acrescenta ao armazém os óbitos de um extrato já tipado (ver dados.ler_fonte), particionando por
+    Ano/Mês do sinistro. Só as partições que recebem linhas novas são lidas e regravadas, e só elas têm
+    o resumo recalculado nos metadados; linhas já presentes (mesma chave) são ignoradas.
+    Retorna um dicionário com as quantidades de linhas novas e repetidas e as partições alteradas.
+    """
+    agora = agora or datetime.now().isoformat(timespec='seconds')
+    metadados = ler_metadados(diretorio) or {'particoes': {}}
+    data = data.assign(**{COLUNA_CHAVE: chaves_registros(data)})
+
+    novos = repetidos = 0
+    alteradas = []
+    for (ano, mes), grupo in data.groupby(['Ano', 'Mes do Sinistro'], sort=True):
+        ano, mes = int(ano), int(mes)
+        nome = f"{ano:04d}-{mes:02d}"
+        arquivo = os.path.join(f"Ano={ano}", f"Mes={mes}", 'dados.parquet')
+        caminho = os.path.join(diretorio, arquivo)
+
+        recebidos = len(grupo)
+        existente = pd.read_parquet(caminho) if nome in metadados['particoes'] else None
+        if existente is not None:
+            grupo = grupo[~grupo[COLUNA_CHAVE].isin(existente[COLUNA_CHAVE])]
+        repetidos += recebidos - len(grupo)
+        if grupo.empty:
+            continue
+
+        particao = grupo if existente is None else converter_tipos(pd.concat([existente, grupo], ignore_index=True))
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        _substituir(caminho, lambda temporario: particao.to_parquet(temporario, index=False))
+        metadados['particoes'][nome] = _resumo_particao(ano, mes, arquivo, particao, agora)
+        novos += len(grupo)
+        alteradas.append(nome)
+
+    if alteradas or 'atualizado_em' not in metadados:
+        metadados['atualizado_em'] = agora
+        os.makedirs(diretorio, exist_ok=True)
+
+        def escrever(temporario):
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(metadados, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+        _substituir(os.path.join(diretorio, ARQUIVO_METADADOS), escrever)
+
+    return {'novos': novos, 'repetidos': repetidos, 'particoes_alteradas': alteradas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acrescenta extratos do Infosiga ao armazém particionado por Ano/Mês.")
+    parser.add_argument('extratos', nargs='+', help="CSVs do Infosiga separados por ';' (ex.: obitos_final.csv)")
+    parser.add_argument('--armazem', default=DIRETORIO_ARMAZEM, help="Diretório do armazém")
+    parser.add_argument('--municipio', action='append', help="Mantém só os óbitos deste município (pode repetir)")
+    args = parser.parse_args()
+
+    for extrato in args.extratos:
+        # O extrato é lido em blocos e só as linhas dos municípios pedidos ficam em memória
+        resultado = ingerir(ler_fonte(extrato, municipios=args.municipio), args.armazem)
+        alteradas = ', '.join(resultado['particoes_alteradas']) or 'nenhuma'
+        print(f"{extrato}: {resultado['novos']} óbitos novos, {resultado['repetidos']} já presentes; partições alteradas: {alteradas}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+import contextlib
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metricas import contar, medir, obter_metricas
+
+MODELO_MARITACA = "sabia-3"
+URL_API_MARITACA = os.getenv("MARITACA_API_URL", "https://chat.maritaca.ai/api")
+
+# Timeouts (segundos) de conexão e de leitura das chamadas à API
+TIMEOUT_CONEXAO = 5
+TIMEOUT_LEITURA = 60
+MAX_TENTATIVAS = 3
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+# Respostas que indicam que o endpoint não aceita streaming (usa-se então a chamada bloqueante)
+STATUS_SEM_STREAMING = {400, 404, 405, 415, 501}
+# Amostragem usada por padrão pelo SDK maritalk, mantida para as respostas não mudarem de estilo
+TEMPERATURA = 0.7
+TOP_P = 0.95
+AMOSTRAGEM = True
+
+CAMINHO_CACHE_RESPOSTAS = os.path.join('.cache', 'respostas.sqlite3')
+TTL_RESPOSTAS = int(os.getenv("MARITACA_CACHE_TTL", 7 * 24 * 60 * 60))
+MAX_RESPOSTAS = int(os.getenv("MARITACA_CACHE_MAX", 1000))
+
+
+class CacheRespostas:
+    """
+    Cache em disco (SQLite) das respostas da Maritaca AI, compartilhado entre sessões e processos.
+    A chave é o hash de (modelo, prompt); entradas expiram após `ttl` segundos e, acima de
+    `max_entradas`, as menos usadas recentemente são descartadas.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_RESPOSTAS, ttl=TTL_RESPOSTAS, max_entradas=MAX_RESPOSTAS, relogio=time.time):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.relogio = relogio
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY,"
+                " modelo TEXT NOT NULL,"
+                " resposta TEXT NOT NULL,"
+                " criado_em REAL NOT NULL,"
+                " ultimo_acesso REAL NOT NULL)"
+            )
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    @staticmethod
+    def chave(modelo, prompt):
+        return hashlib.sha256(f"{modelo}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def obter(self, modelo, prompt):
+        chave = self.chave(modelo, prompt)
+        agora = self.relogio()
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT resposta, criado_em FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha is not None and agora - linha[1] > self.ttl:
+                conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                linha = None
+            if linha is not None:
+                conexao.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (agora, chave))
+        with self._lock:
+            if linha is None:
+                self.falhas += 1
+                contar('cache_respostas_falhas')
+                return None
+            self.acertos += 1
+            contar('cache_respostas_acertos')
+            return linha[0]
+
+    def contem(self, modelo, prompt):
+        # Consulta sem alterar os contadores nem a ordem de uso (usada pela pré-busca)
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT 1 FROM respostas WHERE chave = ? AND criado_em >= ?",
+                (self.chave(modelo, prompt), self.relogio() - self.ttl),
+            ).fetchone()
+        return linha is not None
+
+    def salvar(self, modelo, prompt, resposta):
+        agora = self.relogio()
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO respostas (chave, modelo, resposta, criado_em, ultimo_acesso) VALUES (?, ?, ?, ?, ?)",
+                (self.chave(modelo, prompt), modelo, resposta, agora, agora),
+            )
+            conexao.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl,))
+            conexao.execute(
+                "DELETE FROM respostas WHERE chave IN ("
+                " SELECT chave FROM respostas ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,),
+            )
+
+    def estatisticas(self):
+        with self._conectar() as conexao:
+            entradas = conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        with self._lock:
+            return {'acertos': self.acertos, 'falhas': self.falhas, 'entradas': entradas}
+
+
+_cache_respostas = None
+_cache_respostas_lock = threading.Lock()
+
+
+def obter_cache_respostas():
+    """
+    Instância única do cache de respostas por processo.
+    """
+    global _cache_respostas
+    with _cache_respostas_lock:
+        if _cache_respostas is None:
+            _cache_respostas = CacheRespostas()
+        return _cache_respostas
+
+
+class ErroMaritaca(Exception):
+    pass
+
+
+class CircuitoAberto(ErroMaritaca):
+    pass
+
+
+class StreamingIndisponivel(ErroMaritaca):
+    pass
+
+
+class Disjuntor:
+    """
+    Circuit breaker: após `limite_falhas` falhas seguidas, recusa chamadas por `tempo_aberto`
+    segundos; depois libera uma única chamada de teste, que fecha o circuito se tiver sucesso.
+    As demais continuam recusadas enquanto o teste não termina (ou, se ele não der resultado,
+    por mais `tempo_aberto` segundos, quando outra chamada de teste é liberada).
+    """
+
+    def __init__(self, limite_falhas=5, tempo_aberto=30, relogio=time.monotonic):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.relogio = relogio
+        self.falhas = 0
+        self.aberto_em = None
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            if self.aberto_em is None:
+                return True
+            agora = self.relogio()
+            if agora - self.aberto_em >= self.tempo_aberto:
+                # Meio-aberto: só esta chamada passa; o prazo recomeça para as outras, e a falha
+                # do teste (as falhas seguem no limite) abre o circuito de novo
+                self.aberto_em = agora
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self.aberto_em = None
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.falhas >= self.limite_falhas:
+                self.aberto_em = self.relogio()
+
+
+class ClienteMaritaca:
+    """
+    Cliente HTTP de longa duração para a API da Maritaca, com conexões reaproveitadas (keep-alive),
+    timeouts explícitos, novas tentativas com backoff exponencial e jitter em 429/5xx e circuit breaker.
+    """
+
+    def __init__(self, chave, modelo=MODELO_MARITACA, url_base=URL_API_MARITACA,
+                 timeout_conexao=TIMEOUT_CONEXAO, timeout_leitura=TIMEOUT_LEITURA,
+                 max_tentativas=MAX_TENTATIVAS, espera_base=0.5, espera_maxima=8,
+                 disjuntor=None, tamanho_pool=10, dormir=time.sleep,
+                 temperatura=TEMPERATURA, top_p=TOP_P, amostragem=AMOSTRAGEM):
+        self.chave = chave
+        self.modelo = modelo
+        self.temperatura = temperatura
+        self.top_p = top_p
+        self.amostragem = amostragem
+        self.url = url_base.rstrip('/') + "/chat/inference"
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.disjuntor = disjuntor or Disjuntor()
+        self.dormir = dormir
+        # Importado só quando um cliente é criado: sem chave da API, o processo nem carrega o requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+        if chave:
+            self.sessao.headers["Authorization"] = f"Key {chave}"
+
+    def _espera(self, tentativa, resposta=None):
+        if resposta is not None:
+            retry_after = resposta.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.espera_maxima)
+        # Full jitter: espera aleatória entre 0 e o teto exponencial
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+
+    def _post(self, corpo, stream=False):
+        import requests
+
+        if not self.disjuntor.permitir():
+            raise CircuitoAberto("A API da Maritaca está indisponível no momento. Tente novamente em alguns instantes.")
+
+        ultimo_erro = None
+        for tentativa in range(self.max_tentativas):
+            resposta = None
+            try:
+                resposta = self.sessao.post(self.url, json=corpo, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                ultimo_erro = e
+            else:
+                if resposta.ok:
+                    self.disjuntor.registrar_sucesso()
+                    return resposta
+                if resposta.status_code not in STATUS_REPETIVEIS:
+                    # Erro do cliente (chave inválida, requisição malformada): não adianta repetir
+                    erro = StreamingIndisponivel if stream and resposta.status_code in STATUS_SEM_STREAMING else ErroMaritaca
+                    raise erro(f"HTTP {resposta.status_code}: {resposta.text[:200]}")
+                ultimo_erro = ErroMaritaca(f"HTTP {resposta.status_code}")
+                resposta.close()
+            if tentativa + 1 < self.max_tentativas:
+                contar('maritaca_novas_tentativas')
+                self.dormir(self._espera(tentativa, resposta))
+
+        contar('maritaca_falhas')
+        self.disjuntor.registrar_falha()
+        raise ErroMaritaca(f"Falha após {self.max_tentativas} tentativas: {ultimo_erro}")
+
+    def _corpo(self, prompt, max_tokens, stream):
+        return {
+            "model": self.modelo,
+            "messages": prompt,
+            "chat_mode": True,
+            "max_tokens": max_tokens,
+            "temperature": self.temperatura,
+            "top_p": self.top_p,
+            "do_sample": self.amostragem,
+            "stream": stream,
+        }
+
+    def gerar(self, prompt, max_tokens=500):
+        corpo = self._corpo(prompt, max_tokens, stream=False)
+        with medir('maritaca:gerar'):
+            return self._post(corpo).json()["answer"]
+
+    def gerar_stream(self, prompt, max_tokens=500):
+        """
+        Gera a resposta em partes, à medida que os tokens chegam (server-sent events).
+        Registra o tempo até a primeira parte e o tempo total da resposta completa.
+        """
+        metricas = obter_metricas()
+        inicio = metricas.relogio()
+        primeira = True
+        for parte in self._partes_stream(prompt, max_tokens):
+            if primeira:
+                metricas.registrar_tempo('maritaca:primeiro_token', metricas.relogio() - inicio)
+                primeira = False
+            yield parte
+        metricas.registrar_tempo('maritaca:stream', metricas.relogio() - inicio)
+
+    def _partes_stream(self, prompt, max_tokens):
+        corpo = self._corpo(prompt, max_tokens, stream=True)
+        resposta = self._post(corpo, stream=True)
+        with resposta:
+            if 'text/event-stream' not in resposta.headers.get('Content-Type', ''):
+                # Servidor ignorou o pedido de streaming e devolveu a resposta completa
+                yield resposta.json()["answer"]
+                return
+            for linha in resposta.iter_lines(decode_unicode=True):
+                if not linha or not linha.startswith("data:"):
+                    continue
+                dados = linha[len("data:"):].strip()
+                if not dados or dados == "[DONE]":
+                    continue
+                texto = json.loads(dados).get("text", "")
+                if texto:
+                    yield texto
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def obter_cliente_maritaca(chave, modelo=MODELO_MARITACA):
+    """
+    Cliente compartilhado por todas as sessões do processo (um por chave e modelo).
+    """
+    with _clientes_lock:
+        cliente = _clientes.get((chave, modelo))
+        if cliente is None:
+            cliente = ClienteMaritaca(chave, modelo)
+            _clientes[(chave, modelo)] = cliente
+        return cliente
+
+
+class PreBuscaRespostas:
+    """
+    Calcula em segundo plano os prompts e as respostas de cada par (pergunta, ano) e
+    preenche o cache de respostas, sem bloquear a renderização da página.
+    """
+
+    def __init__(self, cliente, cache, max_trabalhadores=2):
+        self.cliente = cliente
+        self.cache = cache
+        self.max_trabalhadores = max_trabalhadores
+        self.total = 0
+        self.concluidas = 0
+        self.falhas = 0
+        self.cancelada = False
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, tarefas, montar_prompt):
+        tarefas = list(tarefas)
+        self.total = len(tarefas)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_trabalhadores, thread_name_prefix='pre-busca')
+        for pergunta, ano in tarefas:
+            self._executor.submit(self._executar, pergunta, ano, montar_prompt)
+        self._executor.shutdown(wait=False)
+        return self
+
+    def cancelar(self):
+        """
+        Descarta as tarefas que ainda não começaram; as chamadas em andamento terminam normalmente.
+        """
+        self.cancelada = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _executar(self, pergunta, ano, montar_prompt):
+        falhou = False
+        try:
+            prompt = montar_prompt(pergunta, ano)
+            if not self.cache.contem(self.cliente.modelo, prompt):
+                self.cache.salvar(self.cliente.modelo, prompt, self.cliente.gerar(prompt, max_tokens=500))
+        except Exception:
+            falhou = True
+        with self._lock:
+            self.concluidas += 1
+            if falhou:
+                self.falhas += 1
+
+    @property
+    def concluida(self):
+        return self.cancelada or self.concluidas >= self.total
+
+    def progresso(self):
+        with self._lock:
+            return {'total': self.total, 'concluidas': self.concluidas, 'falhas': self.falhas}
+
+
+# Só a pré-busca da versão mais recente do dataset: (versão, PreBuscaRespostas)
+_pre_busca_atual = None
+_pre_busca_lock = threading.Lock()
+
+
+def iniciar_pre_busca(versao, cliente, tarefas, montar_prompt, cache=None, max_trabalhadores=2):
+    """
+    Dispara a pré-busca uma única vez por versão do dataset e retorna o seu acompanhamento.
+    Uma versão nova cancela o que faltava da anterior, cujas respostas não seriam mais usadas.
+    """
+    global _pre_busca_atual
+    with _pre_busca_lock:
+        if _pre_busca_atual is not None and _pre_busca_atual[0] == versao:
+            return _pre_busca_atual[1]
+        if _pre_busca_atual is not None:
+            _pre_busca_atual[1].cancelar()
+        pre_busca = PreBuscaRespostas(cliente, cache or obter_cache_respostas(), max_trabalhadores)
+        _pre_busca_atual = (versao, pre_busca.iniciar(tarefas, montar_prompt))
+        return pre_busca
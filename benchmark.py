@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dados import CAMINHO_CSV, DIRETORIO_CACHE, carregar_dados, limpar_cache
+from agregados import Cubo
+from contextos import pergunta_para_funcao
+from filtros import DIMENSOES_FILTRO, IndiceFiltros, criar_filtro
+from graficos import GRAFICOS
+from sintetico import gerar_extrato_sintetico
+
+ESCALAS = [1, 100, 10_000]
+ARQUIVO_BASE = 'benchmark_baseline.json'
+DIRETORIO_EXTRATOS = os.path.join(DIRETORIO_CACHE, 'benchmark')
+# Uma medida regride quando fica mais de 50% acima da referência; abaixo de 50 ms o ruído domina
+LIMITE_REGRESSAO = 0.5
+TEMPO_MINIMO = 0.05
+MUNICIPIOS = ['FRANCA']
+
+
+def gerar_extrato(escala, diretorio=DIRETORIO_EXTRATOS, origem=CAMINHO_CSV, sintetico=False):
+    """
+    Extrato com as linhas de `origem` repetidas `escala` vezes (índice renumerado), gravado em
+    blocos e reaproveitado entre execuções. Com `sintetico`, as linhas são sorteadas com as
+    distribuições de `origem` (ver sintetico.py) em vez de repetidas.
+    """
+    caminho = os.path.join(diretorio, f"obitos_{'sintetico_' if sintetico else ''}x{escala}.csv")
+    if os.path.exists(caminho):
+        return caminho
+    if sintetico:
+        os.makedirs(diretorio, exist_ok=True)
+        with open(origem, encoding='utf-8-sig') as arquivo:
+            linhas = sum(1 for _ in arquivo) - 1
+        return gerar_extrato_sintetico(caminho, escala * linhas, origem=origem)
+    with open(origem, encoding='utf-8-sig') as arquivo:
+        cabecalho, *linhas = arquivo.read().splitlines()
+    corpos = [linha.split(';', 1)[1] for linha in linhas]
+
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(cabecalho + '\n')
+        for repeticao in range(escala):
+            inicio = repeticao * len(corpos)
+            arquivo.write(''.join(f"{inicio + i};{corpo}\n" for i, corpo in enumerate(corpos)))
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def cronometrar(funcao, repeticoes=1):
+    # Menor tempo entre as repetições: o que sobra acima dele é ruído da máquina
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def _carregar_sem_cache(extrato):
+    # load_data do app.py sem snapshot nem cache em memória: leitura em blocos, tipagem e snapshot
+    diretorio = tempfile.mkdtemp()
+    try:
+        limpar_cache()
+        return carregar_dados(extrato, diretorio, municipios=MUNICIPIOS)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def _executar_pagina():
+    from streamlit.testing.v1 import AppTest
+
+    pagina = AppTest.from_file('app.py', default_timeout=600)
+    pagina.run()
+    if pagina.exception:
+        raise RuntimeError(pagina.exception[0].value)
+
+
+# Primeira execução num processo novo (como após reiniciar o servidor): importações e caches vazios
+_SCRIPT_PRIMEIRA_EXECUCAO = """
+import time
+from streamlit.testing.v1 import AppTest
+pagina = AppTest.from_file('app.py', default_timeout=600)
+inicio = time.perf_counter()
+pagina.run()
+if pagina.exception:
+    raise SystemExit(pagina.exception[0].value)
+print(time.perf_counter() - inicio)
+"""
+
+
+def primeira_execucao(ambiente):
+    resultado = subprocess.run(
+        [sys.executable, '-c', _SCRIPT_PRIMEIRA_EXECUCAO],
+        env={**os.environ, **ambiente}, cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    return float(resultado.stdout.split()[-1])
+
+
+def medir_escala(escala, repeticoes=3, pagina=True, diretorio=DIRETORIO_EXTRATOS, sintetico=False):
+    """
+    Tempos, em segundos, do carregamento, do cubo, dos filtros, de cada contexto do assistente, de cada
+    gráfico e (com `pagina`) da execução completa do app.py sem navegador, para o extrato
+    ampliado `escala` vezes (repetido ou, com `sintetico`, sorteado).
+    """
+    extrato = gerar_extrato(escala, diretorio, sintetico=sintetico)
+    tempos = {'load_data': cronometrar(lambda: _carregar_sem_cache(extrato), repeticoes)}
+
+    # Mesma leitura, agora com o snapshot Parquet já gravado (caso das reinicializações do servidor)
+    cache = tempfile.mkdtemp()
+    try:
+        def carregar_do_snapshot():
+            limpar_cache()
+            return carregar_dados(extrato, cache, municipios=MUNICIPIOS)
+        carregar_do_snapshot()
+        tempos['load_data_snapshot'] = cronometrar(carregar_do_snapshot, repeticoes)
+        data = carregar_do_snapshot()
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    tempos['cubo'] = cronometrar(lambda: Cubo.construir(data), repeticoes)
+    cubo = Cubo.construir(data)
+    # Bitmaps dos filtros e uma combinação de período com três valores de cada dimensão
+    tempos['filtro_indice'] = cronometrar(lambda: IndiceFiltros(data), repeticoes)
+    indice = IndiceFiltros(data)
+    anos = indice.valores('Ano')
+    filtro = criar_filtro((anos[0], anos[-1]), {coluna: indice.valores(coluna)[:3] for coluna in DIMENSOES_FILTRO})
+    tempos['filtro_combinacao'] = cronometrar(lambda: indice.bits(filtro), repeticoes)
+    # Cada contexto recebe o DataFrame e calcula as próprias tabelas de frequência
+    for funcao in pergunta_para_funcao.values():
+        tempos[f"contexto:{funcao.__name__}"] = cronometrar(lambda: funcao(data), repeticoes)
+    for id_grafico, montar in GRAFICOS.items():
+        tempos[f"grafico:{id_grafico}"] = cronometrar(lambda: montar(cubo, None), repeticoes)
+
+    if pagina:
+        ambiente = {'INFOSIGA_DADOS': os.path.abspath(extrato), 'MARITACA_PRE_BUSCA': '0'}
+        tempos['pagina_primeira_execucao'] = min(primeira_execucao(ambiente) for _ in range(repeticoes))
+        anteriores = {nome: os.environ.get(nome) for nome in ambiente}
+        os.environ.update(ambiente)
+        try:
+            # Reexecuções da página com os caches do processo já preenchidos
+            _executar_pagina()
+            tempos['pagina_reexecucao'] = cronometrar(_executar_pagina, repeticoes)
+        finally:
+            for nome, valor in anteriores.items():
+                if valor is None:
+                    os.environ.pop(nome, None)
+                else:
+                    os.environ[nome] = valor
+    return tempos
+
+
+def ler_base(caminho=ARQUIVO_BASE):
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+def salvar_base(resultados, caminho=ARQUIVO_BASE):
+    base = ler_base(caminho)
+    for escala, tempos in resultados.items():
+        base.setdefault(escala, {}).update({nome: round(tempo, 6) for nome, tempo in tempos.items()})
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(base, arquivo, indent=2, ensure_ascii=False, sort_keys=True)
+        arquivo.write('\n')
+
+
+def comparar(resultados, base, limite=LIMITE_REGRESSAO, minimo=TEMPO_MINIMO):
+    """
+    Lista (escala, medida, referência, tempo) das medidas acima da referência em mais de `limite`.
+    Medidas sem referência são ignoradas.
+    """
+    regressoes = []
+    for escala, tempos in resultados.items():
+        for nome, tempo in tempos.items():
+            referencia = base.get(escala, {}).get(nome)
+            if referencia is not None and tempo > max(referencia, minimo) * (1 + limite):
+                regressoes.append((escala, nome, referencia, tempo))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede carregamento, contextos, gráficos e a página completa com o extrato ampliado.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS, help="Quantas vezes repetir as linhas de obitos_final.csv")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por medida (vale o menor tempo)")
+    parser.add_argument('--sintetico', action='store_true', help="Usa extratos sintéticos (sintetico.py) em vez de repetir as linhas")
+    parser.add_argument('--sem-pagina', action='store_true', help="Não executa o app.py completo")
+    parser.add_argument('--limite', type=float, default=LIMITE_REGRESSAO, help="Aumento tolerado sobre a referência (0.5 = 50%%)")
+    parser.add_argument('--base', default=ARQUIVO_BASE, help="Arquivo JSON com os tempos de referência")
+    parser.add_argument('--salvar', action='store_true', help="Grava os tempos medidos como nova referência")
+    args = parser.parse_args()
+
+    base = ler_base(args.base)
+    resultados = {}
+    for escala in args.escalas:
+        chave = f"{escala}x{' sintetico' if args.sintetico else ''}"
+        resultados[chave] = medir_escala(escala, args.repeticoes, pagina=not args.sem_pagina, sintetico=args.sintetico)
+        for nome, tempo in resultados[chave].items():
+            referencia = base.get(chave, {}).get(nome)
+            comparacao = f" (referência {referencia * 1000:.1f} ms)" if referencia is not None else ""
+            print(f"{chave:>8} {nome:<55} {tempo * 1000:10.1f} ms{comparacao}")
+
+    if args.salvar:
+        salvar_base(resultados, args.base)
+        print(f"Referências gravadas em {args.base}")
+        return
+
+    regressoes = comparar(resultados, base, args.limite)
+    for escala, nome, referencia, tempo in regressoes:
+        print(f"REGRESSÃO {escala} {nome}: {referencia * 1000:.1f} ms -> {tempo * 1000:.1f} ms")
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
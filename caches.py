@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from metricas import contar
+
+
+class CacheLimitado:
+    """
+    Cache do processo, compartilhado entre reruns e sessões, com no máximo `maximo` entradas: a usada
+    há mais tempo é descartada primeiro (LRU). Acertos e falhas vão para as métricas como
+    cache_<nome>_acertos e cache_<nome>_falhas. Cada valor é construído uma vez: chamadas simultâneas
+    com a mesma chave esperam a primeira, e chaves diferentes são construídas em paralelo.
+    """
+
+    def __init__(self, nome, maximo):
+        self.nome = nome
+        self.maximo = maximo
+        self._valores = OrderedDict()
+        self._construindo = {}
+        self._lock = threading.Lock()
+
+    def _existente(self, chave):
+        # Chamado com o lock: marca a entrada como usada agora
+        self._valores.move_to_end(chave)
+        contar(f"cache_{self.nome}_acertos")
+        return self._valores[chave]
+
+    def obter(self, chave, construir):
+        """
+        Valor guardado para `chave` ou, na primeira vez, o resultado de `construir()`.
+        """
+        with self._lock:
+            if chave in self._valores:
+                return self._existente(chave)
+            construindo = self._construindo.setdefault(chave, threading.Lock())
+
+        with construindo:
+            with self._lock:
+                # Outra chamada pode ter construído o valor enquanto esta esperava
+                if chave in self._valores:
+                    return self._existente(chave)
+            contar(f"cache_{self.nome}_falhas")
+            try:
+                valor = construir()
+                with self._lock:
+                    self._valores[chave] = valor
+                    while len(self._valores) > self.maximo:
+                        self._valores.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._construindo.pop(chave, None)
+        return valor
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._valores
+
+    def __len__(self):
+        with self._lock:
+            return len(self._valores)
+
+    def limpar(self):
+        with self._lock:
+            self._valores.clear()
@@ -0,0 +1,18 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption('--slow', action='store_true', help="roda também os testes marcados com @pytest.mark.slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: teste com orçamento de tempo de relógio, só roda com --slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--slow'):
+        return
+    pular = pytest.mark.skip(reason="orçamento de tempo de relógio; rode com --slow")
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(pular)
@@ -0,0 +1,124 @@
+import glob
+import os
+import threading
+import pandas as pd
+from agregados import DIMENSOES, MEDIDAS, Cubo, ordenar_para_exibicao
+from dados import NOMES_MESES
+
+# Motor das agregações do painel: 'pandas' (padrão) ou 'duckdb' (opcional, `pip install duckdb`)
+BACKEND_CONSULTAS = os.getenv("BACKEND_CONSULTAS", "pandas")
+
+# Colunas derivadas (ver dados.adicionar_colunas_derivadas) calculadas na própria consulta,
+# para que as partições do armazém, que não as têm, possam ser lidas diretamente
+_MESES_SQL = ", ".join(f"'{mes}'" for mes in NOMES_MESES)
+EXPRESSOES_DERIVADAS = {
+    'Turno Calculado': """CASE
+        WHEN "Hora do Sinistro" IS NULL THEN 'Desconhecido'
+        WHEN "Hora do Sinistro" >= 6 AND "Hora do Sinistro" < 12 THEN 'Manhã'
+        WHEN "Hora do Sinistro" >= 12 AND "Hora do Sinistro" < 18 THEN 'Tarde'
+        WHEN "Hora do Sinistro" >= 18 AND "Hora do Sinistro" < 24 THEN 'Noite'
+        ELSE 'Madrugada' END""",
+    'Nome do Mes': f'[{_MESES_SQL}][CAST("Mes do Sinistro" AS INTEGER)]',
+}
+
+_conexao = None
+_conexao_lock = threading.Lock()
+
+
+def duckdb_disponivel():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _cursor():
+    # Uma conexão em memória por processo; cada consulta usa o próprio cursor (seguro entre threads)
+    global _conexao
+    with _conexao_lock:
+        if _conexao is None:
+            import duckdb
+            _conexao = duckdb.connect()
+        return _conexao.cursor()
+
+
+def _identificador(coluna):
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+def _expressao(coluna):
+    return EXPRESSOES_DERIVADAS.get(coluna, _identificador(coluna))
+
+
+def arquivos_parquet(caminho):
+    """
+    Arquivos Parquet de uma fonte: o próprio arquivo (ex.: o snapshot em .cache/) ou as partições
+    do armazém, quando `caminho` é o diretório dele.
+    """
+    if os.path.isdir(caminho):
+        return sorted(glob.glob(os.path.join(caminho, 'Ano=*', 'Mes=*', '*.parquet')))
+    return [caminho]
+
+
+def construir_cubo_sql(caminho, municipios=None, anos=None, dimensoes=DIMENSOES, medidas=MEDIDAS):
+    """
+    Constrói o mesmo Cubo de agregados.Cubo.construir com uma única consulta GROUPING SETS,
+    executada pelo DuckDB direto sobre os arquivos Parquet, em paralelo e sem carregar as linhas
+    no pandas. Os filtros de município e ano são aplicados na leitura.
+    """
+    conjuntos = [('Ano',)] + [('Ano', *(dimensao if isinstance(dimensao, tuple) else (dimensao,))) for dimensao in dimensoes]
+    colunas = list(dict.fromkeys(coluna for conjunto in conjuntos for coluna in conjunto))
+    medidas = list(medidas)
+
+    filtros, parametros = [], [arquivos_parquet(caminho)]
+    if municipios is not None:
+        filtros.append('list_contains(?, "Municipio")')
+        parametros.append(list(municipios))
+    if anos is not None:
+        filtros.append('list_contains(?, CAST("Ano" AS INTEGER))')
+        parametros.append([int(ano) for ano in anos])
+
+    selecao = ", ".join(f"{_expressao(coluna)} AS {_identificador(coluna)}" for coluna in dict.fromkeys(colunas + medidas))
+    agrupamentos = ", ".join("(" + ", ".join(_identificador(coluna) for coluna in conjunto) + ")" for conjunto in conjuntos)
+    somas = "".join(f", SUM({_identificador(coluna)}) AS soma_{i}, COUNT({_identificador(coluna)}) AS contagem_{i}" for i, coluna in enumerate(medidas))
+    sql = f"""
+        WITH base AS (
+            SELECT {selecao}
+            FROM read_parquet(?, union_by_name = true)
+            {"WHERE " + " AND ".join(filtros) if filtros else ""}
+        )
+        SELECT {", ".join(_identificador(coluna) for coluna in colunas)},
+               GROUPING({", ".join(_identificador(coluna) for coluna in colunas)}) AS conjunto,
+               COUNT(*) AS quantidade{somas}
+        FROM base
+        GROUP BY GROUPING SETS ({agrupamentos})
+    """
+    resultado = _cursor().execute(sql, parametros).df()
+
+    def mascara(conjunto):
+        # GROUPING() liga o bit das colunas agregadas; a primeira coluna é o bit mais significativo
+        return sum(1 << (len(colunas) - 1 - i) for i, coluna in enumerate(colunas) if coluna not in conjunto)
+
+    tabelas = {}
+    for conjunto in conjuntos:
+        linhas = resultado[resultado['conjunto'] == mascara(conjunto)].dropna(subset=list(conjunto))
+        indice = pd.DataFrame({
+            coluna: pd.to_numeric(linhas[coluna], downcast='integer') if pd.api.types.is_numeric_dtype(linhas[coluna]) else linhas[coluna]
+            for coluna in conjunto
+        })
+        if conjunto == ('Ano',):
+            tabelas[conjunto] = pd.Series(linhas['quantidade'].to_numpy(), index=pd.Index(indice['Ano'], name='Ano')).sort_index()
+        else:
+            serie = pd.Series(linhas['quantidade'].to_numpy(), index=pd.MultiIndex.from_frame(indice))
+            tabelas[conjunto[1:]] = ordenar_para_exibicao(serie)
+
+    totais = resultado[resultado['conjunto'] == mascara(('Ano',))]
+    somas_por_ano = {
+        coluna: pd.DataFrame(
+            {'sum': totais[f'soma_{i}'].to_numpy(dtype=float), 'count': totais[f'contagem_{i}'].to_numpy()},
+            index=pd.Index(pd.to_numeric(totais['Ano'], downcast='integer'), name='Ano'),
+        ).sort_index()
+        for i, coluna in enumerate(medidas)
+    }
+    return Cubo(tabelas, somas_por_ano)
@@ -0,0 +1,287 @@
+import threading
+from agregados import anos_do_periodo
+from caches import CacheLimitado
+
+MAX_FREQUENCIAS_EM_CACHE = 16
+
+# Pergunta -> função que monta o contexto; preenchido pelo decorador `contexto`
+pergunta_para_funcao = {}
+# Pergunta -> palavras extras (sinônimos) usadas para rotear perguntas livres (ver roteamento.py)
+termos_por_pergunta = {}
+# Pergunta sobre um ano fixo -> função (data, ano) usada quando a pergunta livre cita outro ano
+contexto_por_ano = {}
+
+_frequencias = CacheLimitado('frequencias', MAX_FREQUENCIAS_EM_CACHE)
+
+
+class Frequencias:
+    """
+    Tabelas de frequência compartilhadas por todos os contextos de um mesmo filtro.
+    Cada tabela é calculada na primeira vez em que um contexto a pede e reaproveitada depois.
+    """
+
+    def __init__(self):
+        self._tabelas = {}
+        self._lock = threading.Lock()
+
+    def _memo(self, chave, calcular):
+        with self._lock:
+            if chave not in self._tabelas:
+                self._tabelas[chave] = calcular()
+            return self._tabelas[chave]
+
+    def contagens(self, coluna):
+        """
+        Contagens da coluna em ordem decrescente, sem valores ausentes no filtro.
+        Empates mantêm a ordem das categorias (ou de aparição, em colunas de texto).
+        """
+        return self._memo(('contagens', coluna), lambda: self._ordenar(self._contar(coluna)))
+
+    def por_ano(self, coluna):
+        """
+        Tabela Ano x valores da coluna, com zero onde não houve óbitos.
+        """
+        return self._memo(('por_ano', coluna), lambda: self._cruzar(coluna))
+
+    def media(self, coluna):
+        return self._memo(('media', coluna), lambda: self._media(coluna))
+
+    @staticmethod
+    def _ordenar(serie):
+        serie = serie[serie > 0]
+        return serie.sort_values(ascending=False, kind='stable')
+
+
+class FrequenciasDataFrame(Frequencias):
+    """
+    Frequências calculadas sob demanda a partir das linhas de um DataFrame.
+    """
+
+    def __init__(self, data):
+        super().__init__()
+        self.data = data
+
+    def _contar(self, coluna):
+        return self.data[coluna].value_counts(sort=False)
+
+    def _cruzar(self, coluna):
+        return self.data.groupby(['Ano', coluna], observed=True).size().unstack(fill_value=0)
+
+    def _media(self, coluna):
+        return self.data[coluna].mean()
+
+
+class FrequenciasCubo(Frequencias):
+    """
+    Frequências de um ano, de um período (tupla de anos) ou de todos (ano=None) obtidas fatiando o cubo de agregados,
+    sem varrer as linhas do dataset.
+    """
+
+    def __init__(self, cubo, ano=None):
+        super().__init__()
+        self.cubo = cubo
+        self.ano = ano
+
+    def _contar(self, coluna):
+        return self.cubo.contagens(coluna, self.ano)
+
+    def _cruzar(self, coluna):
+        tabela = self.cubo.tabelas[(coluna,)]
+        if self.ano is not None:
+            tabela = tabela[tabela.index.get_level_values(0).isin(anos_do_periodo(self.ano))]
+        return tabela.unstack(fill_value=0)
+
+    def _media(self, coluna):
+        return self.cubo.media(coluna, self.ano)
+
+
+def frequencias(data):
+    """
+    Aceita tanto as frequências já prontas quanto um DataFrame (ex.: nos testes).
+    """
+    return data if isinstance(data, Frequencias) else FrequenciasDataFrame(data)
+
+
+def obter_frequencias(cubo, versao, ano=None):
+    """
+    Frequências do filtro (versão do dataset, ano), compartilhadas entre reruns e sessões.
+    """
+    return _frequencias.obter((versao, ano), lambda: FrequenciasCubo(cubo, ano))
+
+
+def contexto(pergunta, termos='', por_ano=None):
+    """
+    Registra a função como geradora do contexto da pergunta. `termos` são palavras que
+    perguntas livres usam para pedir o mesmo contexto; `por_ano`, para perguntas sobre um
+    ano fixo, gera o mesmo contexto para o ano citado na pergunta livre.
+    """
+    def registrar(funcao):
+        pergunta_para_funcao[pergunta] = funcao
+        termos_por_pergunta[pergunta] = termos
+        if por_ano is not None:
+            contexto_por_ano[pergunta] = por_ano
+        return funcao
+    return registrar
+
+
+def _mais_frequente(data, coluna, excluir=()):
+    contagens = frequencias(data).contagens(coluna)
+    if excluir:
+        contagens = contagens[~contagens.index.isin(excluir)]
+    if contagens.empty:
+        return None, 0
+    return contagens.index[0], int(contagens.iloc[0])
+
+
+def contexto_obitos_no_ano(data, ano):
+    total_obitos = int(frequencias(data).contagens('Ano').get(ano, 0))
+    return f"No ano de {ano}, ocorreram {total_obitos} óbitos em Franca."
+
+
+def _obitos_no_ano_citado(data, ano):
+    # Ano citado numa pergunta livre pode estar fora do extrato: não responder com zero óbitos
+    contagens = frequencias(data).contagens('Ano')
+    if not contagens.empty and not contagens.index.min() <= ano <= contagens.index.max():
+        return f"Os dados disponíveis não incluem o ano de {ano}."
+    return contexto_obitos_no_ano(data, ano)
+
+
+# Funções de contexto para cada pergunta
+@contexto("Quantos óbitos ocorreram em 2021?", termos="total mortes mortos vítimas fatais número ano", por_ano=_obitos_no_ano_citado)
+def contexto_obitos_2021(data):
+    return contexto_obitos_no_ano(data, 2021)
+
+@contexto("Qual a faixa etária mais afetada por acidentes?", termos="idade idades jovens idosos crianças adultos anos de idade grupo etário")
+def contexto_faixa_etaria_mais_afetada(data):
+    faixa_etaria_mais_afetada, total = _mais_frequente(data, 'Faixa etaria')
+    contexto = f"A faixa etária mais afetada por acidentes é entre {faixa_etaria_mais_afetada}, com {total} óbitos."
+    return contexto
+
+@contexto("Em qual bairro ocorreram mais óbitos?", termos="onde local lugar região regiões bairros")
+def contexto_bairro_mais_obitos(data):
+    bairro_mais_obitos, total = _mais_frequente(data, 'Bairro', excluir=['Bairro não identificado'])
+    if bairro_mais_obitos is None:
+        contexto = "Não há dados disponíveis sobre os bairros identificados."
+    else:
+        contexto = f"O bairro com mais óbitos é {bairro_mais_obitos}, com {total} óbitos."
+    return contexto
+
+@contexto("Qual o tipo de via com mais óbitos?", termos="rua ruas avenida avenidas rodovia rodovias estrada estradas vias")
+def contexto_tipo_via_mais_obitos(data):
+    tipo_via_mais_obitos, total = _mais_frequente(data, 'Tipo de Via')
+    contexto = f"O tipo de via com mais óbitos são as {tipo_via_mais_obitos}, com {total} óbitos."
+    return contexto
+
+@contexto("Quantos óbitos ocorreram em cada dia da semana?", termos="segunda terça quarta quinta sexta sábado domingo fim de semana dias")
+def contexto_obitos_por_dia_semana(data):
+    obitos_por_dia = frequencias(data).contagens('Dia da Semana')
+    contexto = "Número de óbitos por dia da semana:\n"
+    contexto += "".join(f"{dia}: {total} óbitos\n" for dia, total in obitos_por_dia.items())
+    return contexto
+
+@contexto("Qual o horário com mais óbitos?", termos="hora horas horários que horas")
+def contexto_horario_mais_obitos(data):
+    horario_mais_obitos, total = _mais_frequente(data, 'Hora do Sinistro')
+    contexto = f"O horário com mais óbitos é às {horario_mais_obitos} horas, com {total} óbitos."
+    return contexto
+
+@contexto("Qual o sexo com mais acidentes?", termos="gênero homens mulheres masculino feminino homem mulher")
+def contexto_sexo_mais_acidentes(data):
+    sexo_mais_acidentes, total = _mais_frequente(data, 'Sexo')
+    contexto = f"O sexo com mais acidentes é {sexo_mais_acidentes}, com {total} ocorrências."
+    return contexto
+
+@contexto("Qual o mês com mais acidentes?", termos="meses época do ano")
+def contexto_mes_mais_acidentes(data):
+    mes_mais_acidentes, total = _mais_frequente(data, 'Mes do Sinistro')
+    contexto = f"O mês com mais acidentes é o mês {mes_mais_acidentes}, com {total} acidentes."
+    return contexto
+
+@contexto("Qual o dia do mês com mais acidentes?", termos="data datas dias do mês")
+def contexto_dia_mes_mais_acidentes(data):
+    dia_mes_mais_acidentes, total = _mais_frequente(data, 'Dia do Sinistro')
+    contexto = f"O dia do mês com mais acidentes é o dia {dia_mes_mais_acidentes}, com {total} acidentes."
+    return contexto
+
+@contexto("Qual o período do dia com mais óbitos?", termos="turno turnos manhã tarde noite madrugada")
+def contexto_periodo_dia_mais_obitos(data):
+    periodo_mais_obitos, total = _mais_frequente(data, 'Turno')
+    contexto = f"O período do dia com mais óbitos é o período da {periodo_mais_obitos}, com {total} óbitos."
+    return contexto
+
+@contexto("Qual o meio de locomoção com mais óbitos?", termos="veículo veículos moto motos motocicleta carro carros automóvel bicicleta ciclista motociclista transporte")
+def contexto_meio_locomocao_mais_obitos(data):
+    meio_locomocao_mais_obitos, total = _mais_frequente(data, 'Meio de locomocao da vitima')
+    contexto = f"O meio de locomoção com mais óbitos é {meio_locomocao_mais_obitos}, com {total} óbitos."
+    return contexto
+
+@contexto("Quais os tipos de acidentes mais comuns?", termos="tipo atropelamento atropelamentos colisão colisões choque batida batidas tombamento sinistro sinistros")
+def contexto_tipos_acidentes_mais_comuns(data):
+    tipos_acidentes = frequencias(data).contagens('Tipo de Sinistro').head(5)
+    contexto = "Os tipos de acidentes mais comuns são:\n"
+    contexto += "".join(f"{tipo}: {total} ocorrências\n" for tipo, total in tipos_acidentes.items())
+    return contexto
+
+@contexto("Em quais meses ocorrem mais óbitos em comparação com outros anos?", termos="pico picos meses por ano comparar anos evolução")
+def contexto_comparativo_obitos_por_mes(data):
+    obitos_por_mes_ano = frequencias(data).por_ano('Mes do Sinistro')
+    # Mês de pico de cada ano, de uma vez para todas as linhas da tabela
+    meses_pico = obitos_por_mes_ano.idxmax(axis=1)
+    totais_pico = obitos_por_mes_ano.max(axis=1)
+
+    contexto = "Meses com os maiores picos de óbitos por ano:\n"
+    contexto += "".join(
+        f"{ano}: {mes_max} - {int(total)} óbitos\n"
+        for ano, mes_max, total in zip(obitos_por_mes_ano.index, meses_pico, totais_pico)
+    )
+    return contexto
+
+@contexto("Qual a média de óbitos por bairro?", termos="média bairros distribuição")
+def contexto_media_obitos_por_bairro(data):
+    media_obitos = round(frequencias(data).contagens('Bairro').mean())
+    contexto = f"A média de óbitos por bairro é de {media_obitos} óbitos por bairro."
+    return contexto
+
+@contexto("Qual a proporção de óbitos por tipo de vítima (condutor, passageiro, pedestre)?", termos="percentual porcentagem motorista motoristas condutores passageiros pedestres vítima")
+def contexto_proporcao_obitos_por_tipo_vitima(data):
+    contagens = frequencias(data).contagens('Tipo de vitima')
+    tipos_vitima = contagens / contagens.sum() * 100
+    contexto = "Proporção de óbitos por tipo de vítima (em %):\n"
+    contexto += "".join(f"{tipo}: {proporcao:.2f}%\n" for tipo, proporcao in tipos_vitima.items())
+    return contexto
+
+@contexto("Qual a idade média das vítimas de acidentes de trânsito?", termos="média de idade anos velhas novas")
+def contexto_idade_media_vitimas(data):
+    idade_media = round(frequencias(data).media('Idade da vitima'))
+    contexto = f"A idade média das vítimas de acidentes de trânsito é de {idade_media} anos."
+    return contexto
+
+@contexto("Como foi o comparativo de óbitos entre dezembro e janeiro nos anos de 2019 a 2023?", termos="festas férias natal ano novo fim de ano")
+def contexto_comparativo_dezembro_janeiro(data):
+    obitos_por_mes_ano = frequencias(data).por_ano('Mes do Sinistro')
+    meses_presentes = [mes for mes in (12, 1) if mes in obitos_por_mes_ano.columns]
+    obitos_dezembro_janeiro = obitos_por_mes_ano[meses_presentes]
+    obitos_dezembro_janeiro = obitos_dezembro_janeiro[obitos_dezembro_janeiro.sum(axis=1) > 0]
+    if obitos_dezembro_janeiro.empty:
+        return "Não há dados suficientes para comparar os óbitos entre dezembro e janeiro nos anos de 2019 a 2023."
+
+    obitos_dezembro_janeiro = obitos_dezembro_janeiro.reindex(columns=[12, 1], fill_value=0)
+    dezembros = obitos_dezembro_janeiro[12]
+    janeiros = obitos_dezembro_janeiro[1]
+    deltas = janeiros - dezembros
+
+    contexto = "Comparativo de óbitos entre dezembro e janeiro (2019-2023):\n"
+    contexto += "".join(
+        f"Ano: {ano} - Dezembro: {dezembro} óbitos, Janeiro: {janeiro} óbitos - Diferença: {delta} óbitos\n"
+        for ano, dezembro, janeiro, delta in zip(obitos_dezembro_janeiro.index, dezembros, janeiros, deltas)
+    )
+    resumo = [f"{ano}: {delta} óbitos" for ano, delta in zip(obitos_dezembro_janeiro.index, deltas)]
+
+    insight = """
+    Embora os meses de dezembro e janeiro sejam frequentemente associados a festividades e férias, os dados indicam uma variação nos óbitos ao longo dos anos. 
+    Nos últimos dois anos (2022 e 2023), houve uma leve redução, embora não muito expressiva. Em contraste, 2020 e 2021 registraram um aumento no número de óbitos. 
+    Esse padrão sugere uma tendência de estabilização nas ocorrências de óbitos durante esse período, com uma diminuição gradual ao longo dos últimos anos, apesar das 
+    festividades típicas desse período.
+    """
+    resumo_sucinto = f"\nResumo: {', '.join(resumo)}"
+    return contexto + insight + resumo_sucinto
@@ -0,0 +1,346 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from metricas import contar
+
+CAMINHO_CSV = 'obitos_final.csv'
+DIRETORIO_CACHE = '.cache'
+DIRETORIO_ARMAZEM = 'armazem'
+ARQUIVO_METADADOS = 'metadados.json'
+LINHAS_POR_BLOCO = 200_000
+
+# Incrementar sempre que a tipagem mudar, para invalidar os snapshots antigos
+VERSAO_ESQUEMA = 4
+
+COLUNAS_CATEGORICAS = [
+    'Tipo de Via', 'Dia da Semana', 'Turno', 'Municipio', 'Regiao Administrativa',
+    'Logradouro', 'Jurisdicao', 'Administracao', 'Conservacao', 'Tipo de local do sinistro',
+    'Meio de locomocao da vitima', 'Tipo de vitima', 'Local do Obito', 'Tipo de Sinistro',
+    'Sexo', 'Faixa etaria', 'Outro Veiculo Envolvido', 'Bairro',
+]
+
+# Inteiros anuláveis: valores em branco ou "NAO DISPONIVEL" viram <NA> em vez de impedir o carregamento
+COLUNAS_INTEIRAS = {
+    'Ano': 'Int16',
+    'Dia do Sinistro': 'Int8',
+    'Mes do Sinistro': 'Int8',
+    'Ano do Sinistro': 'Int16',
+    'Hora do Sinistro': 'Int8',
+    'Idade da vitima': 'Int16',
+}
+
+COLUNAS_COORDENADAS = ['Latitude', 'Longitude']
+
+ORDEM_TURNOS = ['Madrugada', 'Manhã', 'Tarde', 'Noite', 'Desconhecido']
+ORDEM_DIAS_SEMANA = ['DOMINGO', 'SEGUNDA', 'TERCA', 'QUARTA', 'QUINTA', 'SEXTA', 'SABADO']
+NOMES_MESES = [
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro',
+]
+ORDENS_CONHECIDAS = {'Dia da Semana': ORDEM_DIAS_SEMANA, 'Nome do Mes': NOMES_MESES, 'Turno Calculado': ORDEM_TURNOS}
+COLUNAS_ORDENADAS = [*ORDENS_CONHECIDAS, 'Faixa etaria']
+
+# Colunas calculadas em adicionar_colunas_derivadas e a coluna do extrato de onde vêm
+COLUNAS_DERIVADAS = {'Turno Calculado': 'Hora do Sinistro', 'Nome do Mes': 'Mes do Sinistro'}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def impressao_digital(caminho=CAMINHO_CSV, municipios=None, anos=None):
+    """
+    Identificador da versão do arquivo de dados (tamanho, data de modificação e versão do esquema).
+    Para o armazém particionado, usa o arquivo de metadados, regravado a cada ingestão.
+    Filtros de município e ano, quando informados, também entram no identificador.
+    """
+    if os.path.isdir(caminho):
+        caminho = os.path.join(caminho, ARQUIVO_METADADOS)
+    info = os.stat(caminho)
+    chave = f"{VERSAO_ESQUEMA}:{info.st_size}:{info.st_mtime_ns}"
+    if municipios is not None or anos is not None:
+        chave += f":{_normalizar_filtro(municipios)}:{_normalizar_filtro(anos)}"
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16]
+
+
+def _normalizar_filtro(valores):
+    return None if valores is None else tuple(sorted(valores))
+
+
+def converter_tipos(data):
+    """
+    Converte as colunas do extrato do Infosiga para tipos compactos.
+    """
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in data.columns:
+            data[coluna] = data[coluna].astype('category')
+    for coluna, tipo in COLUNAS_INTEIRAS.items():
+        if coluna in data.columns:
+            data[coluna] = pd.to_numeric(data[coluna], errors='coerce').astype(tipo)
+    # Coordenadas vêm com vírgula decimal ("-20,502819")
+    for coluna in COLUNAS_COORDENADAS:
+        if coluna in data.columns and data[coluna].dtype == object:
+            data[coluna] = pd.to_numeric(data[coluna].str.replace(',', '.', regex=False), errors='coerce')
+    if 'Data do Sinistro' in data.columns:
+        data['Data do Sinistro'] = pd.to_datetime(data['Data do Sinistro'], format='%d/%m/%y', errors='coerce')
+    if 'Ano/Mes do Obito' in data.columns:
+        data['Ano/Mes do Obito'] = pd.to_datetime(data['Ano/Mes do Obito'], errors='coerce')
+    return data
+
+
+def classificar_turno(hora):
+    """
+    Classifica a hora do sinistro em turnos do dia de forma vetorizada.
+    Aceita um valor único (retorna str) ou uma lista/Series de horas (retorna Series categórica).
+    """
+    escalar = np.ndim(hora) == 0
+    horas = pd.to_numeric(pd.Series([hora] if escalar else hora, dtype='object'), errors='coerce')
+    condicoes = [
+        horas.isna(),
+        (horas >= 6) & (horas < 12),
+        (horas >= 12) & (horas < 18),
+        (horas >= 18) & (horas < 24),
+    ]
+    turnos = np.select(condicoes, ['Desconhecido', 'Manhã', 'Tarde', 'Noite'], default='Madrugada')
+    if escalar:
+        return str(turnos[0])
+    return pd.Series(pd.Categorical(turnos, categories=ORDEM_TURNOS, ordered=True), index=horas.index)
+
+
+def _ordenar_categorias(serie, ordem):
+    # Mantém no final, em ordem alfabética, valores que não estão na ordem conhecida
+    existentes = list(serie.cat.categories) if isinstance(serie.dtype, pd.CategoricalDtype) else sorted(serie.dropna().unique())
+    extras = sorted(valor for valor in existentes if valor not in ordem)
+    return serie.astype(pd.CategoricalDtype([*ordem, *extras], ordered=True))
+
+
+def _ordem_faixas_etarias(faixas):
+    def inicio(faixa):
+        numero = faixa.split(' ')[0]
+        return int(numero) if numero.isdigit() else float('inf')
+    return sorted(faixas, key=lambda faixa: (inicio(faixa), faixa))
+
+
+def ordem_exibicao(coluna, valores):
+    """
+    Ordem dos valores de uma coluna nos gráficos: a ordem conhecida (dias da semana, meses, turnos
+    e faixas etárias) e depois os demais valores em ordem alfabética.
+    """
+    valores = sorted(set(valores))
+    if coluna == 'Faixa etaria':
+        return _ordem_faixas_etarias(valores)
+    ordem = ORDENS_CONHECIDAS.get(coluna)
+    if ordem is None:
+        return valores
+    return [*ordem, *(valor for valor in valores if valor not in ordem)]
+
+
+def adicionar_colunas_derivadas(data):
+    """
+    Calcula uma única vez, no carregamento, as colunas derivadas usadas pelo dashboard:
+    turno pela hora do sinistro, ordem dos dias da semana, nome do mês e ordem das faixas etárias.
+    """
+    if 'Hora do Sinistro' in data.columns:
+        data['Turno Calculado'] = classificar_turno(data['Hora do Sinistro'])
+    if 'Dia da Semana' in data.columns:
+        data['Dia da Semana'] = _ordenar_categorias(data['Dia da Semana'], ORDEM_DIAS_SEMANA)
+    if 'Mes do Sinistro' in data.columns:
+        # Mês ausente ou fora de 1..12 vira o código -1 (sem categoria)
+        meses = data['Mes do Sinistro'].astype('Int16')
+        data['Nome do Mes'] = pd.Categorical.from_codes(
+            meses.where(meses.between(1, 12)).fillna(0).to_numpy(dtype='int16') - 1,
+            categories=NOMES_MESES,
+            ordered=True,
+        )
+    if 'Faixa etaria' in data.columns:
+        faixas = data['Faixa etaria'].astype('category').cat.categories
+        data['Faixa etaria'] = _ordenar_categorias(data['Faixa etaria'], _ordem_faixas_etarias(faixas))
+    return data
+
+
+def ler_csv(caminho=CAMINHO_CSV):
+    """
+    Lê o CSV do Infosiga (separado por ';') e aplica a tipagem.
+    """
+    tipos = {coluna: 'category' for coluna in COLUNAS_CATEGORICAS}
+    tipos['Numeral / KM'] = 'string'
+    data = pd.read_csv(caminho, delimiter=';', index_col=0, encoding='utf-8-sig', dtype=tipos)
+    return converter_tipos(data)
+
+
+def _colunas_lidas(colunas, municipios, anos):
+    # As colunas dos filtros são lidas mesmo fora da projeção e descartadas no final
+    if colunas is None:
+        return None
+    filtradas = [coluna for coluna, filtro in (('Municipio', municipios), ('Ano', anos)) if filtro is not None]
+    return [*colunas, *(coluna for coluna in filtradas if coluna not in colunas)]
+
+
+def _filtrar(bloco, municipios, anos):
+    manter = pd.Series(True, index=bloco.index)
+    if municipios is not None:
+        manter &= bloco['Municipio'].isin(municipios)
+    if anos is not None:
+        manter &= pd.to_numeric(bloco['Ano'], errors='coerce').isin(anos)
+    if manter.all():
+        return bloco
+    bloco = bloco[manter.values].copy()
+    # Não carrega adiante as categorias que só existiam nas linhas descartadas
+    for coluna in bloco.select_dtypes('category').columns:
+        bloco[coluna] = bloco[coluna].cat.remove_unused_categories()
+    return bloco
+
+
+def ler_csv_em_blocos(caminho=CAMINHO_CSV, colunas=None, municipios=None, anos=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê o CSV do Infosiga em blocos de até `linhas_por_bloco` linhas, com memória limitada a um bloco.
+    Só as `colunas` pedidas são carregadas, e as linhas fora de `municipios`/`anos` são descartadas
+    antes da tipagem. Cada bloco já sai tipado; blocos sem nenhuma linha filtrada são pulados.
+    """
+    cabecalho = pd.read_csv(caminho, delimiter=';', index_col=0, encoding='utf-8-sig', nrows=0).columns
+    lidas = _colunas_lidas(colunas, municipios, anos)
+    posicoes = None if lidas is None else [0] + [posicao + 1 for posicao, coluna in enumerate(cabecalho) if coluna in lidas]
+    tipos = {coluna: 'category' for coluna in COLUNAS_CATEGORICAS}
+    tipos['Numeral / KM'] = 'string'
+
+    algum = False
+    ultimo = None
+    leitor = pd.read_csv(caminho, delimiter=';', index_col=0, encoding='utf-8-sig', dtype=tipos,
+                         usecols=posicoes, chunksize=linhas_por_bloco)
+    with leitor:
+        for bloco in leitor:
+            ultimo = _filtrar(bloco, municipios, anos)
+            if not ultimo.empty:
+                algum = True
+                yield converter_tipos(ultimo)
+    if not algum and ultimo is not None:
+        # Nenhuma linha passou nos filtros: devolve o esquema vazio
+        yield converter_tipos(ultimo)
+
+
+def particoes_armazem(diretorio=DIRETORIO_ARMAZEM, anos=None):
+    """
+    Resumos das partições Ano/Mês do armazém (ver armazem.py), em ordem cronológica, lidos só dos
+    metadados; o filtro de anos descarta partições inteiras sem abri-las.
+    """
+    with open(os.path.join(diretorio, ARQUIVO_METADADOS), encoding='utf-8') as arquivo:
+        metadados = json.load(arquivo)
+    particoes = sorted(metadados['particoes'].values(), key=lambda particao: (particao['ano'], particao['mes']))
+    if anos is not None:
+        particoes = [particao for particao in particoes if particao['ano'] in anos]
+    return particoes
+
+
+def ler_particao(diretorio, particao, colunas=None, municipios=None):
+    """
+    Lê uma partição do armazém, com o filtro de municípios e a projeção de colunas aplicados na leitura do Parquet.
+    """
+    lidas = _colunas_lidas(colunas, municipios, None)
+    filtros = None if municipios is None else [('Municipio', 'in', list(municipios))]
+    bloco = pd.read_parquet(os.path.join(diretorio, particao['arquivo']), columns=lidas, filters=filtros)
+    return bloco.drop(columns=['_chave'], errors='ignore')
+
+
+def ler_particoes_em_blocos(diretorio=DIRETORIO_ARMAZEM, colunas=None, municipios=None, anos=None):
+    """
+    Lê o armazém uma partição Ano/Mês por vez, em ordem cronológica.
+    """
+    for particao in particoes_armazem(diretorio, anos):
+        yield ler_particao(diretorio, particao, colunas, municipios)
+
+
+def ler_em_blocos(caminho=CAMINHO_CSV, colunas=None, municipios=None, anos=None):
+    if os.path.isdir(caminho):
+        return ler_particoes_em_blocos(caminho, colunas, municipios, anos)
+    return ler_csv_em_blocos(caminho, colunas, municipios, anos)
+
+
+def ler_fonte(caminho=CAMINHO_CSV, colunas=None, municipios=None, anos=None):
+    """
+    Lê o CSV ou o armazém particionado já filtrado, juntando os blocos em um único DataFrame tipado.
+    """
+    blocos = list(ler_em_blocos(caminho, colunas, municipios, anos))
+    if not blocos:
+        return pd.DataFrame()
+    data = pd.concat(blocos, ignore_index=os.path.isdir(caminho))
+    if colunas is not None:
+        data = data[[coluna for coluna in colunas if coluna in data.columns]]
+    # Cada bloco tem as próprias categorias; a concatenação volta a texto
+    return converter_tipos(data) if len(blocos) > 1 else data
+
+
+def _prefixo_snapshot(caminho, municipios=None, anos=None):
+    # Nome da fonte e hash do filtro: cada combinação de município e ano tem os próprios snapshots
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    if municipios is None and anos is None:
+        return f"{nome}-todos-"
+    filtro = repr((_normalizar_filtro(municipios), _normalizar_filtro(anos)))
+    return f"{nome}-{hashlib.sha1(filtro.encode('utf-8')).hexdigest()[:8]}-"
+
+
+def caminho_snapshot(caminho, impressao, diretorio=DIRETORIO_CACHE, municipios=None, anos=None):
+    return os.path.join(diretorio, f"{_prefixo_snapshot(caminho, municipios, anos)}{impressao}.parquet")
+
+
+def _remover_snapshots_antigos(atual, diretorio, prefixo):
+    # Só versões anteriores do mesmo filtro: snapshots de outros filtros continuam válidos
+    for arquivo in os.listdir(diretorio):
+        completo = os.path.join(diretorio, arquivo)
+        if arquivo.startswith(prefixo) and arquivo.endswith('.parquet') and completo != atual:
+            try:
+                os.remove(completo)
+            except OSError:
+                pass
+
+
+def carregar_snapshot(caminho=CAMINHO_CSV, diretorio=DIRETORIO_CACHE, municipios=None, anos=None):
+    """
+    Retorna os dados tipados a partir do snapshot Parquet, recriando-o quando o CSV
+    (ou o armazém particionado) mudar. Com `municipios`/`anos`, a fonte é lida em blocos
+    e só as linhas filtradas chegam a ser tipadas e guardadas.
+    """
+    impressao = impressao_digital(caminho, municipios, anos)
+    snapshot = caminho_snapshot(caminho, impressao, diretorio, municipios, anos)
+    if os.path.exists(snapshot):
+        try:
+            return pd.read_parquet(snapshot)
+        except Exception:
+            # Snapshot corrompido (ex.: escrita interrompida): recria a partir do CSV
+            pass
+
+    data = adicionar_colunas_derivadas(ler_fonte(caminho, municipios=municipios, anos=anos))
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{snapshot}.{os.getpid()}.tmp"
+        data.to_parquet(temporario)
+        os.replace(temporario, snapshot)
+        _remover_snapshots_antigos(snapshot, diretorio, _prefixo_snapshot(caminho, municipios, anos))
+    except OSError:
+        # Sem permissão de escrita: segue apenas com o cache em memória
+        pass
+    return data
+
+
+def carregar_dados(caminho=CAMINHO_CSV, diretorio=DIRETORIO_CACHE, municipios=None, anos=None):
+    """
+    Carrega os dados tipados uma única vez por processo, versão do arquivo e filtro.
+    O DataFrame retornado é compartilhado entre sessões e não deve ser modificado.
+    """
+    chave = (os.path.abspath(caminho), _normalizar_filtro(municipios), _normalizar_filtro(anos))
+    impressao = impressao_digital(caminho, municipios, anos)
+    with _cache_lock:
+        em_cache = _cache.get(chave)
+        if em_cache is not None and em_cache[0] == impressao:
+            contar('cache_dados_acertos')
+            return em_cache[1]
+        contar('cache_dados_falhas')
+        data = carregar_snapshot(caminho, diretorio, municipios, anos)
+        _cache[chave] = (impressao, data)
+        return data
+
+
+def limpar_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,81 @@
+import math
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from caches import CacheLimitado
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+MAX_EXPLORADORES_EM_CACHE = 8
+
+Pagina = namedtuple('Pagina', ['dados', 'numero', 'total_paginas', 'total_linhas'])
+
+# (versão do dataset, ano) -> Explorador
+_exploradores = CacheLimitado('exploradores', MAX_EXPLORADORES_EM_CACHE)
+
+
+class Explorador:
+    """
+    Paginação dos dados brutos no servidor. As ordenações e a última busca ficam guardadas
+    como posições das linhas, e cada página é só a fatia dessas posições com as colunas
+    escolhidas: apenas as linhas visíveis são enviadas ao navegador.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._ordens = {}
+        self._busca = None
+        self._lock = threading.Lock()
+
+    def ordem(self, coluna, crescente=True):
+        """
+        Posições das linhas ordenadas pela coluna (categorias na ordem de exibição, vazios por último).
+        """
+        chave = (coluna, crescente)
+        with self._lock:
+            if chave not in self._ordens:
+                serie = self.data[coluna].reset_index(drop=True)
+                self._ordens[chave] = serie.sort_values(ascending=crescente, kind='stable', na_position='last').index.to_numpy()
+            return self._ordens[chave]
+
+    def correspondencias(self, termo, colunas):
+        """
+        Máscara das linhas em que alguma das colunas contém o termo (sem diferenciar maiúsculas).
+        Em colunas categóricas a busca é feita nas categorias e aplicada pelos códigos.
+        """
+        chave = (termo.casefold(), tuple(colunas))
+        with self._lock:
+            if self._busca is not None and self._busca[0] == chave:
+                return self._busca[1]
+
+        mascara = np.zeros(len(self.data), dtype=bool)
+        for coluna in colunas:
+            serie = self.data[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                categorias = serie.cat.categories.astype(str).str.contains(termo, case=False, regex=False)
+                mascara |= np.isin(serie.cat.codes.to_numpy(), np.flatnonzero(categorias))
+            else:
+                mascara |= serie.astype('string').str.contains(termo, case=False, regex=False, na=False).to_numpy(dtype=bool)
+
+        with self._lock:
+            self._busca = (chave, mascara)
+        return mascara
+
+    def pagina(self, numero=1, tamanho=TAMANHOS_PAGINA[0], colunas=None, ordenar_por=None, crescente=True, busca=''):
+        colunas = list(self.data.columns) if colunas is None else list(colunas)
+        posicoes = self.ordem(ordenar_por, crescente) if ordenar_por else np.arange(len(self.data))
+        if busca:
+            posicoes = posicoes[self.correspondencias(busca, colunas)[posicoes]]
+
+        total_paginas = max(1, math.ceil(len(posicoes) / tamanho))
+        numero = min(max(1, int(numero)), total_paginas)
+        fatia = posicoes[(numero - 1) * tamanho:numero * tamanho]
+        dados = self.data.iloc[fatia, self.data.columns.get_indexer(colunas)]
+        return Pagina(dados, numero, total_paginas, len(posicoes))
+
+
+def obter_explorador(data, versao, ano=None):
+    """
+    Explorador do filtro (versão do dataset, ano), com as ordenações e a busca já calculadas.
+    """
+    return _exploradores.obter((versao, ano), lambda: Explorador(data))
@@ -0,0 +1,129 @@
+import gzip
+import os
+import threading
+from collections import namedtuple
+from dados import DIRETORIO_CACHE, LINHAS_POR_BLOCO
+
+DIRETORIO_EXPORTACOES = os.path.join(DIRETORIO_CACHE, 'exportacoes')
+NOME_EXPORTACAO = 'obitos_final'
+MAX_LINHAS_XLSX = 1_048_575  # limite de linhas de uma planilha, descontado o cabeçalho
+# st.download_button manda o arquivo inteiro pela memória do servidor a cada vez que é mostrado;
+# acima disso o app pede um filtro menor em vez de oferecer o download
+MAX_BYTES_DOWNLOAD = int(os.getenv('INFOSIGA_MAX_DOWNLOAD_MB', '50')) * 1024 * 1024
+
+Formato = namedtuple('Formato', ['rotulo', 'extensao', 'mime', 'escrever'])
+
+# Formato -> como gravar o arquivo, registrado com @formato
+FORMATOS_EXPORTACAO = {}
+
+# Um lock por arquivo: sessões pedindo o mesmo arquivo esperam a primeira gerá-lo
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def formato(id_formato, rotulo, extensao, mime):
+    def registrar(funcao):
+        FORMATOS_EXPORTACAO[id_formato] = Formato(rotulo, extensao, mime, funcao)
+        return funcao
+    return registrar
+
+
+def _blocos(data, linhas_por_bloco):
+    for inicio in range(0, max(len(data), 1), linhas_por_bloco):
+        yield data.iloc[inicio:inicio + linhas_por_bloco]
+
+
+@formato('csv.gz', 'CSV compactado (.csv.gz)', 'csv.gz', 'application/gzip')
+def _escrever_csv_gz(data, caminho, linhas_por_bloco):
+    with gzip.open(caminho, 'wt', encoding='utf-8', newline='') as arquivo:
+        for i, bloco in enumerate(_blocos(data, linhas_por_bloco)):
+            bloco.to_csv(arquivo, index=False, header=i == 0)
+
+
+@formato('parquet', 'Parquet (.parquet)', 'parquet', 'application/vnd.apache.parquet')
+def _escrever_parquet(data, caminho, linhas_por_bloco):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloco in _blocos(data, linhas_por_bloco):
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+@formato('xlsx', 'Excel (.xlsx)', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+def _escrever_xlsx(data, caminho, linhas_por_bloco):
+    from openpyxl import Workbook
+
+    if len(data) > MAX_LINHAS_XLSX:
+        raise ValueError(f"O Excel comporta até {MAX_LINHAS_XLSX} linhas; o filtro tem {len(data)}.")
+    # Modo write_only: as linhas vão para o arquivo à medida que são adicionadas
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Dados')
+    aba.append(list(data.columns))
+    for bloco in _blocos(data, linhas_por_bloco):
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            aba.append(linha)
+    planilha.save(caminho)
+
+
+def _filtro(filtro):
+    return 'todos' if filtro is None else str(filtro)
+
+
+def nome_arquivo(id_formato, filtro=None):
+    sufixo = '' if filtro is None else f"_{filtro}"
+    return f"{NOME_EXPORTACAO}{sufixo}.{FORMATOS_EXPORTACAO[id_formato].extensao}"
+
+
+def caminho_exportacao(id_formato, versao, filtro=None, diretorio=DIRETORIO_EXPORTACOES):
+    return os.path.join(diretorio, f"{NOME_EXPORTACAO}-{versao}-{_filtro(filtro)}.{FORMATOS_EXPORTACAO[id_formato].extensao}")
+
+
+def cabe_no_download(caminho, maximo=None):
+    """
+    Se o arquivo exportado pode ser oferecido pelo botão de download (até MAX_BYTES_DOWNLOAD).
+    """
+    return os.path.getsize(caminho) <= (MAX_BYTES_DOWNLOAD if maximo is None else maximo)
+
+
+def _remover_exportacoes_antigas(versao, diretorio):
+    for arquivo in os.listdir(diretorio):
+        if not arquivo.startswith(f"{NOME_EXPORTACAO}-{versao}-") and not arquivo.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(diretorio, arquivo))
+            except OSError:
+                pass
+
+
+def exportar(data, id_formato, versao, filtro=None, diretorio=DIRETORIO_EXPORTACOES, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Caminho do arquivo com `data` (já filtrado) no formato pedido, sem a coluna de índice.
+    `filtro` identifica a seleção no nome do arquivo (ex.: o ano, ou filtros.rotulo_filtro).
+    O arquivo é gravado em blocos na primeira vez que é pedido e reaproveitado enquanto
+    a versão do dataset não mudar.
+    """
+    caminho = caminho_exportacao(id_formato, versao, filtro, diretorio)
+    with _locks_lock:
+        lock = _locks.setdefault(caminho, threading.Lock())
+    with lock:
+        if os.path.exists(caminho):
+            return caminho
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            FORMATOS_EXPORTACAO[id_formato].escrever(data, temporario, linhas_por_bloco)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        _remover_exportacoes_antigas(versao, diretorio)
+    return caminho
+
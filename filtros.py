@@ -0,0 +1,124 @@
+import functools
+import hashlib
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from caches import CacheLimitado
+from metricas import medir
+
+# Colunas filtráveis na barra lateral (além do período), com um bitmap por valor -> rótulo
+DIMENSOES_FILTRO = {
+    'Bairro': 'Bairro',
+    'Tipo de Via': 'Tipo de via',
+    'Meio de locomocao da vitima': 'Meio de locomoção da vítima',
+    'Tipo de vitima': 'Tipo de vítima',
+}
+MAX_INDICES_EM_CACHE = 4
+MAX_SELECOES_EM_CACHE = 64
+
+# anos: intervalo (inicial, final), inclusivo, ou None; valores: ((dimensão, (valor, ...)), ...)
+Filtro = namedtuple('Filtro', ['anos', 'valores'])
+
+# (versão do dataset) -> IndiceFiltros
+_indices = CacheLimitado('indices_filtros', MAX_INDICES_EM_CACHE)
+
+
+def criar_filtro(anos=None, selecoes=None):
+    """
+    Filtro normalizado e hashable (serve de chave de cache). Dimensões sem valores
+    escolhidos não restringem a seleção.
+    """
+    valores = tuple(sorted(
+        (dimensao, tuple(sorted(str(valor) for valor in escolhidos)))
+        for dimensao, escolhidos in (selecoes or {}).items() if escolhidos
+    ))
+    return Filtro(None if anos is None else (int(anos[0]), int(anos[1])), valores)
+
+
+def rotulo_filtro(filtro):
+    """
+    Identificador curto do filtro para nomes de arquivo e chaves de cache: o período e um hash
+    dos valores escolhidos. None quando o filtro não restringe nada.
+    """
+    partes = []
+    if filtro.anos is not None:
+        inicial, final = filtro.anos
+        partes.append(str(inicial) if inicial == final else f"{inicial}-{final}")
+    if filtro.valores:
+        partes.append(hashlib.sha1(repr(filtro.valores).encode('utf-8')).hexdigest()[:8])
+    return '_'.join(partes) or None
+
+
+class IndiceFiltros:
+    """
+    Um bitmap por ano e por valor de cada dimensão de filtro, compactado em bits (np.packbits,
+    n/8 bytes por valor). Uma combinação de filtros é resolvida com OR entre os valores de uma
+    dimensão e AND entre as dimensões, sem varrer as colunas do DataFrame.
+    """
+
+    def __init__(self, data, dimensoes=DIMENSOES_FILTRO):
+        self.linhas = len(data)
+        self.bitmaps = {}
+        for coluna in ['Ano', *dimensoes]:
+            if coluna in data.columns:
+                self.bitmaps[coluna] = self._indexar(data[coluna], int if coluna == 'Ano' else str)
+        self._todas = np.packbits(np.ones(self.linhas, dtype=bool))
+        self._nenhuma = np.zeros_like(self._todas)
+        self._selecoes = CacheLimitado('selecoes', MAX_SELECOES_EM_CACHE)
+
+    def _indexar(self, serie, tipo):
+        # Códigos na ordem das categorias (a de exibição); valores ausentes ficam sem bitmap
+        codigos, valores = pd.factorize(serie, sort=True)
+        return {tipo(valor): np.packbits(codigos == codigo) for codigo, valor in enumerate(valores)}
+
+    def valores(self, coluna):
+        """
+        Valores presentes na coluna, na ordem de exibição (anos em ordem crescente).
+        """
+        return list(self.bitmaps.get(coluna, {}))
+
+    def _uniao(self, coluna, valores):
+        bitmaps = [self.bitmaps[coluna][valor] for valor in valores if valor in self.bitmaps[coluna]]
+        return functools.reduce(np.bitwise_or, bitmaps) if bitmaps else self._nenhuma
+
+    def bits(self, filtro):
+        """
+        Bitmap compactado das linhas que atendem ao filtro.
+        """
+        partes = []
+        if filtro.anos is not None and 'Ano' in self.bitmaps:
+            inicial, final = filtro.anos
+            partes.append(self._uniao('Ano', [ano for ano in self.bitmaps['Ano'] if inicial <= ano <= final]))
+        for dimensao, valores in filtro.valores:
+            if dimensao in self.bitmaps:
+                partes.append(self._uniao(dimensao, valores))
+        return functools.reduce(np.bitwise_and, partes) if partes else self._todas
+
+    def posicoes(self, filtro):
+        """
+        Posições (para .iloc) das linhas que atendem ao filtro, guardadas para os filtros mais usados.
+        """
+        return self._selecoes.obter(filtro, lambda: self._calcular_posicoes(filtro))
+
+    def _calcular_posicoes(self, filtro):
+        with medir('filtro:selecao'):
+            return np.flatnonzero(np.unpackbits(self.bits(filtro), count=self.linhas))
+
+    def filtrar(self, data, filtro):
+        """
+        Linhas de `data` (o mesmo DataFrame do índice) que atendem ao filtro; sem restrições,
+        o próprio `data`.
+        """
+        if filtro.anos is None and not filtro.valores:
+            return data
+        return data.iloc[self.posicoes(filtro)]
+
+
+def obter_indice(data, versao):
+    """
+    Índice de filtros da versão do dataset; os bitmaps são montados uma vez por versão.
+    """
+    def construir():
+        with medir('filtro:indice'):
+            return IndiceFiltros(data)
+    return _indices.obter(versao, construir)
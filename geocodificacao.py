@@ -0,0 +1,441 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+URL_GEOCODING = os.getenv("GOOGLE_MAPS_GEOCODING_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+CAMINHO_CACHE_GEOCODIFICACAO = os.path.join('.cache', 'geocodificacao.sqlite3')
+
+BAIRRO_NAO_IDENTIFICADO = 'Bairro não identificado'
+LOGRADOURO_NAO_DISPONIVEL = 'NAO DISPONIVEL'
+
+# 5 casas decimais ~ 1 metro: pontos mais próximos que isso compartilham a mesma consulta
+CASAS_DECIMAIS = 5
+TIMEOUT = (5, 15)
+
+RAIO_TERRA_METROS = 6_371_000
+# Distâncias máximas (metros) para aceitar o bairro / logradouro do ponto conhecido mais próximo
+DISTANCIA_BAIRRO = 200
+DISTANCIA_LOGRADOURO = 30
+# Lado da célula da grade do índice espacial, em graus (~550 m na latitude de Franca)
+TAMANHO_CELULA = 0.005
+
+# fonte: 'poligono', 'indice' (ponto conhecido mais próximo), 'api' ou None (não resolvido)
+Resolucao = namedtuple('Resolucao', ['bairro', 'logradouro', 'distancia', 'fonte'])
+
+
+class ErroGeocodificacao(Exception):
+    pass
+
+
+def extrair_bairro_e_logradouro(resposta_json):
+    """
+    Extrai o bairro (sublocality_level_1) e o logradouro (route) da resposta da API de geocodificação.
+    """
+    bairro = None
+    logradouro = None
+    for result in resposta_json.get('results', []):
+        for component in result['address_components']:
+            if 'sublocality_level_1' in component['types']:
+                bairro = component['long_name']
+            if 'route' in component['types']:
+                logradouro = component['long_name']
+    return bairro, logradouro
+
+
+def arredondar(latitude, longitude, casas=CASAS_DECIMAIS):
+    return round(float(latitude), casas), round(float(longitude), casas)
+
+
+class LimitadorTaxa:
+    """
+    Limita o número de requisições por segundo, compartilhado entre as threads.
+    """
+
+    def __init__(self, requisicoes_por_segundo, relogio=time.monotonic, dormir=time.sleep):
+        self.intervalo = 1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        self.relogio = relogio
+        self.dormir = dormir
+        self.proxima = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        with self._lock:
+            agora = self.relogio()
+            espera = self.proxima - agora
+            self.proxima = max(agora, self.proxima) + self.intervalo
+        if espera > 0:
+            self.dormir(espera)
+
+
+class Geocodificador:
+    """
+    Cliente da API de geocodificação reversa do Google Maps com sessão HTTP reaproveitada,
+    limite de taxa e novas tentativas (com backoff) em OVER_QUERY_LIMIT e erros temporários.
+    """
+
+    def __init__(self, chave, url=URL_GEOCODING, requisicoes_por_segundo=20, max_tentativas=4,
+                 espera_base=0.5, espera_maxima=10, tamanho_pool=10, dormir=time.sleep):
+        self.chave = chave
+        self.url = url
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo, dormir=dormir)
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.dormir = dormir
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+
+    def consultar(self, latitude, longitude):
+        """
+        Retorna (bairro, logradouro); (None, None) quando a API não encontra o endereço.
+        """
+        parametros = {'latlng': f"{latitude},{longitude}", 'key': self.chave}
+        ultimo_erro = None
+        for tentativa in range(self.max_tentativas):
+            self.limitador.aguardar()
+            try:
+                resposta = self.sessao.get(self.url, params=parametros, timeout=TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                ultimo_erro = e
+            else:
+                if resposta.status_code == 200:
+                    dados = resposta.json()
+                    if dados['status'] == 'OK':
+                        return extrair_bairro_e_logradouro(dados)
+                    if dados['status'] == 'ZERO_RESULTS':
+                        return None, None
+                    if dados['status'] not in ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'):
+                        raise ErroGeocodificacao(f"Erro na Geocodificação: {dados['status']}")
+                    ultimo_erro = dados['status']
+                elif resposta.status_code in (429, 500, 502, 503, 504):
+                    ultimo_erro = f"HTTP {resposta.status_code}"
+                else:
+                    raise ErroGeocodificacao(f"Erro: {resposta.status_code}")
+            if tentativa + 1 < self.max_tentativas:
+                self.dormir(random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa)))
+        raise ErroGeocodificacao(f"Falha após {self.max_tentativas} tentativas: {ultimo_erro}")
+
+
+class CacheGeocodificacao:
+    """
+    Cache persistente (SQLite) dos resultados, indexado pelas coordenadas arredondadas.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_GEOCODIFICACAO):
+        self.caminho = caminho
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS enderecos ("
+                " latitude REAL NOT NULL,"
+                " longitude REAL NOT NULL,"
+                " bairro TEXT,"
+                " logradouro TEXT,"
+                " PRIMARY KEY (latitude, longitude))"
+            )
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def obter_varios(self, coordenadas):
+        encontrados = {}
+        with self._conectar() as conexao:
+            for latitude, longitude in coordenadas:
+                linha = conexao.execute(
+                    "SELECT bairro, logradouro FROM enderecos WHERE latitude = ? AND longitude = ?",
+                    (latitude, longitude),
+                ).fetchone()
+                if linha is not None:
+                    encontrados[(latitude, longitude)] = linha
+        return encontrados
+
+    def salvar_varios(self, resultados):
+        with self._conectar() as conexao:
+            conexao.executemany(
+                "INSERT OR REPLACE INTO enderecos (latitude, longitude, bairro, logradouro) VALUES (?, ?, ?, ?)",
+                [(latitude, longitude, bairro, logradouro) for (latitude, longitude), (bairro, logradouro) in resultados.items()],
+            )
+
+
+def geocodificar_lote(coordenadas, geocodificador, cache, max_trabalhadores=8):
+    """
+    Geocodifica uma lista de pares (latitude, longitude) em paralelo.
+    Só as coordenadas (arredondadas) ausentes do cache vão para a API.
+    Retorna {(latitude, longitude) arredondadas: (bairro, logradouro)} e a lista de coordenadas que falharam.
+    """
+    unicas = list(dict.fromkeys(arredondar(latitude, longitude) for latitude, longitude in coordenadas))
+    resultados = cache.obter_varios(unicas)
+    pendentes = [coordenada for coordenada in unicas if coordenada not in resultados]
+
+    novos = {}
+    falhas = []
+    with ThreadPoolExecutor(max_workers=max_trabalhadores) as executor:
+        futuros = {executor.submit(geocodificador.consultar, *coordenada): coordenada for coordenada in pendentes}
+        for futuro, coordenada in futuros.items():
+            try:
+                novos[coordenada] = futuro.result()
+            except ErroGeocodificacao:
+                falhas.append(coordenada)
+
+    cache.salvar_varios(novos)
+    resultados.update(novos)
+    return resultados, falhas
+
+
+def coordenadas_para_float(serie):
+    # As coordenadas do Infosiga usam vírgula decimal ("-20,502819")
+    if serie.dtype == object:
+        serie = serie.str.replace(',', '.', regex=False)
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def combinar_enderecos(local, api):
+    """
+    (bairro, logradouro) com os campos resolvidos localmente e, nos que faltam, os da API.
+    """
+    return tuple(valor_local or valor_api for valor_local, valor_api in zip(local, api))
+
+
+def preencher_enderecos(data, geocodificador, cache, max_trabalhadores=8, apenas_faltantes=True, resolvedor=None):
+    """
+    Preenche 'Bairro' e 'Logradouro' a partir das colunas 'Latitude'/'Longitude'.
+    Com apenas_faltantes=True só geocodifica linhas com bairro ou logradouro não identificados.
+    Com um ResolvedorOffline, a API só é consultada para os pontos que ele não resolve com confiança
+    (e nenhuma consulta é feita se geocodificador for None). Com apenas_faltantes=False o resolvedor
+    é ignorado: montado a partir do próprio extrato, ele devolveria a cada ponto o rótulo que já tem.
+    """
+    if not apenas_faltantes:
+        resolvedor = None
+    data = data.copy()
+    latitudes = coordenadas_para_float(data['Latitude'])
+    longitudes = coordenadas_para_float(data['Longitude'])
+    selecao = latitudes.notna() & longitudes.notna()
+    if apenas_faltantes:
+        selecao &= (data['Bairro'] == BAIRRO_NAO_IDENTIFICADO) | (data['Logradouro'] == LOGRADOURO_NAO_DISPONIVEL)
+
+    # Campos que cada ponto (arredondado) precisa receber: os das linhas em que estão faltando
+    necessarios = {}
+    for indice, latitude, longitude in zip(data.index[selecao], latitudes[selecao], longitudes[selecao]):
+        falta_bairro, falta_logradouro = necessarios.get(arredondar(latitude, longitude), (False, False))
+        necessarios[arredondar(latitude, longitude)] = (
+            falta_bairro or not apenas_faltantes or data.at[indice, 'Bairro'] == BAIRRO_NAO_IDENTIFICADO,
+            falta_logradouro or not apenas_faltantes or data.at[indice, 'Logradouro'] == LOGRADOURO_NAO_DISPONIVEL,
+        )
+
+    # O resultado local só dispensa a API quando traz todos os campos que faltam no ponto;
+    # um resultado parcial é guardado e completado com a resposta da API
+    locais = {}
+    resultados = {}
+    if resolvedor is not None:
+        for latitude, longitude in zip(latitudes[selecao], longitudes[selecao]):
+            coordenada = arredondar(latitude, longitude)
+            if coordenada in locais:
+                continue
+            resolucao = resolvedor.resolver(latitude, longitude)
+            locais[coordenada] = (resolucao.bairro, resolucao.logradouro)
+            falta_bairro, falta_logradouro = necessarios[coordenada]
+            if (resolucao.bairro or not falta_bairro) and (resolucao.logradouro or not falta_logradouro):
+                resultados[coordenada] = locais[coordenada]
+
+    pendentes = [
+        (latitude, longitude)
+        for latitude, longitude in zip(latitudes[selecao], longitudes[selecao])
+        if arredondar(latitude, longitude) not in resultados
+    ]
+    falhas = []
+    if geocodificador is not None and pendentes:
+        da_api, falhas = geocodificar_lote(pendentes, geocodificador, cache, max_trabalhadores)
+        resultados.update(da_api)
+    elif pendentes:
+        falhas = list(dict.fromkeys(arredondar(latitude, longitude) for latitude, longitude in pendentes))
+    for coordenada, local in locais.items():
+        resultados[coordenada] = combinar_enderecos(local, resultados.get(coordenada, (None, None)))
+
+    for indice, latitude, longitude in zip(data.index[selecao], latitudes[selecao], longitudes[selecao]):
+        bairro, logradouro = resultados.get(arredondar(latitude, longitude), (None, None))
+        if bairro and (not apenas_faltantes or data.at[indice, 'Bairro'] == BAIRRO_NAO_IDENTIFICADO):
+            data.at[indice, 'Bairro'] = bairro
+        if logradouro and (not apenas_faltantes or data.at[indice, 'Logradouro'] == LOGRADOURO_NAO_DISPONIVEL):
+            data.at[indice, 'Logradouro'] = logradouro.upper()
+    return data, falhas
+
+
+def distancia_metros(latitude, longitude, latitudes, longitudes):
+    # Fórmula de haversine, vetorizada sobre os pontos candidatos
+    lat1, lon1, lat2, lon2 = map(np.radians, (latitude, longitude, latitudes, longitudes))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_METROS * np.arcsin(np.sqrt(a))
+
+
+def _ponto_em_anel(latitude, longitude, anel):
+    # Ray casting sobre os vértices (longitude, latitude) do anel
+    x, y = anel[:, 0], anel[:, 1]
+    x2, y2 = np.roll(x, -1), np.roll(y, -1)
+    cruza = ((y > latitude) != (y2 > latitude)) & (longitude < (x2 - x) * (latitude - y) / np.where(y2 == y, 1e-12, y2 - y) + x)
+    return bool(np.count_nonzero(cruza) % 2)
+
+
+class PoligonosBairros:
+    """
+    Polígonos de bairros carregados de um GeoJSON (Polygon/MultiPolygon), para consultas ponto-em-polígono.
+    """
+
+    def __init__(self, caminho, propriedade_nome='bairro'):
+        with open(caminho, encoding='utf-8') as f:
+            geojson = json.load(f)
+        self.nomes = []
+        self.poligonos = []
+        for feature in geojson['features']:
+            geometria = feature['geometry']
+            partes = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+            for partes_poligono in partes:
+                aneis = [np.asarray(anel, dtype=float)[:, :2] for anel in partes_poligono]
+                self.nomes.append(feature['properties'][propriedade_nome])
+                self.poligonos.append(aneis)
+        # Caixas envolventes (lon_min, lat_min, lon_max, lat_max) para descartar polígonos distantes
+        self.caixas = np.array([[*aneis[0].min(axis=0), *aneis[0].max(axis=0)] for aneis in self.poligonos]).reshape(-1, 4)
+
+    def bairro(self, latitude, longitude):
+        candidatos = np.flatnonzero(
+            (self.caixas[:, 0] <= longitude) & (longitude <= self.caixas[:, 2])
+            & (self.caixas[:, 1] <= latitude) & (latitude <= self.caixas[:, 3])
+        )
+        for i in candidatos:
+            externo, *buracos = self.poligonos[i]
+            if _ponto_em_anel(latitude, longitude, externo) and not any(_ponto_em_anel(latitude, longitude, buraco) for buraco in buracos):
+                return self.nomes[i]
+        return None
+
+
+class ResolvedorOffline:
+    """
+    Geocodificador reverso sem rede: índice em grade dos pontos já identificados do dataset
+    (e, opcionalmente, polígonos de bairros). Só recorre à API quando a resposta local não é confiável.
+    """
+
+    def __init__(self, latitudes, longitudes, bairros, logradouros, poligonos=None, tamanho_celula=TAMANHO_CELULA,
+                 distancia_bairro=DISTANCIA_BAIRRO, distancia_logradouro=DISTANCIA_LOGRADOURO):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.bairros = np.asarray(bairros, dtype=object)
+        self.logradouros = np.asarray(logradouros, dtype=object)
+        self.poligonos = poligonos
+        self.tamanho_celula = tamanho_celula
+        self.distancia_bairro = distancia_bairro
+        self.distancia_logradouro = distancia_logradouro
+
+        # Grade: célula -> índices dos pontos nela (ordenando por célula e cortando nos limites)
+        self.grade = {}
+        if len(self.latitudes) == 0:
+            return
+        celulas = self._celulas(self.latitudes, self.longitudes)
+        ordem = np.lexsort((celulas[:, 1], celulas[:, 0]))
+        ordenadas = celulas[ordem]
+        inicios = np.flatnonzero(np.r_[True, (ordenadas[1:] != ordenadas[:-1]).any(axis=1)])
+        self.grade = {
+            (int(ordenadas[inicio, 0]), int(ordenadas[inicio, 1])): ordem[inicio:fim]
+            for inicio, fim in zip(inicios, np.r_[inicios[1:], len(ordem)])
+        }
+
+    @classmethod
+    def de_dataframe(cls, data, poligonos=None, **kwargs):
+        latitudes = coordenadas_para_float(data['Latitude'])
+        longitudes = coordenadas_para_float(data['Longitude'])
+        conhecidos = latitudes.notna() & longitudes.notna() & (data['Bairro'] != BAIRRO_NAO_IDENTIFICADO)
+        logradouros = data['Logradouro'].astype(object).where(data['Logradouro'] != LOGRADOURO_NAO_DISPONIVEL)
+        return cls(latitudes[conhecidos], longitudes[conhecidos], data['Bairro'][conhecidos].astype(object),
+                   logradouros[conhecidos], poligonos=poligonos, **kwargs)
+
+    def _celulas(self, latitudes, longitudes):
+        return np.floor(np.column_stack([latitudes, longitudes]) / self.tamanho_celula).astype(np.int64).reshape(-1, 2)
+
+    def vizinho_mais_proximo(self, latitude, longitude):
+        """
+        Retorna (índice, distância em metros) do ponto conhecido mais próximo dentro de distancia_bairro,
+        ou (None, inf) se não houver.
+        """
+        i, j = self._celulas(np.array([latitude]), np.array([longitude]))[0]
+        # Células vizinhas necessárias para cobrir o raio de busca
+        alcance = int(np.ceil(self.distancia_bairro / (111_000 * self.tamanho_celula * np.cos(np.radians(latitude))))) + 1
+        candidatos = [
+            self.grade[(i + di, j + dj)]
+            for di in range(-alcance, alcance + 1)
+            for dj in range(-alcance, alcance + 1)
+            if (i + di, j + dj) in self.grade
+        ]
+        if not candidatos:
+            return None, float('inf')
+        candidatos = np.concatenate(candidatos)
+        distancias = distancia_metros(latitude, longitude, self.latitudes[candidatos], self.longitudes[candidatos])
+        melhor = int(np.argmin(distancias))
+        if distancias[melhor] > self.distancia_bairro:
+            return None, float('inf')
+        return int(candidatos[melhor]), float(distancias[melhor])
+
+    def resolver(self, latitude, longitude, geocodificador=None):
+        indice, distancia = self.vizinho_mais_proximo(latitude, longitude)
+        logradouro = None
+        if indice is not None and distancia <= self.distancia_logradouro:
+            logradouro = self.logradouros[indice]
+            logradouro = None if pd.isna(logradouro) else logradouro
+
+        bairro = self.poligonos.bairro(latitude, longitude) if self.poligonos is not None else None
+        if bairro is not None:
+            return Resolucao(bairro, logradouro, 0.0, 'poligono')
+        if indice is not None:
+            return Resolucao(self.bairros[indice], logradouro, distancia, 'indice')
+        if geocodificador is not None:
+            bairro, logradouro = geocodificador.consultar(latitude, longitude)
+            return Resolucao(bairro, logradouro, None, 'api')
+        return Resolucao(None, None, None, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preenche bairro e logradouro de um extrato do Infosiga via Google Maps.")
+    parser.add_argument('entrada', help="CSV do Infosiga separado por ';' (ex.: obitos_final.csv)")
+    parser.add_argument('--saida', help="CSV de saída (padrão: sobrescreve a entrada)")
+    parser.add_argument('--todas', action='store_true', help="Geocodifica todas as linhas, não só as não identificadas")
+    parser.add_argument('--trabalhadores', type=int, default=8)
+    parser.add_argument('--taxa', type=float, default=20, help="Requisições por segundo")
+    parser.add_argument('--offline', action='store_true', help="Usa apenas o índice local, sem chamar a API")
+    parser.add_argument('--poligonos', help="GeoJSON com os polígonos dos bairros")
+    parser.add_argument('--propriedade-bairro', default='bairro', help="Propriedade do GeoJSON com o nome do bairro")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    data = pd.read_csv(args.entrada, delimiter=';', dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig', index_col=0)
+    poligonos = PoligonosBairros(args.poligonos, args.propriedade_bairro) if args.poligonos else None
+    # Com --todas, todas as linhas vão para a API (ver preencher_enderecos)
+    resolvedor = None if args.todas else ResolvedorOffline.de_dataframe(data, poligonos=poligonos)
+    geocodificador = None if args.offline else Geocodificador(os.getenv("GOOGLE_MAPS_API_KEY"), requisicoes_por_segundo=args.taxa)
+    data, falhas = preencher_enderecos(data, geocodificador, CacheGeocodificacao(), args.trabalhadores,
+                                       apenas_faltantes=not args.todas, resolvedor=resolvedor)
+    data.to_csv(args.saida or args.entrada, sep=';')
+    print(f"{len(falhas)} coordenadas não puderam ser geocodificadas.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,38 @@
-import requests
 import os
+import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
+from geocodificacao import CacheGeocodificacao, ErroGeocodificacao, Geocodificador, ResolvedorOffline, combinar_enderecos, preencher_enderecos
 
 load_dotenv()
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+# Geocodificador único por processo (sessão HTTP reaproveitada entre consultas)
+@st.cache_resource
+def obter_geocodificador():
+    return Geocodificador(GOOGLE_MAPS_API_KEY)
+
+# Índice local com os pontos já identificados do dataset, consultado antes da API
+@st.cache_resource
+def obter_resolvedor():
+    extrato = pd.read_csv('obitos_final.csv', delimiter=';', dtype=str, encoding='utf-8-sig', index_col=0)
+    return ResolvedorOffline.de_dataframe(extrato)
+
 def get_bairro_e_logradouro(latitude, longitude):
     """
-    Função para obter o bairro e logradouro a partir das coordenadas de latitude e longitude usando a API do Google Maps.
+    Função para obter o bairro e logradouro a partir das coordenadas de latitude e longitude.
+    Usa o índice local quando há um ponto conhecido próximo e a API do Google Maps caso contrário.
     """
-    url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={latitude},{longitude}&key={GOOGLE_MAPS_API_KEY}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        if data['status'] == 'OK':
-            bairro = None
-            logradouro = None
-            for result in data['results']:
-                for component in result['address_components']:
-                    if 'sublocality_level_1' in component['types']:
-                        bairro = component['long_name']
-                    if 'route' in component['types']:
-                        logradouro = component['long_name']
-            return bairro, logradouro
-        else:
-            return "Erro na Geocodificação", None
-    else:
-        return f"Erro: {response.status_code}", None
+    resolucao = obter_resolvedor().resolver(latitude, longitude)
+    local = (resolucao.bairro, resolucao.logradouro)
+    if all(local):
+        return local
+    try:
+        # A API completa o que o índice local não resolveu, sem descartar o bairro já encontrado
+        return combinar_enderecos(local, obter_geocodificador().consultar(latitude, longitude))
+    except ErroGeocodificacao as e:
+        return resolucao.bairro or str(e), None
 
 st.title("Consulta de Bairro e Logradouro")
 st.write("Insira as coordenadas de latitude e longitude para obter o bairro e logradouro correspondentes.")
@@ -47,4 +51,24 @@ if st.button("Consultar"):
         except ValueError:
             st.write("Por favor, insira valores válidos para latitude e longitude.")
     else:
-        st.write("Por favor, insira ambos os valores de latitude e longitude.")
\ No newline at end of file
+        st.write("Por favor, insira ambos os valores de latitude e longitude.")
+
+# Modo em lote: preenche bairros e logradouros não identificados de um extrato inteiro
+st.markdown("---")
+st.header("Consulta em Lote")
+arquivo = st.file_uploader("Extrato do Infosiga (CSV separado por ';', ex.: obitos_final.csv)", type="csv")
+todas_as_linhas = st.checkbox("Consultar todas as linhas (não só as com bairro ou logradouro não identificados)")
+
+if arquivo is not None and st.button("Consultar em Lote"):
+    extrato = pd.read_csv(arquivo, delimiter=';', dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig', index_col=0)
+    with st.spinner("Consultando coordenadas..."):
+        extrato, falhas = preencher_enderecos(extrato, obter_geocodificador(), CacheGeocodificacao(), apenas_faltantes=not todas_as_linhas,
+                                              resolvedor=ResolvedorOffline.de_dataframe(extrato))
+    st.write(f"Coordenadas que não puderam ser consultadas: {len(falhas)}")
+    st.dataframe(extrato[['Latitude', 'Longitude', 'Bairro', 'Logradouro']])
+    st.download_button(
+        label="Baixar extrato preenchido",
+        data=extrato.to_csv(sep=';').encode("utf-8"),
+        file_name=arquivo.name,
+        mime="text/csv",
+    )
@@ -0,0 +1,165 @@
+from caches import CacheLimitado
+from metricas import medir
+
+MAX_FIGURAS_EM_CACHE = 128
+
+# (gráfico, filtro, versão do dataset) -> especificação da figura (to_plotly_json), ou None
+_figuras = CacheLimitado('figuras', MAX_FIGURAS_EM_CACHE)
+
+# Gráfico -> função que monta a figura a partir do cubo e do ano (None = todos os anos)
+GRAFICOS = {}
+
+
+# Função para criar gráfico de barras com cores gradientes
+def create_colored_bar_chart(data, x_column, y_column, title, color_column, color_scale):
+    # plotly.express é importado na primeira figura, não na partida do processo
+    import plotly.express as px
+
+    fig = px.bar(data, x=x_column, y=y_column, color=color_column, template='seaborn', color_continuous_scale=color_scale)
+    fig.update_layout(
+        title_text=title,
+        title_x=0,
+        margin=dict(l=0, r=10, b=10, t=30),
+        yaxis_title=None,
+        xaxis_title=None,
+        xaxis=dict(tickmode='linear', tick0=2019, dtick=1)
+    )
+    return fig
+
+
+def grafico(id_grafico):
+    def registrar(funcao):
+        GRAFICOS[id_grafico] = funcao
+        return funcao
+    return registrar
+
+
+def figura_de_especificacao(especificacao):
+    """
+    Figura nova a partir da especificação guardada em cache (None continua None): cada chamada
+    recebe o seu próprio objeto, e mudar a figura de uma sessão não altera a de outra.
+    """
+    if especificacao is None:
+        return None
+    import plotly.graph_objects as go
+    return go.Figure(especificacao)
+
+
+def obter_figura(id_grafico, cubo, versao, ano=None):
+    """
+    Figura do gráfico para o filtro e a versão do dataset. A especificação é montada só na
+    primeira vez e compartilhada entre reruns e sessões; a figura retornada é sempre uma cópia.
+    """
+    def construir():
+        with medir(f"grafico:{id_grafico}"):
+            fig = GRAFICOS[id_grafico](cubo, ano)
+            return None if fig is None else fig.to_plotly_json()
+    return figura_de_especificacao(_figuras.obter((id_grafico, ano, versao), construir))
+
+
+def limpar_cache_figuras():
+    _figuras.limpar()
+
+
+# Gráfico 1: Quantidade de Acidentes por Ano
+@grafico('acidentes_por_ano')
+def _acidentes_por_ano(cubo, ano):
+    sinistros_por_ano = cubo.contagens('Ano', ano).reset_index(name='Quantidade')
+    return create_colored_bar_chart(sinistros_por_ano, x_column='Ano', y_column='Quantidade', title='Quantidade de Acidentes por Ano', color_column='Quantidade', color_scale='Blues')
+
+# Gráfico 2: Distribuição de Óbitos por Tipo de Sinistro
+@grafico('obitos_por_tipo_sinistro')
+def _obitos_por_tipo_sinistro(cubo, ano):
+    obitos_por_tipo_sinistro = cubo.contagens('Tipo de Sinistro', ano).sort_values(ascending=False).reset_index(name='Quantidade')
+    return create_colored_bar_chart(obitos_por_tipo_sinistro, x_column='Tipo de Sinistro', y_column='Quantidade', title='Distribuição de Óbitos por Tipo de Acidente', color_column='Quantidade', color_scale='Reds')
+
+# Gráfico 3: Distribuição de Acidentes por Dia da Semana
+@grafico('acidentes_por_dia_semana')
+def _acidentes_por_dia_semana(cubo, ano):
+    sinistros_por_dia_semana = cubo.contagens('Dia da Semana', ano).reset_index(name='Quantidade')
+    return create_colored_bar_chart(sinistros_por_dia_semana, x_column='Dia da Semana', y_column='Quantidade', title='Distribuição de Acidentes por Dia da Semana', color_column='Quantidade', color_scale='Greens')
+
+# Gráfico 4: Distribuição de Acidentes por Tipo de Veículo
+@grafico('acidentes_por_veiculo')
+def _acidentes_por_veiculo(cubo, ano):
+    sinistros_por_veiculo = cubo.contagens('Meio de locomocao da vitima', ano, excluir=['NAO DISPONIVEL']).reset_index(name='Quantidade')
+    return create_colored_bar_chart(sinistros_por_veiculo, x_column='Meio de locomocao da vitima', y_column='Quantidade', title='Distribuição de Acidentes por Tipo de Veículo', color_column='Quantidade', color_scale='Oranges')
+
+# Gráfico 5: Comparação de Turno x Tipo de Via
+@grafico('turno_tipo_via')
+def _turno_tipo_via(cubo, ano):
+    import plotly.express as px
+
+    turno_tipo_via = cubo.contagens(('Turno', 'Tipo de Via'), ano, excluir=['NAO DISPONIVEL']).reset_index(name='Quantidade')
+    fig5 = px.bar(turno_tipo_via, x='Tipo de Via', y='Quantidade', color='Turno',
+                  title='Comparação de Turno x Tipo de Via',
+                  labels={'Quantidade':'Número de Acidentes', 'Tipo de Via':'Tipo de Via'},
+                  template='seaborn')
+
+    fig5.update_layout(
+        title_x=0,
+        margin=dict(l=0, r=10, b=10, t=30),
+        xaxis_title='Tipo de Via',
+        yaxis_title='Número de Acidentes',
+        legend_title_text='Turno'
+    )
+    return fig5
+
+# Gráfico 6: Turno com Maior Incidência de Acidentes
+@grafico('acidentes_por_turno')
+def _acidentes_por_turno(cubo, ano):
+    # 'Turno Calculado' é derivado da hora do sinistro no carregamento (ver dados.classificar_turno)
+    sinistros_por_turno = cubo.contagens('Turno Calculado', ano).rename_axis('Turno').reset_index(name='Quantidade')
+    return create_colored_bar_chart(sinistros_por_turno, x_column='Turno', y_column='Quantidade', title='Turno com Maior Incidência de Acidentes', color_column='Quantidade', color_scale='YlOrBr')
+
+# Gráfico 7: Distribuição de Óbitos por Faixa Etária
+@grafico('obitos_por_faixa_etaria')
+def _obitos_por_faixa_etaria(cubo, ano):
+    faixa_etaria = cubo.contagens('Faixa etaria', ano, excluir=['NAO DISPONIVEL']).reset_index(name='Quantidade')
+    return create_colored_bar_chart(faixa_etaria, x_column='Faixa etaria', y_column='Quantidade', title='Distribuição de Óbitos por Faixa Etária', color_column='Quantidade', color_scale='Blues')
+
+# Gráfico 8: Óbitos por Tipo de Via
+@grafico('obitos_por_tipo_via')
+def _obitos_por_tipo_via(cubo, ano):
+    tipo_via = cubo.contagens('Tipo de Via', ano, excluir=['NAO DISPONIVEL']).reset_index(name='Quantidade')
+    return create_colored_bar_chart(tipo_via, x_column='Tipo de Via', y_column='Quantidade', title='Óbitos por Tipo de Via', color_column='Quantidade', color_scale='Reds')
+
+# 3 bairros com maiores índices de acidentes (None quando não há bairros identificados)
+@grafico('top3_bairros')
+def _top3_bairros(cubo, ano):
+    top3_bairros = cubo.contagens('Bairro', ano, excluir=['Bairro não identificado']).sort_values(ascending=False).head(3).reset_index(name='Quantidade')
+    if top3_bairros.empty:
+        return None
+    fig_top3 = create_colored_bar_chart(top3_bairros, x_column='Bairro', y_column='Quantidade', title='Top 3 Bairros com Mais Acidentes', color_column='Quantidade', color_scale='Oranges')
+    fig_top3.update_layout(
+        yaxis=dict(
+            tickmode='linear',
+            dtick=1
+        )
+    )
+    return fig_top3
+
+# Gráfico 9: Óbitos por Gênero
+@grafico('obitos_por_sexo')
+def _obitos_por_sexo(cubo, ano):
+    obitos_por_sexo = cubo.contagens('Sexo', ano).reset_index(name='Quantidade')
+    return create_colored_bar_chart(obitos_por_sexo, x_column='Sexo', y_column='Quantidade', title='Óbitos por Gênero', color_column='Quantidade', color_scale='Greys')
+
+# Gráfico 11: Óbitos por Mês do Ano
+@grafico('obitos_por_mes')
+def _obitos_por_mes(cubo, ano):
+    mes_do_ano = cubo.contagens('Nome do Mes', ano).reset_index(name='Quantidade')
+    return create_colored_bar_chart(mes_do_ano, x_column='Nome do Mes', y_column='Quantidade', title='Acidentes por Mês do Ano', color_column='Quantidade', color_scale='BuGn')
+
+# Gráfico 12: Óbitos por Dia do Mês
+@grafico('obitos_por_dia_mes')
+def _obitos_por_dia_mes(cubo, ano):
+    dia_do_mes = cubo.contagens('Dia do Sinistro', ano).reset_index(name='Quantidade')
+    fig12 = create_colored_bar_chart(dia_do_mes, x_column='Dia do Sinistro', y_column='Quantidade', title='Acidentes por Dia do Mês', color_column='Quantidade', color_scale='YlGnBu')
+    fig12.update_layout(
+        yaxis=dict(
+            tickmode='linear',
+            dtick=1
+        )
+    )
+    return fig12
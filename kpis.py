@@ -0,0 +1,123 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from agregados import anos_do_periodo
+from caches import CacheLimitado
+from metricas import medir
+
+MAX_TABELAS_EM_CACHE = 32
+
+Kpi = namedtuple('Kpi', ['rotulo', 'ajuda', 'calcular'])
+
+# KPI -> como calcular a série Ano -> valor a partir do cubo, na ordem dos cartões; registrado com @kpi
+KPIS = {}
+
+# (versão do dataset e do filtro) -> TabelaKpis
+_tabelas = CacheLimitado('kpis', MAX_TABELAS_EM_CACHE)
+
+
+def kpi(id_kpi, rotulo, ajuda):
+    def registrar(funcao):
+        KPIS[id_kpi] = Kpi(rotulo, ajuda, funcao)
+        return funcao
+    return registrar
+
+
+@kpi('total_obitos', ":coffin: Total de Óbitos", "Total de óbitos")
+def _total_obitos(cubo):
+    return cubo.contagens('Ano')
+
+
+@kpi('motoristas_condutores', ":car: Óbitos por Motoristas e Condutores", "Óbitos envolvendo motoristas e condutores")
+def _motoristas_condutores(cubo):
+    return cubo.por_ano('Tipo de vitima', ['CONDUTOR', 'PASSAGEIRO'])
+
+
+@kpi('pedestres', ":walking: Óbitos de Pedestres", "Óbitos envolvendo pedestres em acidentes")
+def _pedestres(cubo):
+    return cubo.por_ano('Meio de locomocao da vitima', ['PEDESTRE'])
+
+
+def periodo_anterior(ano, anos_disponiveis):
+    """
+    Período de mesma duração imediatamente antes de `ano` (um ano ou uma tupla de anos), ou None
+    quando ele não está todo nos dados ou quando ano=None (todos os anos). A duração é a do
+    intervalo do primeiro ao último ano: uma tupla com lacunas, como (2019, 2021), recua três anos.
+    """
+    if ano is None:
+        return None
+    anos = anos_do_periodo(ano)
+    duracao = max(anos) - min(anos) + 1
+    anteriores = tuple(atual - duracao for atual in anos)
+    if not set(anteriores) <= set(anos_disponiveis):
+        return None
+    return anteriores if isinstance(ano, tuple) else anteriores[0]
+
+
+class TabelaKpis:
+    """
+    Tabela Ano x KPI calculada de uma vez a partir do cubo. Valores de qualquer período,
+    variações entre períodos e tendências são respondidos a partir dela, sem varrer as linhas.
+    """
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+
+    @classmethod
+    def construir(cls, cubo, anos=None, kpis=KPIS):
+        # Com filtros, anos sem óbitos somem do cubo: `anos` os traz de volta com zero
+        anos = pd.Index(cubo.anos() if anos is None else list(anos), name='Ano')
+        colunas = {}
+        for id_kpi, definicao in kpis.items():
+            try:
+                colunas[id_kpi] = definicao.calcular(cubo).reindex(anos, fill_value=0)
+            except KeyError:
+                # Coluna ausente no extrato: o KPI fica de fora
+                continue
+        return cls(pd.DataFrame(colunas, index=anos).astype('int64'))
+
+    def __contains__(self, id_kpi):
+        return id_kpi in self.tabela.columns
+
+    def valor(self, id_kpi, ano=None):
+        """
+        Soma do KPI no período (um ano, uma tupla de anos ou todos os anos, com ano=None).
+        """
+        serie = self.tabela[id_kpi]
+        if ano is not None:
+            serie = serie[serie.index.isin(anos_do_periodo(ano))]
+        return int(serie.sum())
+
+    def delta(self, id_kpi, ano, anterior):
+        return self.valor(id_kpi, ano) - self.valor(id_kpi, anterior)
+
+    def variacao_percentual(self, id_kpi, ano, anterior):
+        """
+        Variação em % entre os períodos; None quando o período anterior é zero.
+        """
+        base = self.valor(id_kpi, anterior)
+        return None if base == 0 else 100 * (self.valor(id_kpi, ano) - base) / base
+
+    def serie(self, id_kpi, ano=None):
+        serie = self.tabela[id_kpi]
+        return serie if ano is None else serie[serie.index.isin(anos_do_periodo(ano))]
+
+    def tendencia(self, id_kpi, ano=None):
+        """
+        Inclinação da reta de mínimos quadrados do KPI ao longo dos anos do período, em
+        unidades por ano. None com menos de dois anos.
+        """
+        serie = self.serie(id_kpi, ano)
+        if len(serie) < 2:
+            return None
+        return float(np.polyfit(serie.index.to_numpy(dtype=float), serie.to_numpy(dtype=float), 1)[0])
+
+
+def obter_tabela_kpis(cubo, versao, anos=None):
+    """
+    Tabela de KPIs do cubo da versão informada (dataset e filtro), calculada uma vez por versão.
+    """
+    def construir():
+        with medir('kpis'):
+            return TabelaKpis.construir(cubo, anos)
+    return _tabelas.obter(versao, construir)
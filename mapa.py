@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from caches import CacheLimitado
+from graficos import figura_de_especificacao
+from metricas import medir
+
+NIVEIS_ZOOM = list(range(10, 17))
+ZOOM_PADRAO = 12
+# Lado da célula da grade em pixels na tela, no nível de zoom para o qual ela foi calculada
+PIXELS_POR_CELULA = 24
+MAX_MAPAS_EM_CACHE = 64
+
+# (versão do dataset, ano, zoom) -> especificação da figura (to_plotly_json), ou None
+_mapas = CacheLimitado('mapas', MAX_MAPAS_EM_CACHE)
+
+
+def tamanho_celula(zoom, latitude=0.0):
+    """
+    Lado da célula, em graus de (latitude, longitude), que ocupa PIXELS_POR_CELULA no zoom dado
+    (tiles Web Mercator de 256 px). A latitude é corrigida para a célula ficar quadrada na tela.
+    """
+    longitude = 360 / 2 ** zoom * PIXELS_POR_CELULA / 256
+    return longitude * np.cos(np.radians(latitude)), longitude
+
+
+def agregar_em_grade(latitudes, longitudes, zoom):
+    """
+    Agrupa os pontos em células de uma grade regular para o nível de zoom. Retorna uma linha
+    por célula ocupada, no centro de massa dos seus pontos, com a quantidade de óbitos.
+    Pontos sem coordenadas são ignorados.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    validos = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    latitudes, longitudes = latitudes[validos], longitudes[validos]
+    if len(latitudes) == 0:
+        return pd.DataFrame({'Latitude': [], 'Longitude': [], 'Quantidade': pd.Series([], dtype='int64')})
+
+    lado_latitude, lado_longitude = tamanho_celula(zoom, latitudes.mean())
+    linhas = np.floor(latitudes / lado_latitude).astype(np.int64)
+    colunas = np.floor(longitudes / lado_longitude).astype(np.int64)
+    # Uma chave inteira por célula: np.unique em 1-D é bem mais rápido que por linhas de um array 2-D
+    colunas -= colunas.min()
+    celulas = (linhas - linhas.min()) * (colunas.max() + 1) + colunas
+    _, inverso, quantidades = np.unique(celulas, return_inverse=True, return_counts=True)
+    return pd.DataFrame({
+        'Latitude': np.bincount(inverso, weights=latitudes) / quantidades,
+        'Longitude': np.bincount(inverso, weights=longitudes) / quantidades,
+        'Quantidade': quantidades,
+    }).sort_values('Quantidade', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _montar_mapa(data, zoom):
+    import plotly.express as px
+
+    grade = agregar_em_grade(data['Latitude'], data['Longitude'], zoom)
+    if grade.empty:
+        return None
+    fig = px.scatter_mapbox(
+        grade,
+        lat='Latitude',
+        lon='Longitude',
+        size='Quantidade',
+        color='Quantidade',
+        color_continuous_scale='YlOrRd',
+        size_max=30,
+        zoom=zoom,
+        center={'lat': float(grade['Latitude'].mean()), 'lon': float(grade['Longitude'].mean())},
+        hover_data={'Latitude': False, 'Longitude': False, 'Quantidade': True},
+        mapbox_style='open-street-map',
+        title='Concentração de Óbitos',
+    )
+    fig.update_layout(title_x=0, margin=dict(l=0, r=10, b=10, t=30))
+    return fig
+
+
+def obter_mapa(data, versao, ano=None, zoom=ZOOM_PADRAO):
+    """
+    Mapa de calor em grade dos óbitos de `data` (já filtrado por `ano`) para o nível de zoom.
+    Só as células ocupadas vão para o navegador; a especificação é montada uma vez por
+    (versão do dataset, ano, zoom) e cada chamada recebe uma figura nova. None quando não há coordenadas.
+    """
+    def construir():
+        with medir('mapa:montar'):
+            fig = _montar_mapa(data, zoom)
+            return None if fig is None else fig.to_plotly_json()
+    return figura_de_especificacao(_mapas.obter((versao, ano, zoom), construir))
+
+
+def limpar_cache_mapas():
+    _mapas.limpar()
@@ -0,0 +1,173 @@
+import contextlib
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+
+# Amostras mais recentes guardadas por medida para o cálculo dos percentis
+MAX_AMOSTRAS = 1024
+PERCENTIS = (50, 90, 99)
+PREFIXO_PROMETHEUS = 'infosiga'
+
+
+def _percentil(ordenadas, percentil):
+    # Interpolação linear entre as amostras vizinhas (como o padrão do numpy.percentile)
+    posicao = (len(ordenadas) - 1) * percentil / 100
+    abaixo, acima = math.floor(posicao), math.ceil(posicao)
+    return ordenadas[abaixo] + (ordenadas[acima] - ordenadas[abaixo]) * (posicao - abaixo)
+
+
+def _nome_prometheus(nome):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', f"{PREFIXO_PROMETHEUS}_{nome}")
+
+
+def _rotulo_prometheus(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Medida:
+    """
+    Durações de uma seção: quantidade e soma de todas as execuções e as últimas
+    `max_amostras`, usadas para os percentis.
+    """
+
+    def __init__(self, max_amostras=MAX_AMOSTRAS):
+        self.quantidade = 0
+        self.soma = 0.0
+        self.amostras = deque(maxlen=max_amostras)
+
+    def registrar(self, segundos):
+        self.quantidade += 1
+        self.soma += segundos
+        self.amostras.append(segundos)
+
+    def resumo(self, percentis=PERCENTIS):
+        ordenadas = sorted(self.amostras)
+        resumo = {
+            'quantidade': self.quantidade,
+            'soma': self.soma,
+            'media': self.soma / self.quantidade,
+            'ultima': self.amostras[-1],
+        }
+        for percentil in percentis:
+            resumo[f"p{percentil}"] = _percentil(ordenadas, percentil)
+        return resumo
+
+
+class Metricas:
+    """
+    Tempos das seções (spans) e contadores de eventos do processo, compartilhados por todas as
+    sessões. Registrar custa um perf_counter e um lock, então pode ficar nos caminhos quentes.
+    """
+
+    def __init__(self, max_amostras=MAX_AMOSTRAS, relogio=time.perf_counter):
+        self.max_amostras = max_amostras
+        self.relogio = relogio
+        self._medidas = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def medir(self, nome):
+        """
+        Registra a duração do bloco (ou, como decorador, de cada chamada da função) em `nome`,
+        inclusive quando ele termina com exceção.
+        """
+        inicio = self.relogio()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(nome, self.relogio() - inicio)
+
+    def registrar_tempo(self, nome, segundos):
+        with self._lock:
+            medida = self._medidas.get(nome)
+            if medida is None:
+                medida = self._medidas[nome] = Medida(self.max_amostras)
+            medida.registrar(segundos)
+
+    def contar(self, nome, quantidade=1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+
+    def tempos(self, percentis=PERCENTIS):
+        """
+        Resumo de cada seção medida (quantidade, soma, média, última e percentis, em segundos).
+        """
+        with self._lock:
+            return {nome: medida.resumo(percentis) for nome, medida in sorted(self._medidas.items())}
+
+    def contadores(self):
+        with self._lock:
+            return dict(sorted(self._contadores.items()))
+
+    def limpar(self):
+        with self._lock:
+            self._medidas.clear()
+            self._contadores.clear()
+
+    def linhas_jsonl(self, momento=None):
+        """
+        Uma linha JSON por seção e por contador, com o instante (epoch) do retrato.
+        """
+        momento = time.time() if momento is None else momento
+        linhas = [
+            json.dumps({'momento': momento, 'tipo': 'tempo', 'nome': nome, **resumo}, ensure_ascii=False)
+            for nome, resumo in self.tempos().items()
+        ]
+        linhas += [
+            json.dumps({'momento': momento, 'tipo': 'contador', 'nome': nome, 'valor': valor}, ensure_ascii=False)
+            for nome, valor in self.contadores().items()
+        ]
+        return ''.join(f"{linha}\n" for linha in linhas)
+
+    def exportar_jsonl(self, caminho):
+        # Acrescenta ao arquivo: retratos sucessivos formam a série histórica
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(self.linhas_jsonl())
+
+    def texto_prometheus(self):
+        """
+        Tempos como um summary (percentis por seção) e cada contador como um counter, no
+        formato de exposição em texto do Prometheus.
+        """
+        linhas = []
+        tempos = self.tempos()
+        if tempos:
+            duracao = _nome_prometheus('duracao_segundos')
+            linhas += [f"# HELP {duracao} Duração das seções do app.", f"# TYPE {duracao} summary"]
+            for nome, resumo in tempos.items():
+                secao = _rotulo_prometheus(nome)
+                for percentil in PERCENTIS:
+                    linhas.append(f'{duracao}{{secao="{secao}",quantile="{percentil / 100}"}} {resumo[f"p{percentil}"]:.9g}')
+                linhas.append(f'{duracao}_sum{{secao="{secao}"}} {resumo["soma"]:.9g}')
+                linhas.append(f'{duracao}_count{{secao="{secao}"}} {resumo["quantidade"]}')
+        for nome, valor in self.contadores().items():
+            contador = _nome_prometheus(f"{nome}_total")
+            linhas += [f"# TYPE {contador} counter", f"{contador} {valor}"]
+        return ''.join(f"{linha}\n" for linha in linhas)
+
+
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+def obter_metricas():
+    """
+    Instância única das métricas por processo.
+    """
+    global _metricas
+    with _metricas_lock:
+        if _metricas is None:
+            _metricas = Metricas()
+        return _metricas
+
+
+def medir(nome):
+    return obter_metricas().medir(nome)
+
+
+def contar(nome, quantidade=1):
+    obter_metricas().contar(nome, quantidade)
@@ -0,0 +1,105 @@
+import argparse
+import glob
+import os
+import threading
+
+DIRETORIO_IMAGENS = 'images'
+DIRETORIO_MINIATURAS = os.path.join('.cache', 'miniaturas')
+# Largura das miniaturas, em pixels: o dobro da maior largura em que as imagens são exibidas (telas de alta densidade)
+LARGURA_MINIATURA = 320
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg')
+
+_miniaturas_lock = threading.Lock()
+_ambiente_carregado = False
+_ambiente_lock = threading.Lock()
+
+
+def carregar_variaveis_ambiente(caminho='.env'):
+    """
+    Carrega o arquivo .env uma única vez por processo, e só importa o python-dotenv quando o arquivo existe.
+    """
+    global _ambiente_carregado
+    with _ambiente_lock:
+        if _ambiente_carregado:
+            return
+        _ambiente_carregado = True
+        if os.path.exists(caminho):
+            from dotenv import load_dotenv
+            load_dotenv(caminho)
+
+
+def caminho_miniatura(caminho, largura=LARGURA_MINIATURA, diretorio=DIRETORIO_MINIATURAS):
+    # Tamanho e data de modificação no nome: uma imagem nova gera outra miniatura
+    estado = os.stat(caminho)
+    nome, _ = os.path.splitext(os.path.basename(caminho))
+    return os.path.join(diretorio, f"{nome}-{largura}-{estado.st_size}-{estado.st_mtime_ns}.png")
+
+
+def _reduzir(caminho, destino, largura):
+    from PIL import Image
+
+    # A imagem de origem é um recurso do próprio repositório: libera o limite de pixels só para esta leitura
+    limite = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(caminho) as imagem:
+            # draft() deixa o decodificador JPEG ler já em escala reduzida; em PNG não tem efeito
+            imagem.draft('RGB', (largura, largura * imagem.height // max(imagem.width, 1)))
+            imagem.thumbnail((largura, imagem.height), Image.LANCZOS)
+            imagem.save(destino, format='PNG', optimize=True)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limite
+
+
+def miniatura(caminho, largura=LARGURA_MINIATURA, diretorio=DIRETORIO_MINIATURAS):
+    """
+    Caminho de uma cópia da imagem com no máximo `largura` pixels de largura, gerada na primeira
+    vez e reaproveitada entre execuções e processos. None quando a imagem não existe; se não for
+    possível gravar a miniatura, retorna a própria imagem.
+    """
+    try:
+        destino = caminho_miniatura(caminho, largura, diretorio)
+    except OSError:
+        return None
+    if os.path.exists(destino):
+        return destino
+    with _miniaturas_lock:
+        if os.path.exists(destino):
+            return destino
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(diretorio, exist_ok=True)
+            _reduzir(caminho, temporario, largura)
+            os.replace(temporario, destino)
+        except OSError:
+            return caminho
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        _remover_miniaturas_antigas(caminho, destino, largura, diretorio)
+    return destino
+
+
+def _remover_miniaturas_antigas(caminho, atual, largura, diretorio):
+    nome, _ = os.path.splitext(os.path.basename(caminho))
+    for antiga in glob.glob(os.path.join(diretorio, f"{glob.escape(nome)}-{largura}-*.png")):
+        if antiga != atual:
+            try:
+                os.remove(antiga)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera as miniaturas das imagens do painel (ex.: na construção da imagem do contêiner).")
+    parser.add_argument('--imagens', default=DIRETORIO_IMAGENS, help="Diretório com as imagens originais")
+    parser.add_argument('--largura', type=int, default=LARGURA_MINIATURA, help="Largura máxima das miniaturas, em pixels")
+    args = parser.parse_args()
+
+    for caminho in sorted(glob.glob(os.path.join(args.imagens, '*'))):
+        if caminho.lower().endswith(EXTENSOES_IMAGEM):
+            print(f"{caminho} -> {miniatura(caminho, args.largura)}")
+
+
+if __name__ == '__main__':
+    main()
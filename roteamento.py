@@ -0,0 +1,172 @@
+import math
+import re
+import threading
+import unicodedata
+import numpy as np
+from contextos import contexto_por_ano, pergunta_para_funcao, termos_por_pergunta
+
+# Orçamento do prompt enviado à Maritaca, em tokens estimados (contextos + pergunta + instrução)
+ORCAMENTO_TOKENS = 600
+# Caracteres por token na estimativa (texto em português, sem tokenizador local)
+CARACTERES_POR_TOKEN = 4
+MAX_CONTEXTOS = 3
+# Similaridade mínima para responder e fração da melhor para incluir contextos adicionais
+SIMILARIDADE_MINIMA = 0.15
+FRACAO_DA_MELHOR = 0.5
+# Prefixo mantido de cada palavra: junta plurais e flexões ("acidentes", "acidente") sem um stemmer
+TAMANHO_RADICAL = 5
+
+INSTRUCAO = "Com base nas informações acima, responda à seguinte pergunta:"
+
+PALAVRAS_VAZIAS = set("""
+a o as os um uma uns umas de da do das dos em na no nas nos e ou com por para pela pelo pelas pelos
+que qual quais quanto quantos quanta quantas como quando foi foram ser sao ha houve tem
+me se ao aos entre sobre contexto
+""".split())
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def anos_citados(texto):
+    return [int(ano) for ano in dict.fromkeys(re.findall(r'\b(?:19|20)\d{2}\b', texto))]
+
+
+def termos(texto):
+    """
+    Radicais das palavras do texto, sem acentos, maiúsculas e palavras vazias. Anos viram o
+    termo "ano": "2022" se aproxima da pergunta sobre 2021, que responde para qualquer ano.
+    """
+    palavras = re.findall(r'[a-z0-9]+', _sem_acentos(texto.casefold()))
+    return [
+        'ano' if re.fullmatch(r'(?:19|20)\d{2}', palavra) else palavra[:TAMANHO_RADICAL]
+        for palavra in palavras if palavra not in PALAVRAS_VAZIAS
+    ]
+
+
+def estimar_tokens(texto):
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+class IndicePerguntas:
+    """
+    Índice TF-IDF, em memória, das perguntas do catálogo: cada documento junta a pergunta, o
+    nome da função de contexto e os termos extras registrados com ela. Uma consulta vira um
+    vetor no mesmo espaço e é comparada a todas as perguntas com um produto de matrizes.
+    """
+
+    def __init__(self, documentos):
+        self.perguntas = list(documentos)
+        tokens = [termos(texto) for texto in documentos.values()]
+        self.vocabulario = {termo: i for i, termo in enumerate(sorted({termo for doc in tokens for termo in doc}))}
+        contagens = np.zeros((len(tokens), len(self.vocabulario)))
+        for linha, doc in enumerate(tokens):
+            for termo in doc:
+                contagens[linha, self.vocabulario[termo]] += 1
+        # IDF suavizado: termos presentes em todas as perguntas ainda pesam um pouco
+        documentos_com_termo = (contagens > 0).sum(axis=0)
+        self.idf = np.log((1 + len(tokens)) / (1 + documentos_com_termo)) + 1
+        self.matriz = self._normalizar(self._ponderar(contagens))
+
+    def _ponderar(self, contagens):
+        # TF sublinear: repetir uma palavra nos termos extras não domina a pergunta
+        tf = np.zeros_like(contagens)
+        np.log(contagens, out=tf, where=contagens > 0)
+        return np.where(contagens > 0, 1 + tf, 0) * self.idf
+
+    @staticmethod
+    def _normalizar(matriz):
+        normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+        return np.divide(matriz, normas, out=np.zeros_like(matriz), where=normas > 0)
+
+    def vetor(self, texto):
+        contagens = np.zeros(len(self.vocabulario))
+        for termo in termos(texto):
+            indice = self.vocabulario.get(termo)
+            if indice is not None:
+                contagens[indice] += 1
+        return self._normalizar(self._ponderar(contagens))
+
+    def consultar(self, texto, quantidade=MAX_CONTEXTOS):
+        """
+        Até `quantidade` pares (pergunta, similaridade de cosseno), do mais ao menos parecido,
+        só com similaridade positiva.
+        """
+        similaridades = self.matriz @ self.vetor(texto)
+        ordem = np.argsort(-similaridades, kind='stable')[:quantidade]
+        return [(self.perguntas[i], float(similaridades[i])) for i in ordem if similaridades[i] > 0]
+
+
+def _documentos():
+    return {
+        pergunta: ' '.join([pergunta, funcao.__name__.replace('_', ' '), termos_por_pergunta.get(pergunta, '')])
+        for pergunta, funcao in pergunta_para_funcao.items()
+    }
+
+
+def obter_indice_perguntas():
+    """
+    Índice das perguntas registradas em contextos.py, reconstruído apenas quando o catálogo muda.
+    """
+    global _indice
+    with _indice_lock:
+        if _indice is None or _indice.perguntas != list(pergunta_para_funcao):
+            _indice = IndicePerguntas(_documentos())
+        return _indice
+
+
+def rotear(pergunta, maximo=MAX_CONTEXTOS, minima=SIMILARIDADE_MINIMA, fracao=FRACAO_DA_MELHOR):
+    """
+    Perguntas do catálogo cujos contextos respondem à pergunta, da mais à menos relevante:
+    a mais parecida e as que chegam perto dela. Lista vazia quando nenhuma é parecida o bastante.
+    Perguntas do próprio catálogo vão direto para o seu contexto.
+    """
+    if pergunta in pergunta_para_funcao:
+        return [pergunta]
+    resultados = obter_indice_perguntas().consultar(pergunta, maximo)
+    if not resultados or resultados[0][1] < minima:
+        return []
+    melhor = resultados[0][1]
+    return [encontrada for encontrada, similaridade in resultados if similaridade >= max(minima, fracao * melhor)]
+
+
+def _truncar(texto, tokens):
+    # Corta em fim de linha quando possível, para não entregar um número pela metade
+    limite = tokens * CARACTERES_POR_TOKEN
+    if len(texto) <= limite:
+        return texto
+    corte = texto.rfind('\n', 0, limite)
+    return texto[:corte if corte > 0 else limite]
+
+
+def montar_prompt(pergunta, data, rotas=None, orcamento_tokens=ORCAMENTO_TOKENS):
+    """
+    Prompt com os contextos das perguntas roteadas, em ordem de relevância, dentro do orçamento
+    de tokens: contextos adicionais que não cabem ficam de fora e o principal é truncado se
+    preciso. None quando a pergunta não corresponde a nenhum contexto.
+    """
+    rotas = rotear(pergunta) if rotas is None else rotas
+    if not rotas:
+        return None
+    # Pergunta livre que cita anos: contextos de um ano fixo são gerados para os anos citados
+    anos = [] if pergunta in pergunta_para_funcao else anos_citados(pergunta)
+    restante = orcamento_tokens - estimar_tokens(f"\n\n{INSTRUCAO}\n{pergunta}\nResposta:")
+    contextos = []
+    for rota in rotas:
+        if anos and rota in contexto_por_ano:
+            contexto = "\n".join(contexto_por_ano[rota](data, ano) for ano in anos)
+        else:
+            contexto = pergunta_para_funcao[rota](data)
+        custo = estimar_tokens(contexto) + (1 if contextos else 0)
+        if custo > restante:
+            if contextos:
+                continue
+            contexto = _truncar(contexto, max(restante, 0))
+            custo = estimar_tokens(contexto)
+        contextos.append(contexto)
+        restante -= custo
+    return "\n\n".join(contextos) + f"\n\n{INSTRUCAO}\n{pergunta}\nResposta:"
@@ -0,0 +1,201 @@
+import argparse
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from dados import CAMINHO_CSV, COLUNAS_CATEGORICAS, LINHAS_POR_BLOCO, ORDEM_DIAS_SEMANA, converter_tipos
+
+# Peso da distribuição geral do grupo na distribuição condicional (suavização aditiva):
+# valores do pai com poucos óbitos ficam perto da distribuição geral
+SUAVIZACAO = 5.0
+# Deslocamento aleatório das coordenadas, em graus (~50 m), para os pontos não se repetirem
+DISPERSAO_COORDENADAS = 0.0005
+
+# Colunas sorteadas juntas, a partir das combinações observadas no extrato real (com os
+# "NAO DISPONIVEL" e "Bairro não identificado" de cada combinação), opcionalmente
+# condicionadas a uma coluna de um grupo anterior
+Grupo = namedtuple('Grupo', ['colunas', 'pai'])
+GRUPOS = [
+    Grupo(['Ano', 'Mes do Sinistro'], None),
+    Grupo(['Dia do Sinistro'], None),
+    Grupo(['Hora do Sinistro', 'Turno'], None),
+    Grupo([
+        'Bairro', 'Logradouro', 'Numeral / KM', 'Tipo de Via', 'Tipo de local do sinistro', 'Jurisdicao',
+        'Administracao', 'Conservacao', 'Municipio', 'Regiao Administrativa', 'Latitude', 'Longitude',
+    ], None),
+    Grupo(['Tipo de Sinistro', 'Outro Veiculo Envolvido'], 'Bairro'),
+    Grupo(['Meio de locomocao da vitima', 'Tipo de vitima', 'Sexo', 'Faixa etaria', 'Idade da vitima', 'Local do Obito'], 'Tipo de Sinistro'),
+]
+
+# Dia da semana do Infosiga a partir de date.weekday() (0 = segunda-feira)
+_DIAS_SEMANA_POR_WEEKDAY = ORDEM_DIAS_SEMANA[1:] + ORDEM_DIAS_SEMANA[:1]
+
+
+def ler_extrato_bruto(caminho=CAMINHO_CSV):
+    # Tudo como texto, sem converter vazios: o extrato sintético sai no mesmo formato do real
+    return pd.read_csv(caminho, delimiter=';', index_col=0, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+class DistribuicaoGrupo:
+    """
+    Combinações observadas das colunas do grupo e, para cada valor do pai, as probabilidades
+    de cada combinação (suavizadas em direção à distribuição geral).
+    """
+
+    def __init__(self, data, grupo, suavizacao=SUAVIZACAO):
+        self.grupo = grupo
+        contagens = data.groupby(grupo.colunas, sort=True).size()
+        self.combinacoes = contagens.index.to_frame(index=False)
+        geral = contagens.to_numpy(dtype=float) / contagens.sum()
+        self.geral = geral
+        self.por_pai = {}
+        if grupo.pai is not None:
+            conjunta = data.groupby([grupo.pai, *grupo.colunas], sort=True).size()
+            for valor, serie in conjunta.groupby(level=0, sort=True):
+                observadas = serie.droplevel(0).reindex(contagens.index, fill_value=0).to_numpy(dtype=float)
+                self.por_pai[valor] = (observadas + suavizacao * geral) / (observadas.sum() + suavizacao)
+
+    def amostrar(self, linhas, rng, pais=None):
+        if pais is None:
+            escolhas = rng.choice(len(self.geral), size=linhas, p=self.geral)
+        else:
+            escolhas = np.empty(linhas, dtype=np.int64)
+            codigos, valores = pd.factorize(pais, sort=True)
+            for codigo, valor in enumerate(valores):
+                posicoes = np.flatnonzero(codigos == codigo)
+                probabilidades = self.por_pai.get(valor, self.geral)
+                escolhas[posicoes] = rng.choice(len(probabilidades), size=len(posicoes), p=probabilidades)
+        return self.combinacoes.iloc[escolhas].reset_index(drop=True)
+
+
+class ModeloSintetico:
+    """
+    Distribuições do extrato real usadas para sortear óbitos sintéticos com o mesmo esquema.
+    As colunas derivadas (data, dia da semana, ano do sinistro, mês do óbito) são recalculadas
+    a partir do dia sorteado, para que cada linha continue coerente.
+    """
+
+    def __init__(self, data, grupos=GRUPOS, suavizacao=SUAVIZACAO):
+        self.colunas = list(data.columns)
+        self.distribuicoes = [DistribuicaoGrupo(data, grupo, suavizacao) for grupo in grupos]
+        # Meses entre o sinistro e o óbito (o óbito pode ocorrer no mês seguinte)
+        obito = pd.to_datetime(data['Ano/Mes do Obito'], errors='coerce')
+        meses = (obito.dt.year * 12 + obito.dt.month) - (data['Ano'].astype(int) * 12 + data['Mes do Sinistro'].astype(int))
+        self.atrasos_obito = meses.dropna().astype(int).value_counts(normalize=True).sort_index()
+
+    @classmethod
+    def ajustar(cls, caminho=CAMINHO_CSV, suavizacao=SUAVIZACAO):
+        return cls(ler_extrato_bruto(caminho), suavizacao=suavizacao)
+
+    def amostrar(self, linhas, rng, inicio=0):
+        sorteadas = pd.DataFrame(index=pd.RangeIndex(linhas))
+        for distribuicao in self.distribuicoes:
+            pai = distribuicao.grupo.pai
+            parte = distribuicao.amostrar(linhas, rng, None if pai is None else sorteadas[pai].to_numpy())
+            sorteadas = pd.concat([sorteadas, parte], axis=1)
+
+        anos = sorteadas['Ano'].astype(int).to_numpy()
+        meses = sorteadas['Mes do Sinistro'].astype(int).to_numpy()
+        dias = sorteadas['Dia do Sinistro'].astype(int).to_numpy()
+        atrasos = rng.choice(self.atrasos_obito.index.to_numpy(), size=linhas, p=self.atrasos_obito.to_numpy())
+
+        # Poucas datas distintas (dias de ~5 anos): os textos são montados uma vez por data
+        datas, inverso = np.unique(((anos * 12 + meses - 1) * 32 + dias) * 4 + atrasos, return_inverse=True)
+        atrasos_datas = datas % 4
+        meses_datas = datas // 4 // 32
+        unicas = pd.DataFrame({'year': meses_datas // 12, 'month': meses_datas % 12 + 1, 'day': datas // 4 % 32})
+        # Dia sorteado além do fim do mês (ex.: 31 em abril) vira o último dia do mês
+        unicas['day'] = np.minimum(unicas['day'], pd.to_datetime(unicas.assign(day=1)).dt.days_in_month)
+        datas_sinistro = pd.to_datetime(unicas)
+        meses_obito = meses_datas + atrasos_datas
+        textos = pd.DataFrame({
+            'Dia do Sinistro': unicas['day'].astype(str),
+            'Data do Sinistro': datas_sinistro.dt.strftime('%d/%m/%y'),
+            'Dia da Semana': np.asarray(_DIAS_SEMANA_POR_WEEKDAY)[datas_sinistro.dt.weekday.to_numpy()],
+            'Ano/Mes do Obito': [f"{mes // 12}-{mes % 12 + 1:02d}-01 00:00:00" for mes in meses_obito],
+        })
+        for coluna in textos.columns:
+            sorteadas[coluna] = textos[coluna].to_numpy()[inverso]
+        sorteadas['Ano do Sinistro'] = sorteadas['Ano']
+        for coluna in ('Latitude', 'Longitude'):
+            sorteadas[coluna] = self._dispersar(sorteadas[coluna], rng)
+
+        sorteadas.index = pd.RangeIndex(inicio, inicio + linhas)
+        return sorteadas[self.colunas]
+
+    @staticmethod
+    def _dispersar(coordenadas, rng):
+        codigos, unicas = pd.factorize(coordenadas)
+        valores = pd.to_numeric(pd.Series(unicas).str.replace(',', '.', regex=False), errors='coerce').to_numpy()[codigos]
+        valores = valores + rng.uniform(-DISPERSAO_COORDENADAS, DISPERSAO_COORDENADAS, size=len(valores))
+        return [('' if np.isnan(valor) else f"{valor:.6f}".replace('.', ',')) for valor in valores.tolist()]
+
+
+def gerar_blocos(modelo, linhas, semente=0, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Sorteia `linhas` óbitos em blocos de até `linhas_por_bloco`. O bloco i usa a semente
+    (semente, i): a mesma semente e o mesmo tamanho de bloco geram sempre o mesmo extrato.
+    """
+    for numero, inicio in enumerate(range(0, linhas, linhas_por_bloco)):
+        rng = np.random.default_rng([semente, numero])
+        yield modelo.amostrar(min(linhas_por_bloco, linhas - inicio), rng, inicio)
+
+
+def _gravar_csv(blocos, caminho):
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as arquivo:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(arquivo, sep=';', header=i == 0)
+
+
+def _gravar_parquet(blocos, caminho):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Tipado como nas partições do armazém; as categorias viram texto para o esquema ser igual em todos os blocos
+    escritor = None
+    try:
+        for bloco in blocos:
+            bloco = converter_tipos(bloco.replace('', None))
+            for coluna in COLUNAS_CATEGORICAS:
+                if coluna in bloco.columns:
+                    bloco[coluna] = bloco[coluna].astype('string')
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            escritor.write_table(tabela.cast(escritor.schema))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def gerar_extrato_sintetico(caminho, linhas, semente=0, origem=CAMINHO_CSV, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Grava um extrato sintético com `linhas` óbitos em CSV (formato do Infosiga) ou Parquet,
+    conforme a extensão de `caminho`, um bloco por vez.
+    """
+    modelo = ModeloSintetico.ajustar(origem)
+    gravar = _gravar_parquet if caminho.endswith('.parquet') else _gravar_csv
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        gravar(gerar_blocos(modelo, linhas, semente, linhas_por_bloco), temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera extratos sintéticos com as distribuições de obitos_final.csv.")
+    parser.add_argument('saida', help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--linhas', type=int, required=True, help="Quantidade de óbitos sorteados")
+    parser.add_argument('--semente', type=int, default=0, help="Semente do sorteio")
+    parser.add_argument('--origem', default=CAMINHO_CSV, help="Extrato real usado para ajustar as distribuições")
+    args = parser.parse_args()
+
+    gerar_extrato_sintetico(args.saida, args.linhas, args.semente, args.origem)
+    print(f"{args.saida}: {args.linhas} óbitos sintéticos (semente {args.semente})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import pandas as pd
+from agregados import Cubo, colunas_necessarias, cubo_da_fonte, obter_cubo
+from dados import CAMINHO_CSV, carregar_dados, ler_csv_em_blocos
+
+
+def _dados():
+    return pd.DataFrame({
+        'Ano': [2020, 2020, 2021, 2021, 2021],
+        'Tipo de vitima': pd.Categorical(['CONDUTOR', 'PEDESTRE', 'CONDUTOR', 'PASSAGEIRO', 'NAO DISPONIVEL']),
+        'Turno': ['NOITE', 'MANHA', 'NOITE', 'NAO DISPONIVEL', 'TARDE'],
+        'Tipo de Via': ['RODOVIAS', 'RODOVIAS', 'VIAS MUNICIPAIS', 'RODOVIAS', 'RODOVIAS'],
+    })
+
+
+def test_cubo_totais_por_ano():
+    cubo = Cubo.construir(_dados())
+    assert cubo.anos() == [2020, 2021]
+    assert cubo.total() == 5
+    assert cubo.total(2021) == 3
+    assert cubo.total(2019) == 0
+
+
+
+def test_cubo_por_periodo():
+    cubo = Cubo.construir(_dados())
+    assert cubo.total((2019, 2020, 2021)) == 5
+    assert cubo.contagens('Ano', (2021,)).to_dict() == {2021: 3}
+    assert cubo.contagens('Tipo de Via', (2020, 2021)).to_dict() == cubo.contagens('Tipo de Via').to_dict()
+    assert cubo.quantidade('Tipo de vitima', ['CONDUTOR'], (2020, 2021)) == 2
+    assert cubo.contagens(('Turno', 'Tipo de Via'), (2020,)).to_dict() == {('MANHA', 'RODOVIAS'): 1, ('NOITE', 'RODOVIAS'): 1}
+
+def test_cubo_contagens_equivalem_ao_groupby():
+    data = _dados()
+    cubo = Cubo.construir(data)
+    esperado = data[data['Ano'] == 2021]['Tipo de vitima'].value_counts()
+    esperado = esperado[esperado > 0].sort_index()
+    pd.testing.assert_series_equal(cubo.contagens('Tipo de vitima', 2021).sort_index(), esperado, check_names=False)
+    assert cubo.contagens('Tipo de vitima').to_dict() == {'CONDUTOR': 2, 'PASSAGEIRO': 1, 'PEDESTRE': 1, 'NAO DISPONIVEL': 1}
+    assert cubo.quantidade('Tipo de vitima', ['CONDUTOR', 'PASSAGEIRO'], 2021) == 2
+    assert cubo.contagens('Tipo de vitima', 2019).empty
+
+
+def test_cubo_contagens_cruzadas_com_exclusao():
+    cubo = Cubo.construir(_dados())
+    turno_via = cubo.contagens(('Turno', 'Tipo de Via'), excluir=['NAO DISPONIVEL'])
+    assert turno_via.to_dict() == {('MANHA', 'RODOVIAS'): 1, ('NOITE', 'RODOVIAS'): 1, ('NOITE', 'VIAS MUNICIPAIS'): 1, ('TARDE', 'RODOVIAS'): 1}
+
+
+def test_obter_cubo_memoizado_por_versao():
+    data = _dados()
+    assert obter_cubo(data, 'v-teste') is obter_cubo(data, 'v-teste')
+
+
+def test_cubo_em_blocos_igual_ao_cubo_completo():
+    cubo = Cubo.construir(carregar_dados(CAMINHO_CSV))
+    em_blocos = Cubo.construir_em_blocos(ler_csv_em_blocos(CAMINHO_CSV, colunas=colunas_necessarias(), linhas_por_bloco=37))
+    for chave, tabela in cubo.tabelas.items():
+        pd.testing.assert_series_equal(em_blocos.tabelas[chave], tabela, check_names=False, check_index_type=False)
+        assert list(em_blocos.tabelas[chave].index) == list(tabela.index), chave
+    assert em_blocos.contagens('Dia da Semana', 2021).index.tolist() == cubo.contagens('Dia da Semana', 2021).index.tolist()
+    assert em_blocos.media('Idade da vitima') == cubo.media('Idade da vitima')
+    assert cubo_da_fonte(CAMINHO_CSV, municipios=['FRANCA'], anos=[2021]).total() == cubo.total(2021)
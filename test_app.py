@@ -14,13 +14,28 @@ from app import (
     contexto_periodo_dia_mais_obitos,
     contexto_meio_locomocao_mais_obitos,
     contexto_tipos_acidentes_mais_comuns,
-    contexto_distribuicao_obitos_por_tipo_vitima,
-    contexto_default,
-    obter_resposta_maritaca_ai,
-    create_colored_bar_chart,
-    classificar_turno
+    contexto_proporcao_obitos_por_tipo_vitima,
+    pergunta_para_funcao,
+    obter_resposta_maritaca_ai
 )
+from dados import classificar_turno
+from graficos import create_colored_bar_chart
 from unittest.mock import patch, MagicMock
+import ast
+import os
+import subprocess
+import sys
+from assistente import CacheRespostas
+from benchmark import primeira_execucao
+
+# Orçamentos da partida a frio (o contêiner escala a zero): importações e primeira execução da página.
+# Dependem do relógio da máquina, então os testes só rodam com `pytest --slow`
+ORCAMENTO_IMPORTACAO = 3.0
+ORCAMENTO_PRIMEIRA_EXECUCAO = 20.0
+# Módulos que só devem ser importados quando usados pela primeira vez
+MODULOS_SOB_DEMANDA = ['plotly.express', 'requests', 'PIL.Image', 'dotenv', 'openpyxl']
+# Diretório do repositório, para os testes não dependerem de onde o pytest é executado
+DIRETORIO_REPOSITORIO = os.path.dirname(os.path.abspath(__file__))
 
 def test_load_data():
     data = load_data()
@@ -43,7 +58,7 @@ def test_contexto_obitos_2021():
 def test_contexto_faixa_etaria_mais_afetada():
     data = pd.DataFrame({'Faixa etaria': ['20-30', '20-30', '30-40', '40-50']})
     contexto = contexto_faixa_etaria_mais_afetada(data)
-    assert contexto == "A faixa etária mais afetada por acidentes é 20-30, com 2 óbitos."
+    assert contexto == "A faixa etária mais afetada por acidentes é entre 20-30, com 2 óbitos."
 
 def test_contexto_bairro_mais_obitos():
     data = pd.DataFrame({'Bairro': ['Centro', 'Centro', 'Bairro não identificado', 'Vila Nova']})
@@ -53,7 +68,7 @@ def test_contexto_bairro_mais_obitos():
 def test_contexto_tipo_via_mais_obitos():
     data = pd.DataFrame({'Tipo de Via': ['Rodovia', 'Avenida', 'Rodovia', 'Rua']})
     contexto = contexto_tipo_via_mais_obitos(data)
-    assert contexto == "O tipo de via com mais óbitos é Rodovia, com 2 óbitos."
+    assert contexto == "O tipo de via com mais óbitos são as Rodovia, com 2 óbitos."
 
 def test_contexto_obitos_por_dia_semana():
     data = pd.DataFrame({'Dia da Semana': ['Segunda-feira', 'Terça-feira', 'Segunda-feira', 'Quarta-feira']})
@@ -74,17 +89,17 @@ def test_contexto_sexo_mais_acidentes():
 def test_contexto_mes_mais_acidentes():
     data = pd.DataFrame({'Mes do Sinistro': ['Janeiro', 'Fevereiro', 'Janeiro', 'Março']})
     contexto = contexto_mes_mais_acidentes(data)
-    assert contexto == "O mês com mais acidentes é Janeiro, com 2 acidentes."
+    assert contexto == "O mês com mais acidentes é o mês Janeiro, com 2 acidentes."
 
 def test_contexto_dia_mes_mais_acidentes():
     data = pd.DataFrame({'Dia do Sinistro': [1, 2, 1, 3]})
     contexto = contexto_dia_mes_mais_acidentes(data)
-    assert contexto == "O dia do mês com mais acidentes é 1, com 2 acidentes."
+    assert contexto == "O dia do mês com mais acidentes é o dia 1, com 2 acidentes."
 
 def test_contexto_periodo_dia_mais_obitos():
     data = pd.DataFrame({'Turno': ['Manhã', 'Tarde', 'Manhã', 'Noite']})
     contexto = contexto_periodo_dia_mais_obitos(data)
-    assert contexto == "O período do dia com mais óbitos é Manhã, com 2 óbitos."
+    assert contexto == "O período do dia com mais óbitos é o período da Manhã, com 2 óbitos."
 
 def test_contexto_meio_locomocao_mais_obitos():
     data = pd.DataFrame({'Meio de locomocao da vitima': ['Carro', 'Moto', 'Carro', 'Bicicleta']})
@@ -97,30 +112,26 @@ def test_contexto_tipos_acidentes_mais_comuns():
     expected = "Os tipos de acidentes mais comuns são:\nColisão: 3 ocorrências\nAtropelamento: 1 ocorrências\nTombamento: 1 ocorrências\n"
     assert contexto == expected
 
-def test_contexto_distribuicao_obitos_por_tipo_vitima():
-    data = pd.DataFrame({
-        'Ano': [2021, 2021, 2020, 2019],
-        'Tipo de vitima': ['Condutor', 'Passageiro', 'Pedestre', 'Condutor']
-    })
-    pergunta = "Qual a distribuição de óbitos por tipo de vítima (condutor, passageiro, pedestre) em 2021?"
-    contexto = contexto_distribuicao_obitos_por_tipo_vitima(data, pergunta)
-    expected = "Distribuição de óbitos por tipo de vítima em 2021:\nCondutor: 1 óbitos\nPassageiro: 1 óbitos\n"
+def test_contexto_proporcao_obitos_por_tipo_vitima():
+    data = pd.DataFrame({'Tipo de vitima': ['Condutor', 'Passageiro', 'Pedestre', 'Condutor']})
+    contexto = contexto_proporcao_obitos_por_tipo_vitima(data)
+    expected = "Proporção de óbitos por tipo de vítima (em %):\nCondutor: 50.00%\nPassageiro: 25.00%\nPedestre: 25.00%\n"
     assert contexto == expected
 
-def test_contexto_default():
-    data = pd.DataFrame()
-    contexto = contexto_default(data)
-    assert contexto == "Desculpe, não tenho informações para responder a essa pergunta."
+def test_perguntas_registradas():
+    assert "Quantos óbitos ocorreram em 2021?" in pergunta_para_funcao
+    assert pergunta_para_funcao["Quantos óbitos ocorreram em 2021?"] is contexto_obitos_2021
 
-@patch('app.maritalk.MariTalk')
-def test_obter_resposta_maritaca_ai(mock_MariTalk):
-    mock_model_instance = MagicMock()
-    mock_model_instance.generate.return_value = {"answer": "Resposta mockada"}
-    mock_MariTalk.return_value = mock_model_instance
+@patch('app.obter_cliente_maritaca')
+def test_obter_resposta_maritaca_ai(mock_obter_cliente, tmp_path):
+    mock_cliente = MagicMock()
+    mock_cliente.gerar.return_value = "Resposta mockada"
+    mock_obter_cliente.return_value = mock_cliente
 
     data = pd.DataFrame({'Ano': [2021, 2021, 2020, 2019]})
     pergunta = "Quantos óbitos ocorreram em 2021?"
-    resposta = obter_resposta_maritaca_ai(pergunta, data)
+    with patch('app.obter_cache_respostas', return_value=CacheRespostas(str(tmp_path / 'respostas.sqlite3'))):
+        resposta = obter_resposta_maritaca_ai(pergunta, data)
     assert resposta == "Resposta mockada"
 
 def test_create_colored_bar_chart():
@@ -149,5 +160,43 @@ def test_classificar_turno():
     assert classificar_turno(23) == 'Noite'
     assert classificar_turno(None) == 'Desconhecido'
 
+def _modulos_importados_pelo_app():
+    with open(os.path.join(DIRETORIO_REPOSITORIO, 'app.py'), encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos += [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom):
+            modulos.append(no.module)
+    return modulos
+
+def _importacoes_na_partida():
+    # Processo novo, como na partida do contêiner: só as importações de topo do app.py
+    script = (
+        "import sys, time\n"
+        "inicio = time.perf_counter()\n"
+        f"for modulo in {_modulos_importados_pelo_app()!r}: __import__(modulo)\n"
+        "print(time.perf_counter() - inicio)\n"
+        f"print(','.join(m for m in {MODULOS_SOB_DEMANDA!r} if m in sys.modules))\n"
+    )
+    resultado = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                               cwd=DIRETORIO_REPOSITORIO)
+    tempo, carregados = resultado.stdout.splitlines()
+    return float(tempo), carregados
+
+def test_modulos_sob_demanda_fora_da_partida():
+    _, carregados = _importacoes_na_partida()
+    assert carregados == ''
+
+@pytest.mark.slow
+def test_importacoes_na_partida():
+    tempo, _ = _importacoes_na_partida()
+    assert tempo < ORCAMENTO_IMPORTACAO
+
+@pytest.mark.slow
+def test_primeira_execucao_da_pagina():
+    assert primeira_execucao({'MARITACA_PRE_BUSCA': '0'}) < ORCAMENTO_PRIMEIRA_EXECUCAO
+
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
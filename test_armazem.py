@@ -0,0 +1,69 @@
+import os
+import pandas as pd
+from agregados import Cubo, cubo_do_armazem
+from armazem import chaves_registros, ingerir, ler_metadados, resumo_armazem
+from dados import CAMINHO_CSV, adicionar_colunas_derivadas, carregar_dados, ler_csv
+from metricas import obter_metricas
+
+
+def test_chaves_distinguem_linhas_identicas_pela_ordem():
+    data = ler_csv(CAMINHO_CSV)
+    repetida = pd.concat([data.iloc[[0]], data.iloc[[0]], data.iloc[[1]]])
+    chaves = chaves_registros(repetida)
+    assert chaves.iloc[0] != chaves.iloc[1]
+    assert chaves.iloc[0].split('-')[0] == chaves.iloc[1].split('-')[0]
+    assert chaves_registros(repetida).tolist() == chaves.tolist()
+
+
+def test_ingestao_incremental_so_regrava_particoes_novas(tmp_path):
+    diretorio = str(tmp_path / 'armazem')
+    data = ler_csv(CAMINHO_CSV)
+    ultimo_mes = (data['Ano'] == 2023) & (data['Mes do Sinistro'] == 12)
+
+    resultado = ingerir(data[~ultimo_mes], diretorio, agora='2024-10-01T08:00:00')
+    assert resultado['novos'] == int((~ultimo_mes).sum())
+    janeiro = os.path.join(diretorio, ler_metadados(diretorio)['particoes']['2019-01']['arquivo'])
+    gravado_em = os.stat(janeiro).st_mtime_ns
+
+    # O extrato do mês seguinte repete o histórico: só a partição nova é gravada
+    resultado = ingerir(data, diretorio, agora='2024-11-18T08:00:00')
+    assert resultado == {'novos': int(ultimo_mes.sum()), 'repetidos': int((~ultimo_mes).sum()), 'particoes_alteradas': ['2023-12']}
+    assert os.stat(janeiro).st_mtime_ns == gravado_em
+    assert ler_metadados(diretorio)['particoes']['2019-01']['atualizado_em'] == '2024-10-01T08:00:00'
+
+    resumo = resumo_armazem(diretorio)
+    assert resumo.anos == [2019, 2020, 2021, 2022, 2023]
+    assert resumo.ultima_atualizacao.strftime('%d/%m/%Y') == '18/11/2024'
+    assert resumo.linhas == len(data)
+    assert ingerir(data, diretorio)['particoes_alteradas'] == []
+
+
+def test_carregar_dados_do_armazem_equivale_ao_csv(tmp_path):
+    diretorio = str(tmp_path / 'armazem')
+    ingerir(ler_csv(CAMINHO_CSV), diretorio)
+    do_armazem = carregar_dados(diretorio, str(tmp_path / 'cache'))
+    do_csv = adicionar_colunas_derivadas(ler_csv(CAMINHO_CSV)).sort_values(['Ano', 'Mes do Sinistro'], kind='stable')
+    assert list(do_armazem.columns) == list(do_csv.columns)
+    assert (do_armazem.dtypes == do_csv.dtypes).all()
+    assert do_armazem['Bairro'].value_counts().equals(do_csv['Bairro'].value_counts())
+    assert resumo_armazem(str(tmp_path / 'inexistente')) is None
+
+
+def test_cubo_do_armazem_so_reagrega_particoes_alteradas(tmp_path):
+    diretorio = str(tmp_path / 'armazem')
+    data = ler_csv(CAMINHO_CSV)
+    ultimo_mes = (data['Ano'] == 2023) & (data['Mes do Sinistro'] == 12)
+    ingerir(data[~ultimo_mes], diretorio, agora='2024-10-01T08:00:00')
+    metricas = obter_metricas()
+    cubo_do_armazem(diretorio, ['FRANCA'])
+
+    ingerir(data, diretorio, agora='2024-11-18T08:00:00')
+    falhas = metricas.contadores().get('cache_cubos_particoes_falhas', 0)
+    cubo = cubo_do_armazem(diretorio, ['FRANCA'])
+    assert metricas.contadores()['cache_cubos_particoes_falhas'] - falhas == 1
+
+    completo = Cubo.construir(carregar_dados(diretorio, diretorio=str(tmp_path / 'cache'), municipios=['FRANCA']))
+    for chave, tabela in completo.tabelas.items():
+        pd.testing.assert_series_equal(cubo.tabelas[chave], tabela, check_names=False, check_index_type=False, check_dtype=False)
+        assert list(cubo.tabelas[chave].index) == list(tabela.index), chave
+    assert cubo.media('Idade da vitima') == completo.media('Idade da vitima')
@@ -0,0 +1,257 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from assistente import (
+    CacheRespostas,
+    CircuitoAberto,
+    ClienteMaritaca,
+    Disjuntor,
+    ErroMaritaca,
+    PreBuscaRespostas,
+    StreamingIndisponivel,
+    iniciar_pre_busca,
+)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_cache_respostas_acerto_e_falha(tmp_path):
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'))
+    assert cache.obter('sabia-3', 'prompt') is None
+    cache.salvar('sabia-3', 'prompt', 'resposta')
+    assert cache.obter('sabia-3', 'prompt') == 'resposta'
+    assert cache.obter('outro-modelo', 'prompt') is None
+    assert cache.estatisticas() == {'acertos': 1, 'falhas': 2, 'entradas': 1}
+
+
+def test_cache_respostas_compartilhado_em_disco(tmp_path):
+    caminho = str(tmp_path / 'respostas.sqlite3')
+    CacheRespostas(caminho).salvar('sabia-3', 'prompt', 'resposta')
+    assert CacheRespostas(caminho).obter('sabia-3', 'prompt') == 'resposta'
+
+
+def test_cache_respostas_expira_pelo_ttl(tmp_path):
+    relogio = Relogio()
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'), ttl=60, relogio=relogio)
+    cache.salvar('sabia-3', 'prompt', 'resposta')
+    relogio.agora += 61
+    assert cache.obter('sabia-3', 'prompt') is None
+    assert cache.estatisticas()['entradas'] == 0
+
+
+def test_cache_respostas_descarta_menos_usada(tmp_path):
+    relogio = Relogio()
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'), max_entradas=2, relogio=relogio)
+    cache.salvar('sabia-3', 'a', 'A')
+    relogio.agora += 1
+    cache.salvar('sabia-3', 'b', 'B')
+    relogio.agora += 1
+    assert cache.obter('sabia-3', 'a') == 'A'
+    relogio.agora += 1
+    cache.salvar('sabia-3', 'c', 'C')
+    assert cache.obter('sabia-3', 'b') is None
+    assert cache.obter('sabia-3', 'a') == 'A'
+    assert cache.obter('sabia-3', 'c') == 'C'
+
+
+class StubMaritaca(BaseHTTPRequestHandler):
+    # Sequência de (status, corpo) devolvida pelo servidor local, uma por requisição
+    respostas = []
+    requisicoes = []
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requisicoes.append((self.path, self.headers.get('Authorization'), corpo))
+        status, resposta = self.respostas.pop(0) if self.respostas else (200, {'answer': 'ok'})
+        if isinstance(resposta, list):
+            # Lista de trechos: responde como server-sent events
+            dados = ''.join(f"data: {json.dumps({'text': trecho})}\n\n" for trecho in resposta).encode('utf-8')
+            tipo = 'text/event-stream'
+        else:
+            dados = json.dumps(resposta).encode('utf-8')
+            tipo = 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_stub():
+    StubMaritaca.respostas = []
+    StubMaritaca.requisicoes = []
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubMaritaca)
+    threading.Thread(target=servidor.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/api"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _cliente(url, **kwargs):
+    return ClienteMaritaca('chave-teste', url_base=url, dormir=lambda segundos: None, **kwargs)
+
+
+def test_cliente_maritaca_gera_resposta(servidor_stub):
+    StubMaritaca.respostas = [(200, {'answer': 'Resposta do stub'})]
+    assert _cliente(servidor_stub).gerar('Pergunta', max_tokens=10) == 'Resposta do stub'
+    caminho, autorizacao, corpo = StubMaritaca.requisicoes[0]
+    assert caminho == '/api/chat/inference'
+    assert autorizacao == 'Key chave-teste'
+    assert corpo['model'] == 'sabia-3' and corpo['messages'] == 'Pergunta' and corpo['max_tokens'] == 10
+
+
+def test_cliente_maritaca_envia_amostragem_do_sdk(servidor_stub):
+    # Os mesmos padrões de amostragem do SDK maritalk, nas chamadas bloqueantes e em streaming
+    cliente = _cliente(servidor_stub)
+    cliente.gerar('Pergunta', max_tokens=10)
+    StubMaritaca.respostas = [(200, ['ok'])]
+    list(cliente.gerar_stream('Pergunta', max_tokens=10))
+    for _, _, corpo in StubMaritaca.requisicoes:
+        assert (corpo['temperature'], corpo['top_p'], corpo['do_sample']) == (0.7, 0.95, True)
+    assert [corpo['stream'] for _, _, corpo in StubMaritaca.requisicoes] == [False, True]
+    _cliente(servidor_stub, temperatura=0.0, amostragem=False).gerar('Pergunta')
+    assert StubMaritaca.requisicoes[-1][2]['temperature'] == 0.0
+    assert StubMaritaca.requisicoes[-1][2]['do_sample'] is False
+
+
+def test_cliente_maritaca_repete_em_429_e_5xx(servidor_stub):
+    StubMaritaca.respostas = [(429, {}), (503, {}), (200, {'answer': 'depois de repetir'})]
+    assert _cliente(servidor_stub).gerar('Pergunta') == 'depois de repetir'
+    assert len(StubMaritaca.requisicoes) == 3
+
+
+def test_cliente_maritaca_nao_repete_erro_do_cliente(servidor_stub):
+    StubMaritaca.respostas = [(401, {'detail': 'chave inválida'})]
+    with pytest.raises(ErroMaritaca, match='401'):
+        _cliente(servidor_stub).gerar('Pergunta')
+    assert len(StubMaritaca.requisicoes) == 1
+
+
+def test_cliente_maritaca_abre_circuito(servidor_stub):
+    relogio = Relogio()
+    cliente = _cliente(servidor_stub, max_tentativas=1, disjuntor=Disjuntor(limite_falhas=2, tempo_aberto=30, relogio=relogio))
+    StubMaritaca.respostas = [(500, {}), (500, {})]
+    for _ in range(2):
+        with pytest.raises(ErroMaritaca):
+            cliente.gerar('Pergunta')
+    with pytest.raises(CircuitoAberto):
+        cliente.gerar('Pergunta')
+    assert len(StubMaritaca.requisicoes) == 2
+
+    relogio.agora += 31
+    assert cliente.gerar('Pergunta') == 'ok'
+
+
+def test_disjuntor_meio_aberto_libera_uma_chamada_de_teste():
+    relogio = Relogio()
+    disjuntor = Disjuntor(limite_falhas=2, tempo_aberto=30, relogio=relogio)
+    disjuntor.registrar_falha()
+    disjuntor.registrar_falha()
+    assert not disjuntor.permitir()
+
+    relogio.agora += 31
+    assert [disjuntor.permitir() for _ in range(3)] == [True, False, False]
+    # O teste falha: o circuito volta a abrir por mais `tempo_aberto` segundos
+    disjuntor.registrar_falha()
+    relogio.agora += 29
+    assert not disjuntor.permitir()
+    relogio.agora += 2
+    assert [disjuntor.permitir() for _ in range(2)] == [True, False]
+    disjuntor.registrar_sucesso()
+    assert all(disjuntor.permitir() for _ in range(3))
+
+
+def test_cliente_maritaca_stream(servidor_stub):
+    StubMaritaca.respostas = [(200, ['Em ', '2021 ', 'foram 39.'])]
+    assert list(_cliente(servidor_stub).gerar_stream('Pergunta')) == ['Em ', '2021 ', 'foram 39.']
+    assert StubMaritaca.requisicoes[0][2]['stream'] is True
+
+
+def test_cliente_maritaca_stream_sem_suporte(servidor_stub):
+    StubMaritaca.respostas = [(200, {'answer': 'resposta completa'}), (404, {'detail': 'not found'})]
+    cliente = _cliente(servidor_stub)
+    assert list(cliente.gerar_stream('Pergunta')) == ['resposta completa']
+    with pytest.raises(StreamingIndisponivel):
+        list(cliente.gerar_stream('Pergunta'))
+
+
+class ClienteFalso:
+    modelo = 'sabia-3'
+
+    def __init__(self):
+        self.chamadas = []
+        self._lock = threading.Lock()
+
+    def gerar(self, prompt, max_tokens=500):
+        with self._lock:
+            self.chamadas.append(prompt)
+        if 'falha' in prompt:
+            raise ErroMaritaca('HTTP 500')
+        return f"resposta para {prompt}"
+
+
+def _aguardar(pre_busca):
+    limite = time.monotonic() + 5
+    while not pre_busca.concluida and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert pre_busca.concluida
+
+
+def test_pre_busca_preenche_cache(tmp_path):
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'))
+    cliente = ClienteFalso()
+    tarefas = [(pergunta, ano) for ano in ['Todos', 2021] for pergunta in ['p1', 'p2', 'falha']]
+    pre_busca = PreBuscaRespostas(cliente, cache, max_trabalhadores=3).iniciar(tarefas, lambda pergunta, ano: f"{pergunta}-{ano}")
+    _aguardar(pre_busca)
+
+    assert pre_busca.progresso() == {'total': 6, 'concluidas': 6, 'falhas': 2}
+    assert cache.obter('sabia-3', 'p1-2021') == 'resposta para p1-2021'
+    assert cache.estatisticas()['entradas'] == 4
+
+    # Uma nova pré-busca só chama a API para o que não está em cache
+    cliente.chamadas.clear()
+    _aguardar(PreBuscaRespostas(cliente, cache).iniciar(tarefas, lambda pergunta, ano: f"{pergunta}-{ano}"))
+    assert sorted(cliente.chamadas) == ['falha-2021', 'falha-Todos']
+
+
+def test_iniciar_pre_busca_uma_vez_por_versao(tmp_path):
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'))
+    cliente = ClienteFalso()
+    primeira = iniciar_pre_busca('versao-teste', cliente, [('p1', 2021)], lambda pergunta, ano: pergunta, cache=cache)
+    segunda = iniciar_pre_busca('versao-teste', cliente, [('p1', 2021)], lambda pergunta, ano: pergunta, cache=cache)
+    assert primeira is segunda
+    _aguardar(primeira)
+    assert cliente.chamadas == ['p1']
+
+
+def test_pre_busca_de_versao_nova_cancela_a_anterior(tmp_path):
+    cache = CacheRespostas(str(tmp_path / 'respostas.sqlite3'))
+    liberar = threading.Event()
+
+    class ClienteLento(ClienteFalso):
+        def gerar(self, prompt, max_tokens=500):
+            liberar.wait(5)
+            return super().gerar(prompt, max_tokens)
+
+    cliente = ClienteLento()
+    antiga = iniciar_pre_busca('versao-antiga', cliente, [(f"p{i}", 2021) for i in range(10)],
+                               lambda pergunta, ano: f"antiga-{pergunta}", cache=cache, max_trabalhadores=1)
+    nova = iniciar_pre_busca('versao-nova', cliente, [('p1', 2021)], lambda pergunta, ano: f"nova-{pergunta}", cache=cache)
+    assert antiga.cancelada and antiga.concluida
+    liberar.set()
+    _aguardar(nova)
+    # Só a tarefa que já estava em andamento na versão antiga chegou à API
+    assert len([chamada for chamada in cliente.chamadas if chamada.startswith('antiga-')]) <= 1
+    assert iniciar_pre_busca('versao-nova', cliente, [], lambda pergunta, ano: pergunta, cache=cache) is nova
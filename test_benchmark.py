@@ -0,0 +1,30 @@
+from benchmark import comparar, gerar_extrato, medir_escala, salvar_base, ler_base
+from contextos import pergunta_para_funcao
+from dados import CAMINHO_CSV, ler_csv
+from graficos import GRAFICOS
+
+
+def test_extrato_ampliado_mantem_o_esquema(tmp_path):
+    original = ler_csv(CAMINHO_CSV)
+    ampliado = ler_csv(gerar_extrato(3, str(tmp_path)))
+    assert len(ampliado) == 3 * len(original)
+    assert list(ampliado.columns) == list(original.columns)
+    assert ampliado.index.is_unique
+    assert (ampliado['Bairro'].value_counts() == 3 * original['Bairro'].value_counts()).all()
+
+
+def test_medidas_de_uma_escala(tmp_path):
+    tempos = medir_escala(1, repeticoes=1, pagina=False, diretorio=str(tmp_path))
+    assert {'load_data', 'load_data_snapshot', 'cubo'} <= set(tempos)
+    assert {f"contexto:{funcao.__name__}" for funcao in pergunta_para_funcao.values()} <= set(tempos)
+    assert {f"grafico:{id_grafico}" for id_grafico in GRAFICOS} <= set(tempos)
+    assert all(tempo > 0 for tempo in tempos.values())
+
+
+def test_regressao_acima_do_limite(tmp_path):
+    caminho = str(tmp_path / 'base.json')
+    salvar_base({'1x': {'cubo': 0.2, 'load_data': 0.01}}, caminho)
+    base = ler_base(caminho)
+    assert comparar({'1x': {'cubo': 0.25, 'load_data': 0.04}}, base, limite=0.5, minimo=0.05) == []
+    assert comparar({'1x': {'cubo': 0.31, 'nova_medida': 9.0}}, base, limite=0.5, minimo=0.05) == [('1x', 'cubo', 0.2, 0.31)]
+    assert ler_base(str(tmp_path / 'inexistente.json')) == {}
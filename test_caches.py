@@ -0,0 +1,41 @@
+import threading
+import time
+from caches import CacheLimitado
+from metricas import obter_metricas
+
+
+def test_descarta_a_entrada_usada_ha_mais_tempo_e_conta_acertos():
+    cache = CacheLimitado('teste_lru', 2)
+    contadores = obter_metricas().contadores()
+    acertos = contadores.get('cache_teste_lru_acertos', 0)
+    falhas = contadores.get('cache_teste_lru_falhas', 0)
+
+    assert cache.obter('a', lambda: 1) == 1
+    assert cache.obter('b', lambda: 2) == 2
+    assert cache.obter('a', lambda: 10) == 1
+    cache.obter('c', lambda: 3)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert len(cache) == 2
+
+    contadores = obter_metricas().contadores()
+    assert contadores['cache_teste_lru_acertos'] - acertos == 1
+    assert contadores['cache_teste_lru_falhas'] - falhas == 3
+
+
+def test_constroi_cada_chave_uma_vez_entre_threads():
+    cache = CacheLimitado('teste_threads', 4)
+    construcoes = []
+
+    def construir():
+        construcoes.append(1)
+        time.sleep(0.05)
+        return object()
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.obter('x', construir))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(construcoes) == 1
+    assert all(resultado is resultados[0] for resultado in resultados)
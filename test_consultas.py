@@ -0,0 +1,35 @@
+import pytest
+from agregados import Cubo
+from armazem import ingerir
+from dados import CAMINHO_CSV, caminho_snapshot, carregar_snapshot, impressao_digital, ler_csv
+
+pytest.importorskip('duckdb')
+from consultas import construir_cubo_sql  # noqa: E402
+
+
+def _mesmas_tabelas(cubo, esperado):
+    assert set(cubo.tabelas) == set(esperado.tabelas)
+    for chave, tabela in esperado.tabelas.items():
+        assert cubo.tabelas[chave].to_dict() == tabela.to_dict(), chave
+        assert list(cubo.tabelas[chave].index) == list(tabela.index), chave
+
+
+def test_cubo_sql_do_snapshot_igual_ao_do_pandas(tmp_path):
+    cache = str(tmp_path / 'cache')
+    data = carregar_snapshot(CAMINHO_CSV, cache)
+    esperado = Cubo.construir(data)
+    cubo = construir_cubo_sql(caminho_snapshot(CAMINHO_CSV, impressao_digital(CAMINHO_CSV), cache))
+    _mesmas_tabelas(cubo, esperado)
+    assert cubo.media('Idade da vitima', 2021) == pytest.approx(esperado.media('Idade da vitima', 2021))
+
+
+def test_cubo_sql_direto_do_armazem_com_filtros(tmp_path):
+    diretorio = str(tmp_path / 'armazem')
+    ingerir(ler_csv(CAMINHO_CSV), diretorio)
+    data = carregar_snapshot(CAMINHO_CSV, str(tmp_path / 'cache'))
+    # As partições não têm as colunas derivadas: a consulta calcula turno e nome do mês
+    _mesmas_tabelas(construir_cubo_sql(diretorio, municipios=['FRANCA']), Cubo.construir(data))
+    filtrado = construir_cubo_sql(diretorio, municipios=['FRANCA'], anos=[2021, 2022])
+    assert filtrado.anos() == [2021, 2022]
+    assert filtrado.contagens('Nome do Mes', 2021).to_dict() == Cubo.construir(data).contagens('Nome do Mes', 2021).to_dict()
+    assert construir_cubo_sql(diretorio, municipios=['SANTOS']).total() == 0
@@ -0,0 +1,66 @@
+import pandas as pd
+from agregados import Cubo
+from contextos import (
+    FrequenciasDataFrame,
+    contexto_comparativo_dezembro_janeiro,
+    contexto_comparativo_obitos_por_mes,
+    contexto_idade_media_vitimas,
+    contexto_obitos_por_dia_semana,
+    obter_frequencias,
+    pergunta_para_funcao,
+)
+
+
+def _dados():
+    return pd.DataFrame({
+        'Ano': [2020, 2020, 2020, 2021, 2021, 2021],
+        'Mes do Sinistro': [12, 12, 5, 1, 1, 12],
+        'Dia do Sinistro': [1, 2, 1, 3, 3, 4],
+        'Hora do Sinistro': [22, 10, 22, 3, 8, 22],
+        'Idade da vitima': pd.array([20, 30, None, 40, 50, 60], dtype='Int8'),
+        'Faixa etaria': pd.Categorical(['18-24', '25-29', 'NAO DISPONIVEL', '40-44', '50-54', '60-64']),
+        'Bairro': pd.Categorical(['CENTRO', 'CENTRO', 'Bairro não identificado', 'ESTACAO', 'CENTRO', 'ESTACAO']),
+        'Tipo de Via': pd.Categorical(['RODOVIAS', 'VIAS MUNICIPAIS', 'RODOVIAS', 'RODOVIAS', 'VIAS MUNICIPAIS', 'RODOVIAS']),
+        'Dia da Semana': pd.Categorical(['SABADO', 'DOMINGO', 'SABADO', 'SEXTA', 'SEXTA', 'DOMINGO']),
+        'Sexo': pd.Categorical(['MASCULINO', 'MASCULINO', 'FEMININO', 'MASCULINO', 'FEMININO', 'MASCULINO']),
+        'Turno': pd.Categorical(['NOITE', 'MANHA', 'NOITE', 'MADRUGADA', 'MANHA', 'NOITE']),
+        'Meio de locomocao da vitima': pd.Categorical(['MOTOCICLETA', 'PEDESTRE', 'MOTOCICLETA', 'AUTOMOVEL', 'PEDESTRE', 'MOTOCICLETA']),
+        'Tipo de Sinistro': pd.Categorical(['CHOQUE', 'ATROPELAMENTO', 'CHOQUE', 'COLISAO FRONTAL', 'ATROPELAMENTO', 'CHOQUE']),
+        'Tipo de vitima': pd.Categorical(['CONDUTOR', 'PEDESTRE', 'CONDUTOR', 'PASSAGEIRO', 'PEDESTRE', 'CONDUTOR']),
+    })
+
+
+def test_contextos_do_cubo_iguais_aos_do_dataframe():
+    data = _dados()
+    cubo = Cubo.construir(data)
+    assert len(pergunta_para_funcao) == 17
+    for ano in [None, 2020, 2021]:
+        linhas = data if ano is None else data[data['Ano'] == ano]
+        frequencias = obter_frequencias(cubo, 'teste-equivalencia', ano)
+        for pergunta, funcao in pergunta_para_funcao.items():
+            assert funcao(frequencias) == funcao(linhas), pergunta
+
+
+def test_frequencias_memoizadas_por_versao_e_filtro():
+    cubo = Cubo.construir(_dados())
+    frequencias = obter_frequencias(cubo, 'teste-memo', 2020)
+    assert obter_frequencias(cubo, 'teste-memo', 2020) is frequencias
+    assert obter_frequencias(cubo, 'teste-memo', 2021) is not frequencias
+    assert frequencias.contagens('Bairro') is frequencias.contagens('Bairro')
+
+
+def test_contextos_comparativos_por_ano():
+    data = _dados()
+    assert contexto_comparativo_obitos_por_mes(data) == (
+        "Meses com os maiores picos de óbitos por ano:\n2020: 12 - 2 óbitos\n2021: 1 - 2 óbitos\n"
+    )
+    dezembro_janeiro = contexto_comparativo_dezembro_janeiro(data)
+    assert "Ano: 2020 - Dezembro: 2 óbitos, Janeiro: 0 óbitos - Diferença: -2 óbitos\n" in dezembro_janeiro
+    assert dezembro_janeiro.endswith("Resumo: 2020: -2 óbitos, 2021: 1 óbitos")
+    assert contexto_idade_media_vitimas(FrequenciasDataFrame(data)) == "A idade média das vítimas de acidentes de trânsito é de 40 anos."
+
+
+def test_empates_mantem_ordem_de_aparicao_em_colunas_de_texto():
+    data = pd.DataFrame({'Dia da Semana': ['Segunda', 'Terça', 'Segunda', 'Quarta']})
+    contexto = contexto_obitos_por_dia_semana(data)
+    assert contexto == "Número de óbitos por dia da semana:\nSegunda: 2 óbitos\nTerça: 1 óbitos\nQuarta: 1 óbitos\n"
@@ -0,0 +1,158 @@
+import os
+import shutil
+import pandas as pd
+from dados import (
+    NOMES_MESES,
+    adicionar_colunas_derivadas,
+    caminho_snapshot,
+    carregar_dados,
+    carregar_snapshot,
+    classificar_turno,
+    impressao_digital,
+    ler_csv,
+    ler_csv_em_blocos,
+    ler_fonte,
+    limpar_cache,
+)
+
+
+def _copiar_csv(tmp_path):
+    destino = tmp_path / 'obitos.csv'
+    shutil.copy('obitos_final.csv', destino)
+    return str(destino)
+
+
+def test_ler_csv_tipado():
+    data = ler_csv('obitos_final.csv')
+    assert len(data) == 205
+    assert data['Latitude'].dtype == 'float64'
+    assert data['Latitude'].dropna().between(-21, -20).all()
+    assert isinstance(data['Bairro'].dtype, pd.CategoricalDtype)
+    assert data['Ano'].dtype == 'Int16'
+    assert pd.api.types.is_datetime64_any_dtype(data['Data do Sinistro'])
+    assert data['Data do Sinistro'].iloc[0] == pd.Timestamp('2019-01-08')
+
+
+def test_ler_csv_com_hora_e_mes_ausentes(tmp_path):
+    bruto = pd.read_csv('obitos_final.csv', delimiter=';', index_col=0, encoding='utf-8-sig', dtype=str)
+    bruto.iloc[0, bruto.columns.get_loc('Hora do Sinistro')] = 'NAO DISPONIVEL'
+    bruto.iloc[1, bruto.columns.get_loc('Mes do Sinistro')] = None
+    caminho = tmp_path / 'obitos.csv'
+    bruto.to_csv(caminho, sep=';')
+    data = adicionar_colunas_derivadas(ler_csv(str(caminho)))
+    assert len(data) == 205
+    assert data['Hora do Sinistro'].isna().sum() == 1
+    assert data['Turno Calculado'].iloc[0] == 'Desconhecido'
+    assert pd.isna(data['Nome do Mes'].iloc[1])
+    assert data['Nome do Mes'].iloc[2] == NOMES_MESES[int(bruto['Mes do Sinistro'].iloc[2]) - 1]
+
+
+def test_idade_acima_de_127_nao_transborda(tmp_path):
+    bruto = pd.read_csv('obitos_final.csv', delimiter=';', index_col=0, encoding='utf-8-sig', dtype=str)
+    bruto.iloc[0, bruto.columns.get_loc('Idade da vitima')] = '130'
+    caminho = tmp_path / 'obitos.csv'
+    bruto.to_csv(caminho, sep=';')
+    assert ler_csv(str(caminho))['Idade da vitima'].iloc[0] == 130
+
+
+def test_snapshot_invalidado_quando_csv_muda(tmp_path):
+    csv = _copiar_csv(tmp_path)
+    cache = str(tmp_path / 'cache')
+    data = carregar_snapshot(csv, cache)
+    primeiro = caminho_snapshot(csv, impressao_digital(csv), cache)
+    assert os.path.exists(primeiro)
+    pd.testing.assert_frame_equal(pd.read_parquet(primeiro), data)
+
+    with open(csv, 'rb') as f:
+        linhas = f.read().splitlines(keepends=True)
+    with open(csv, 'wb') as f:
+        f.writelines(linhas[:-1])
+    os.utime(csv, ns=(0, 1))
+
+    data = carregar_snapshot(csv, cache)
+    assert len(data) == 204
+    assert not os.path.exists(primeiro)
+    assert os.listdir(cache) == [os.path.basename(caminho_snapshot(csv, impressao_digital(csv), cache))]
+
+
+def test_snapshots_de_filtros_diferentes_convivem(tmp_path):
+    csv = _copiar_csv(tmp_path)
+    cache = str(tmp_path / 'cache')
+    carregar_snapshot(csv, cache)
+    carregar_snapshot(csv, cache, municipios=['FRANCA'])
+    carregar_snapshot(csv, cache, anos=[2021])
+    esperados = [
+        caminho_snapshot(csv, impressao_digital(csv), cache),
+        caminho_snapshot(csv, impressao_digital(csv, ['FRANCA']), cache, municipios=['FRANCA']),
+        caminho_snapshot(csv, impressao_digital(csv, anos=[2021]), cache, anos=[2021]),
+    ]
+    assert sorted(os.listdir(cache)) == sorted(os.path.basename(caminho) for caminho in esperados)
+
+    # Uma versão nova do CSV só substitui o snapshot do mesmo filtro
+    os.utime(csv, ns=(0, 1))
+    carregar_snapshot(csv, cache, municipios=['FRANCA'])
+    assert os.path.exists(esperados[0]) and os.path.exists(esperados[2])
+    assert not os.path.exists(esperados[1])
+    assert len(os.listdir(cache)) == 3
+
+
+def test_carregar_dados_reutiliza_cache(tmp_path):
+    limpar_cache()
+    csv = _copiar_csv(tmp_path)
+    cache = str(tmp_path / 'cache')
+    assert carregar_dados(csv, cache) is carregar_dados(csv, cache)
+
+
+def _csv_estadual(tmp_path):
+    # Extrato com outro município intercalado, como no arquivo do estado inteiro
+    data = pd.read_csv('obitos_final.csv', delimiter=';', index_col=0, encoding='utf-8-sig', dtype=str)
+    outro = data.assign(Municipio='RIBEIRAO PRETO', Bairro='Centro')
+    estadual = pd.concat([data, outro]).sort_index(kind='stable').reset_index(drop=True)
+    destino = tmp_path / 'estadual.csv'
+    estadual.to_csv(destino, sep=';', encoding='utf-8-sig')
+    return str(destino)
+
+
+def test_leitura_em_blocos_com_projecao_e_filtros(tmp_path):
+    csv = _csv_estadual(tmp_path)
+    blocos = list(ler_csv_em_blocos(csv, colunas=['Bairro', 'Idade da vitima'], municipios=['FRANCA'], anos=[2021, 2022], linhas_por_bloco=64))
+    assert len(blocos) > 1
+    assert all(len(bloco) <= 64 for bloco in blocos)
+    assert all(set(bloco['Municipio'].cat.categories) == {'FRANCA'} for bloco in blocos)
+
+    data = ler_fonte(csv, colunas=['Bairro', 'Idade da vitima'], municipios=['FRANCA'], anos=[2021, 2022])
+    esperado = ler_csv('obitos_final.csv')
+    esperado = esperado[esperado['Ano'].isin([2021, 2022])]
+    assert list(data.columns) == ['Bairro', 'Idade da vitima']
+    assert len(data) == len(esperado)
+    assert data['Bairro'].astype(str).value_counts().to_dict() == esperado['Bairro'].astype(str).value_counts().to_dict()
+    assert data['Idade da vitima'].dtype == 'Int16'
+    assert ler_fonte(csv, municipios=['SANTOS']).empty
+
+
+def test_carregar_dados_filtrado_por_municipio(tmp_path):
+    limpar_cache()
+    csv = _csv_estadual(tmp_path)
+    cache = str(tmp_path / 'cache')
+    franca = carregar_dados(csv, cache, municipios=['FRANCA'])
+    assert len(franca) == 205
+    assert len(carregar_dados(csv, cache)) == 410
+    assert carregar_dados(csv, cache, municipios=['FRANCA']) is franca
+    assert impressao_digital(csv, ['FRANCA']) != impressao_digital(csv)
+
+
+def test_classificar_turno_vetorizado():
+    horas = pd.Series([0, 5, 6, 11, 12, 17, 18, 23, None])
+    turnos = classificar_turno(horas)
+    assert turnos.tolist() == ['Madrugada', 'Madrugada', 'Manhã', 'Manhã', 'Tarde', 'Tarde', 'Noite', 'Noite', 'Desconhecido']
+    assert classificar_turno(6) == 'Manhã'
+    assert classificar_turno(None) == 'Desconhecido'
+
+
+def test_colunas_derivadas():
+    data = adicionar_colunas_derivadas(ler_csv('obitos_final.csv'))
+    assert data['Dia da Semana'].cat.categories.tolist()[:2] == ['DOMINGO', 'SEGUNDA']
+    assert data['Faixa etaria'].cat.categories.tolist()[0] == '0 A 14'
+    assert data['Faixa etaria'].cat.categories.tolist()[-1] == 'NAO DISPONIVEL'
+    assert (data['Nome do Mes'].cat.codes + 1 == data['Mes do Sinistro']).all()
+    assert data['Turno Calculado'].iloc[0] == 'Noite'
@@ -0,0 +1,32 @@
+from dados import CAMINHO_CSV, adicionar_colunas_derivadas, ler_csv
+from explorador import Explorador, obter_explorador
+
+
+def _dados():
+    return adicionar_colunas_derivadas(ler_csv(CAMINHO_CSV))
+
+
+def test_pagina_ordenada_e_projetada():
+    data = _dados()
+    explorador = Explorador(data)
+    pagina = explorador.pagina(2, 25, colunas=['Ano', 'Nome do Mes', 'Bairro'], ordenar_por='Nome do Mes')
+    esperado = data.sort_values('Nome do Mes', kind='stable').iloc[25:50][['Ano', 'Nome do Mes', 'Bairro']]
+    assert pagina.dados.equals(esperado)
+    assert (pagina.numero, pagina.total_paginas, pagina.total_linhas) == (2, 9, len(data))
+    # Vazios ficam no fim nos dois sentidos; páginas além do fim voltam para a última
+    ultima = explorador.pagina(99, 25, colunas=['Idade da vitima'], ordenar_por='Idade da vitima', crescente=False)
+    assert ultima.numero == 9
+    assert len(ultima.dados) == 5 and ultima.dados['Idade da vitima'].isna().all()
+    primeira = explorador.pagina(1, 25, colunas=['Idade da vitima'], ordenar_por='Idade da vitima', crescente=False)
+    assert primeira.dados['Idade da vitima'].iloc[0] == data['Idade da vitima'].max()
+
+
+def test_busca_nas_colunas_visiveis():
+    data = _dados()
+    explorador = obter_explorador(data, 'v-teste')
+    assert obter_explorador(data, 'v-teste') is explorador
+    pagina = explorador.pagina(1, 250, colunas=['Meio de locomocao da vitima', 'Idade da vitima'], busca='pedest')
+    assert pagina.total_linhas == (data['Meio de locomocao da vitima'] == 'PEDESTRE').sum()
+    por_idade = explorador.pagina(1, 250, colunas=['Idade da vitima'], busca='45')
+    assert por_idade.total_linhas == (data['Idade da vitima'] == 45).sum()
+    assert explorador.pagina(1, 25, colunas=['Bairro'], busca='inexistente').dados.empty
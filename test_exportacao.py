@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+import pytest
+from dados import CAMINHO_CSV, adicionar_colunas_derivadas, ler_csv
+from exportacao import FORMATOS_EXPORTACAO, cabe_no_download, exportar, nome_arquivo
+
+
+def _ler(caminho, id_formato):
+    if id_formato == 'csv.gz':
+        return pd.read_csv(caminho)
+    if id_formato == 'parquet':
+        return pd.read_parquet(caminho)
+    return pd.read_excel(caminho)
+
+
+@pytest.mark.parametrize('id_formato', list(FORMATOS_EXPORTACAO))
+def test_exportacao_em_blocos_sem_indice(tmp_path, id_formato):
+    data = adicionar_colunas_derivadas(ler_csv(CAMINHO_CSV))
+    data = data.loc[data['Ano'] == 2021]
+    caminho = exportar(data, id_formato, 'v1', 2021, str(tmp_path), linhas_por_bloco=7)
+    assert caminho.endswith(FORMATOS_EXPORTACAO[id_formato].extensao)
+    exportado = _ler(caminho, id_formato)
+    assert list(exportado.columns) == list(data.columns)
+    assert len(exportado) == len(data)
+    assert exportado['Bairro'].astype(str).tolist() == data['Bairro'].astype(str).tolist()
+    assert exportado['Idade da vitima'].isna().sum() == data['Idade da vitima'].isna().sum()
+    assert nome_arquivo(id_formato, 2021) == f"obitos_final_2021.{FORMATOS_EXPORTACAO[id_formato].extensao}"
+
+
+def test_arquivo_gerado_uma_vez_por_filtro_e_versao(tmp_path):
+    data = ler_csv(CAMINHO_CSV)
+    diretorio = str(tmp_path)
+    caminho = exportar(data, 'csv.gz', 'v1', None, diretorio)
+    gravado_em = os.stat(caminho).st_mtime_ns
+    assert exportar(data.iloc[:0], 'csv.gz', 'v1', None, diretorio) == caminho
+    assert os.stat(caminho).st_mtime_ns == gravado_em
+    # Uma nova versão do dataset descarta os arquivos da anterior
+    novo = exportar(data, 'csv.gz', 'v2', None, diretorio)
+    assert novo != caminho and not os.path.exists(caminho)
+    assert os.listdir(diretorio) == [os.path.basename(novo)]
+
+
+def test_limite_de_tamanho_do_download(tmp_path):
+    caminho = exportar(ler_csv(CAMINHO_CSV), 'csv.gz', 'v1', None, str(tmp_path))
+    tamanho = os.path.getsize(caminho)
+    assert cabe_no_download(caminho)
+    assert cabe_no_download(caminho, maximo=tamanho)
+    assert not cabe_no_download(caminho, maximo=tamanho - 1)
@@ -0,0 +1,34 @@
+import numpy as np
+from dados import CAMINHO_CSV, carregar_dados
+from filtros import IndiceFiltros, criar_filtro, rotulo_filtro
+
+
+def test_combinacao_de_bitmaps_equivale_as_mascaras():
+    data = carregar_dados(CAMINHO_CSV, municipios=['FRANCA'])
+    indice = IndiceFiltros(data)
+    filtro = criar_filtro((2020, 2022), {
+        'Tipo de vitima': ['PEDESTRE', 'CONDUTOR'],
+        'Tipo de Via': ['VIAS MUNICIPAIS'],
+        'Bairro': [],
+    })
+    esperado = data[
+        data['Ano'].between(2020, 2022)
+        & data['Tipo de vitima'].isin(['PEDESTRE', 'CONDUTOR'])
+        & (data['Tipo de Via'] == 'VIAS MUNICIPAIS')
+    ]
+    assert indice.filtrar(data, filtro).index.equals(esperado.index)
+    assert indice.posicoes(filtro) is indice.posicoes(filtro)
+    # Sem restrições, o próprio DataFrame; valor inexistente, nenhuma linha
+    assert indice.filtrar(data, criar_filtro()) is data
+    assert len(indice.filtrar(data, criar_filtro(selecoes={'Bairro': ['Inexistente']}))) == 0
+    assert indice.valores('Ano') == sorted(int(ano) for ano in data['Ano'].unique())
+    assert len(np.unpackbits(indice.bits(criar_filtro()))) >= len(data)
+
+
+def test_filtro_normalizado_e_rotulo():
+    filtro = criar_filtro((2021, 2021), {'Tipo de Via': ['B', 'A'], 'Bairro': ['Centro'], 'Sexo': []})
+    assert filtro == criar_filtro([2021, 2021], {'Bairro': ['Centro'], 'Tipo de Via': ['A', 'B']})
+    assert filtro.valores == (('Bairro', ('Centro',)), ('Tipo de Via', ('A', 'B')))
+    assert rotulo_filtro(filtro).startswith('2021_')
+    assert rotulo_filtro(criar_filtro((2019, 2021))) == '2019-2021'
+    assert rotulo_filtro(criar_filtro()) is None
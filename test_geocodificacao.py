@@ -0,0 +1,200 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+import pytest
+import geocodificacao
+from geocodificacao import (
+    CacheGeocodificacao,
+    ErroGeocodificacao,
+    Geocodificador,
+    PoligonosBairros,
+    ResolvedorOffline,
+    distancia_metros,
+    geocodificar_lote,
+    preencher_enderecos,
+)
+
+
+def _resultado(bairro, logradouro):
+    return {'status': 'OK', 'results': [{'address_components': [
+        {'long_name': logradouro, 'types': ['route']},
+        {'long_name': bairro, 'types': ['political', 'sublocality', 'sublocality_level_1']},
+    ]}]}
+
+
+class StubGeocoder(BaseHTTPRequestHandler):
+    # Quantas vezes responder OVER_QUERY_LIMIT antes de responder normalmente
+    limite_excedido = 0
+    consultas = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        latlng = parse_qs(urlparse(self.path).query)['latlng'][0]
+        with self.lock:
+            self.consultas.append(latlng)
+            if StubGeocoder.limite_excedido:
+                StubGeocoder.limite_excedido -= 1
+                resposta = {'status': 'OVER_QUERY_LIMIT', 'results': []}
+            elif latlng.startswith('0'):
+                resposta = {'status': 'ZERO_RESULTS', 'results': []}
+            else:
+                resposta = _resultado(f"Bairro {latlng}", f"Rua {latlng}")
+        dados = json.dumps(resposta).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def geocodificador():
+    StubGeocoder.limite_excedido = 0
+    StubGeocoder.consultas = []
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoder)
+    threading.Thread(target=servidor.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield Geocodificador('chave', url=f"http://127.0.0.1:{servidor.server_address[1]}/geocode/json",
+                         requisicoes_por_segundo=0, dormir=lambda segundos: None)
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_consulta_repete_em_over_query_limit(geocodificador):
+    StubGeocoder.limite_excedido = 2
+    assert geocodificador.consultar(-20.5, -47.4) == ('Bairro -20.5,-47.4', 'Rua -20.5,-47.4')
+    assert len(StubGeocoder.consultas) == 3
+
+
+def test_consulta_desiste_apos_tentativas(geocodificador):
+    StubGeocoder.limite_excedido = 10
+    with pytest.raises(ErroGeocodificacao):
+        geocodificador.consultar(-20.5, -47.4)
+    assert len(StubGeocoder.consultas) == geocodificador.max_tentativas
+
+
+def test_lote_usa_cache_por_coordenada_arredondada(geocodificador, tmp_path):
+    cache = CacheGeocodificacao(str(tmp_path / 'geo.sqlite3'))
+    coordenadas = [(-20.502819, -47.408766), (-20.5028191, -47.4087661), (-20.514448, -47.405666), (0.0, 0.0)]
+    resultados, falhas = geocodificar_lote(coordenadas, geocodificador, cache, max_trabalhadores=4)
+    assert falhas == []
+    assert len(StubGeocoder.consultas) == 3
+    assert resultados[(-20.50282, -47.40877)] == ('Bairro -20.50282,-47.40877', 'Rua -20.50282,-47.40877')
+    assert resultados[(0.0, 0.0)] == (None, None)
+
+    StubGeocoder.consultas = []
+    geocodificar_lote(coordenadas + [(-20.6, -47.5)], geocodificador, CacheGeocodificacao(str(tmp_path / 'geo.sqlite3')))
+    assert StubGeocoder.consultas == ['-20.6,-47.5']
+
+
+def test_preencher_enderecos_apenas_faltantes(geocodificador, tmp_path):
+    data = pd.DataFrame({
+        'Latitude': ['-20,502819', '-20,514448', None],
+        'Longitude': ['-47,408766', '-47,405666', None],
+        'Bairro': ['Bairro não identificado', 'Vila Imperador', 'Bairro não identificado'],
+        'Logradouro': ['NAO DISPONIVEL', 'AVENIDA CHICO JULIO', 'NAO DISPONIVEL'],
+    })
+    preenchido, falhas = preencher_enderecos(data, geocodificador, CacheGeocodificacao(str(tmp_path / 'geo.sqlite3')))
+    assert falhas == []
+    assert StubGeocoder.consultas == ['-20.50282,-47.40877']
+    assert preenchido['Bairro'].tolist() == ['Bairro -20.50282,-47.40877', 'Vila Imperador', 'Bairro não identificado']
+    assert preenchido['Logradouro'].tolist()[0] == 'RUA -20.50282,-47.40877'
+    assert data['Bairro'].iloc[0] == 'Bairro não identificado'
+
+
+def test_resolvedor_offline_igual_a_busca_exaustiva():
+    gerador = np.random.default_rng(0)
+    latitudes = -20.5 + gerador.normal(0, 0.02, 500)
+    longitudes = -47.4 + gerador.normal(0, 0.02, 500)
+    resolvedor = ResolvedorOffline(latitudes, longitudes, [f"B{i}" for i in range(500)], [f"R{i}" for i in range(500)])
+    for latitude, longitude in zip(-20.5 + gerador.normal(0, 0.02, 50), -47.4 + gerador.normal(0, 0.02, 50)):
+        distancias = distancia_metros(latitude, longitude, latitudes, longitudes)
+        indice, distancia = resolvedor.vizinho_mais_proximo(latitude, longitude)
+        if distancias.min() <= resolvedor.distancia_bairro:
+            assert indice == int(np.argmin(distancias))
+            assert distancia == pytest.approx(distancias.min())
+        else:
+            assert indice is None
+
+
+def test_resolvedor_offline_usa_api_so_sem_confianca(geocodificador):
+    data = pd.DataFrame({
+        'Latitude': ['-20,502819', '-20,514448', None],
+        'Longitude': ['-47,408766', '-47,405666', None],
+        'Bairro': ['São Miguel', 'Vila Imperador', 'Bairro não identificado'],
+        'Logradouro': ['AVENIDA DOUTOR ABRAAO BRICKMAN', 'NAO DISPONIVEL', 'NAO DISPONIVEL'],
+    })
+    resolvedor = ResolvedorOffline.de_dataframe(data)
+    assert resolvedor.resolver(-20.50285, -47.40877) == ('São Miguel', 'AVENIDA DOUTOR ABRAAO BRICKMAN', pytest.approx(3.4, abs=0.5), 'indice')
+    assert resolvedor.resolver(-20.5135, -47.4057).bairro == 'Vila Imperador'
+    assert resolvedor.resolver(-20.5135, -47.4057).logradouro is None
+    assert StubGeocoder.consultas == []
+    assert resolvedor.resolver(-20.6, -47.5, geocodificador) == ('Bairro -20.6,-47.5', 'Rua -20.6,-47.5', None, 'api')
+    assert StubGeocoder.consultas == ['-20.6,-47.5']
+
+
+def test_resolvedor_com_poligonos(tmp_path):
+    quadrado = [[-47.41, -20.51], [-47.40, -20.51], [-47.40, -20.50], [-47.41, -20.50], [-47.41, -20.51]]
+    buraco = [[-47.406, -20.506], [-47.404, -20.506], [-47.404, -20.504], [-47.406, -20.504], [-47.406, -20.506]]
+    geojson = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'bairro': 'Centro'}, 'geometry': {'type': 'Polygon', 'coordinates': [quadrado, buraco]}},
+    ]}
+    caminho = tmp_path / 'bairros.geojson'
+    caminho.write_text(json.dumps(geojson), encoding='utf-8')
+    resolvedor = ResolvedorOffline([], [], [], [], poligonos=PoligonosBairros(str(caminho)))
+    assert resolvedor.resolver(-20.508, -47.408) == ('Centro', None, 0.0, 'poligono')
+    assert resolvedor.resolver(-20.505, -47.405).fonte is None
+    assert resolvedor.resolver(-20.52, -47.408).fonte is None
+
+
+def test_preencher_enderecos_offline(tmp_path):
+    data = pd.DataFrame({
+        'Latitude': ['-20,502819', '-20,502830', '-21,0'],
+        'Longitude': ['-47,408766', '-47,408770', '-47,0'],
+        'Bairro': ['São Miguel', 'Bairro não identificado', 'Bairro não identificado'],
+        'Logradouro': ['AVENIDA DOUTOR ABRAAO BRICKMAN', 'NAO DISPONIVEL', 'NAO DISPONIVEL'],
+    })
+    preenchido, falhas = preencher_enderecos(data, None, CacheGeocodificacao(str(tmp_path / 'geo.sqlite3')),
+                                             resolvedor=ResolvedorOffline.de_dataframe(data))
+    assert preenchido['Bairro'].tolist() == ['São Miguel', 'São Miguel', 'Bairro não identificado']
+    assert preenchido['Logradouro'].tolist()[1] == 'AVENIDA DOUTOR ABRAAO BRICKMAN'
+    assert falhas == [(-21.0, -47.0)]
+
+
+def test_preencher_enderecos_completa_resultado_local_com_api(geocodificador, tmp_path):
+    # A linha só não tem logradouro: o ponto conhecido dela mesma dá o bairro, mas não o logradouro
+    data = pd.DataFrame({
+        'Latitude': ['-20,514448'],
+        'Longitude': ['-47,405666'],
+        'Bairro': ['Vila Imperador'],
+        'Logradouro': ['NAO DISPONIVEL'],
+    })
+    preenchido, falhas = preencher_enderecos(data, geocodificador, CacheGeocodificacao(str(tmp_path / 'geo.sqlite3')),
+                                             resolvedor=ResolvedorOffline.de_dataframe(data))
+    assert falhas == []
+    assert StubGeocoder.consultas == ['-20.51445,-47.40567']
+    assert preenchido['Bairro'].tolist() == ['Vila Imperador']
+    assert preenchido['Logradouro'].tolist() == ['RUA -20.51445,-47.40567']
+
+
+def test_main_todas_consulta_a_api_para_pontos_rotulados(geocodificador, tmp_path, monkeypatch):
+    entrada = tmp_path / 'extrato.csv'
+    pd.DataFrame({
+        'Latitude': ['-20,502819', '-20,514448'],
+        'Longitude': ['-47,408766', '-47,405666'],
+        'Bairro': ['São Miguel', 'Vila Imperador'],
+        'Logradouro': ['AVENIDA DOUTOR ABRAAO BRICKMAN', 'AVENIDA CHICO JULIO'],
+    }).to_csv(entrada, sep=';')
+    monkeypatch.setattr(geocodificacao, 'Geocodificador', lambda chave, requisicoes_por_segundo: geocodificador)
+    monkeypatch.setattr(geocodificacao, 'CacheGeocodificacao', lambda: CacheGeocodificacao(str(tmp_path / 'geo.sqlite3')))
+    monkeypatch.setattr('sys.argv', ['geocodificacao.py', str(entrada), '--todas'])
+    geocodificacao.main()
+
+    assert sorted(StubGeocoder.consultas) == ['-20.50282,-47.40877', '-20.51445,-47.40567']
+    saida = pd.read_csv(entrada, delimiter=';', index_col=0)
+    assert saida['Bairro'].tolist() == ['Bairro -20.50282,-47.40877', 'Bairro -20.51445,-47.40567']
@@ -0,0 +1,56 @@
+import pandas as pd
+import graficos
+from agregados import Cubo
+from graficos import GRAFICOS, limpar_cache_figuras, obter_figura
+
+
+def _cubo():
+    return Cubo.construir(pd.DataFrame({
+        'Ano': [2020, 2020, 2021],
+        'Tipo de Sinistro': pd.Categorical(['CHOQUE', 'ATROPELAMENTO', 'CHOQUE']),
+        'Bairro': pd.Categorical(['Centro', 'Bairro não identificado', 'Bairro não identificado']),
+    }))
+
+
+def test_figura_reaproveitada_por_grafico_filtro_e_versao():
+    limpar_cache_figuras()
+    cubo = _cubo()
+    figura = obter_figura('obitos_por_tipo_sinistro', cubo, 'v1', 2020)
+    assert len(graficos._figuras) == 1
+    assert obter_figura('obitos_por_tipo_sinistro', cubo, 'v1', 2020) == figura
+    assert len(graficos._figuras) == 1
+    assert obter_figura('obitos_por_tipo_sinistro', cubo, 'v1', 2021) != figura
+    assert obter_figura('obitos_por_tipo_sinistro', cubo, 'v2', 2020) == figura
+    assert len(graficos._figuras) == 3
+    assert list(figura.data[0].x) == ['ATROPELAMENTO', 'CHOQUE']
+    # Sem bairros identificados no ano, o gráfico não é montado
+    assert obter_figura('top3_bairros', cubo, 'v1', 2021) is None
+    assert obter_figura('top3_bairros', cubo, 'v1', 2020) is not None
+
+
+def test_cache_de_figuras_descarta_a_menos_usada(monkeypatch):
+    limpar_cache_figuras()
+    monkeypatch.setattr(graficos._figuras, 'maximo', 2)
+    montadas = []
+    monkeypatch.setitem(GRAFICOS, 'teste', lambda cubo, ano: montadas.append(ano))
+    cubo = _cubo()
+    obter_figura('teste', cubo, 'v1', 2019)
+    obter_figura('teste', cubo, 'v1', 2020)
+    obter_figura('teste', cubo, 'v1', 2019)
+    obter_figura('teste', cubo, 'v1', 2021)
+    assert montadas == [2019, 2020, 2021]
+    obter_figura('teste', cubo, 'v1', 2019)
+    obter_figura('teste', cubo, 'v1', 2020)
+    assert montadas == [2019, 2020, 2021, 2020]
+
+
+def test_figura_modificada_em_uma_sessao_nao_muda_a_de_outra():
+    limpar_cache_figuras()
+    cubo = _cubo()
+    figura = obter_figura('obitos_por_tipo_sinistro', cubo, 'v1', 2020)
+    figura.update_layout(title_text='Alterado por outra sessão')
+    figura.data[0].x = ['X']
+    outra = obter_figura('obitos_por_tipo_sinistro', cubo, 'v1', 2020)
+    assert outra is not figura
+    assert outra.layout.title.text != 'Alterado por outra sessão'
+    assert list(outra.data[0].x) == ['ATROPELAMENTO', 'CHOQUE']
@@ -0,0 +1,44 @@
+import pytest
+from agregados import Cubo
+from dados import CAMINHO_CSV, carregar_dados
+from kpis import KPIS, TabelaKpis, periodo_anterior
+
+
+def test_tabela_equivale_as_contagens_por_ano():
+    data = carregar_dados(CAMINHO_CSV, municipios=['FRANCA'])
+    tabela = TabelaKpis.construir(Cubo.construir(data))
+    assert list(tabela.tabela.columns) == list(KPIS)
+    for ano in tabela.tabela.index:
+        do_ano = data[data['Ano'] == ano]
+        assert tabela.valor('total_obitos', ano) == len(do_ano)
+        assert tabela.valor('motoristas_condutores', ano) == do_ano['Tipo de vitima'].isin(['CONDUTOR', 'PASSAGEIRO']).sum()
+        assert tabela.valor('pedestres', ano) == (do_ano['Meio de locomocao da vitima'] == 'PEDESTRE').sum()
+    assert tabela.valor('total_obitos') == len(data)
+    assert tabela.valor('total_obitos', (2020, 2021)) == data['Ano'].isin([2020, 2021]).sum()
+
+
+def test_variacoes_e_tendencia():
+    data = carregar_dados(CAMINHO_CSV, municipios=['FRANCA'])
+    # Só 2021 e 2023 com óbitos no filtro: 2019, 2020 e 2022 entram com zero
+    filtrado = data[data['Ano'].isin([2021, 2023])]
+    tabela = TabelaKpis.construir(Cubo.construir(filtrado), anos=[2019, 2020, 2021, 2022, 2023])
+    assert tabela.valor('total_obitos', 2022) == 0
+    assert tabela.delta('total_obitos', 2023, 2022) == tabela.valor('total_obitos', 2023)
+    assert tabela.variacao_percentual('total_obitos', 2023, 2022) is None
+    assert tabela.variacao_percentual('total_obitos', 2021, 2020) is None
+    serie = tabela.serie('total_obitos')
+    assert tabela.tendencia('total_obitos') == pytest.approx(((serie.index - 2021) * (serie - serie.mean())).sum() / 10)
+    assert tabela.tendencia('total_obitos', 2021) is None
+
+
+def test_periodo_anterior():
+    anos = [2019, 2020, 2021, 2022, 2023]
+    assert periodo_anterior(2021, anos) == 2020
+    assert periodo_anterior(2019, anos) is None
+    assert periodo_anterior((2022, 2023), anos) == (2020, 2021)
+    assert periodo_anterior((2020, 2021, 2022), anos) is None
+    assert periodo_anterior(None, anos) is None
+    # Anos disponíveis com lacuna (sem 2018 e 2021): o período anterior recua o intervalo inteiro
+    com_lacuna = [2016, 2017, 2019, 2020, 2022]
+    assert periodo_anterior((2020, 2022), com_lacuna) == (2017, 2019)
+    assert periodo_anterior((2019, 2020, 2022), com_lacuna) is None
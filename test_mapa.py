@@ -0,0 +1,41 @@
+import numpy as np
+from dados import CAMINHO_CSV, ler_csv
+import mapa as mapa_modulo
+from mapa import agregar_em_grade, limpar_cache_mapas, obter_mapa, tamanho_celula
+
+
+def test_grade_soma_os_pontos_com_coordenadas():
+    data = ler_csv(CAMINHO_CSV)
+    com_coordenadas = int((data['Latitude'].notna() & data['Longitude'].notna()).sum())
+    detalhada = agregar_em_grade(data['Latitude'], data['Longitude'], 16)
+    geral = agregar_em_grade(data['Latitude'], data['Longitude'], 10)
+    assert detalhada['Quantidade'].sum() == geral['Quantidade'].sum() == com_coordenadas
+    # Zoom menor, células maiores: menos pontos enviados ao navegador
+    assert len(geral) < len(detalhada) <= com_coordenadas
+    assert geral['Quantidade'].is_monotonic_decreasing
+    assert agregar_em_grade([np.nan], [np.nan], 12).empty
+
+
+def test_pontos_na_mesma_celula_viram_um_so():
+    lado_latitude, lado_longitude = tamanho_celula(12, -20.5)
+    base_latitude = (np.floor(-20.5 / lado_latitude) + 0.5) * lado_latitude
+    base_longitude = (np.floor(-47.4 / lado_longitude) + 0.5) * lado_longitude
+    grade = agregar_em_grade(
+        [base_latitude, base_latitude + lado_latitude / 10, base_latitude + 3 * lado_latitude],
+        [base_longitude, base_longitude, base_longitude],
+        12,
+    )
+    assert grade['Quantidade'].tolist() == [2, 1]
+    assert np.isclose(grade['Latitude'].iloc[0], base_latitude + lado_latitude / 20)
+
+
+def test_mapa_reaproveitado_por_filtro_e_zoom():
+    limpar_cache_mapas()
+    data = ler_csv(CAMINHO_CSV)
+    mapa = obter_mapa(data, 'v1', None, 12)
+    outro = obter_mapa(data, 'v1', None, 12)
+    assert outro is not mapa and outro == mapa
+    assert len(mapa_modulo._mapas) == 1
+    assert obter_mapa(data, 'v1', None, 14) != mapa
+    assert sum(mapa.data[0].marker.size) == int(data['Latitude'].notna().sum())
+    assert obter_mapa(data.iloc[:0], 'v1', 2030, 12) is None
@@ -0,0 +1,56 @@
+import json
+import pytest
+from metricas import Metricas
+
+
+def test_tempos_e_percentis():
+    instantes = iter([0.0, 0.5, 1.0, 3.0])
+    metricas = Metricas(relogio=lambda: next(instantes))
+    with metricas.medir('secao'):
+        pass
+
+    @metricas.medir('secao')
+    def falhar():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        falhar()
+    for segundos in (1.0, 4.0):
+        metricas.registrar_tempo('secao', segundos)
+    resumo = metricas.tempos()['secao']
+    assert resumo['quantidade'] == 4
+    assert resumo['soma'] == pytest.approx(7.5)
+    assert resumo['ultima'] == 4.0
+    assert resumo['p50'] == pytest.approx(1.5)
+    assert resumo['p99'] == pytest.approx(3.94)
+
+
+def test_amostras_limitadas_mas_contagem_total():
+    metricas = Metricas(max_amostras=3)
+    for segundos in range(10):
+        metricas.registrar_tempo('secao', float(segundos))
+    resumo = metricas.tempos()['secao']
+    assert resumo['quantidade'] == 10
+    assert resumo['p50'] == 8.0
+
+
+def test_exportacao_jsonl_e_prometheus(tmp_path):
+    metricas = Metricas()
+    metricas.registrar_tempo('grafico:obitos_por_mes', 0.25)
+    metricas.contar('cache_figuras_acertos')
+    metricas.contar('cache_figuras_acertos', 2)
+
+    linhas = [json.loads(linha) for linha in metricas.linhas_jsonl(momento=1.0).splitlines()]
+    assert linhas[0]['tipo'] == 'tempo' and linhas[0]['nome'] == 'grafico:obitos_por_mes' and linhas[0]['p90'] == 0.25
+    assert linhas[1] == {'momento': 1.0, 'tipo': 'contador', 'nome': 'cache_figuras_acertos', 'valor': 3}
+
+    caminho = tmp_path / 'metricas.jsonl'
+    metricas.exportar_jsonl(str(caminho))
+    metricas.exportar_jsonl(str(caminho))
+    assert len(caminho.read_text(encoding='utf-8').splitlines()) == 4
+
+    texto = metricas.texto_prometheus()
+    assert '# TYPE infosiga_duracao_segundos summary' in texto
+    assert 'infosiga_duracao_segundos{secao="grafico:obitos_por_mes",quantile="0.99"} 0.25' in texto
+    assert 'infosiga_duracao_segundos_count{secao="grafico:obitos_por_mes"} 1' in texto
+    assert 'infosiga_cache_figuras_acertos_total 3' in texto
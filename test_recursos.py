@@ -0,0 +1,39 @@
+import os
+from PIL import Image
+from recursos import carregar_variaveis_ambiente, miniatura
+
+
+def test_miniatura_gerada_uma_vez(tmp_path):
+    original = tmp_path / 'escudo.png'
+    Image.new('RGB', (1200, 1400), 'red').save(original)
+    diretorio = str(tmp_path / 'miniaturas')
+
+    caminho = miniatura(str(original), 320, diretorio)
+    with Image.open(caminho) as imagem:
+        assert imagem.size == (320, 373)
+    gravada_em = os.stat(caminho).st_mtime_ns
+    assert miniatura(str(original), 320, diretorio) == caminho
+    assert os.stat(caminho).st_mtime_ns == gravada_em
+
+    # Imagem substituída: nova miniatura, e a antiga é descartada
+    Image.new('RGB', (640, 480), 'blue').save(original)
+    os.utime(original, ns=(gravada_em + 10**9, gravada_em + 10**9))
+    nova = miniatura(str(original), 320, diretorio)
+    assert nova != caminho and os.listdir(diretorio) == [os.path.basename(nova)]
+    # Imagem ausente (ex.: fora do repositório) não quebra a página
+    assert miniatura(str(tmp_path / 'inexistente.png'), 320, diretorio) is None
+
+
+def test_variaveis_ambiente_carregadas_uma_vez(tmp_path, monkeypatch):
+    import recursos
+
+    monkeypatch.setattr(recursos, '_ambiente_carregado', False)
+    monkeypatch.delenv('INFOSIGA_TESTE_ENV', raising=False)
+    arquivo = tmp_path / '.env'
+    arquivo.write_text('INFOSIGA_TESTE_ENV=1\n', encoding='utf-8')
+    carregar_variaveis_ambiente(str(arquivo))
+    assert os.environ['INFOSIGA_TESTE_ENV'] == '1'
+    arquivo.write_text('INFOSIGA_TESTE_ENV=2\n', encoding='utf-8')
+    monkeypatch.delenv('INFOSIGA_TESTE_ENV')
+    carregar_variaveis_ambiente(str(arquivo))
+    assert 'INFOSIGA_TESTE_ENV' not in os.environ
@@ -0,0 +1,50 @@
+from contextos import pergunta_para_funcao
+from dados import CAMINHO_CSV, carregar_dados
+from roteamento import INSTRUCAO, estimar_tokens, montar_prompt, rotear
+
+
+def test_rotear_perguntas_do_catalogo_e_parafrases():
+    for pergunta in pergunta_para_funcao:
+        assert rotear(pergunta) == [pergunta]
+    assert rotear("Homens ou mulheres morrem mais?")[0] == "Qual o sexo com mais acidentes?"
+    assert rotear("Em que horas acontecem mais mortes?")[0] == "Qual o horário com mais óbitos?"
+    assert rotear("Onde morrem mais pessoas?")[0] == "Em qual bairro ocorreram mais óbitos?"
+    # Pergunta com dois assuntos: os dois contextos, do mais ao menos parecido
+    assert set(rotear("Quantos pedestres morreram à noite?")) == {
+        "Qual a proporção de óbitos por tipo de vítima (condutor, passageiro, pedestre)?",
+        "Qual o período do dia com mais óbitos?",
+    }
+    assert rotear("xyzzy blorp") == []
+    assert rotear("Qual o melhor time de futebol?") == []
+
+
+def test_montar_prompt_dentro_do_orcamento():
+    data = carregar_dados(CAMINHO_CSV, municipios=['FRANCA'])
+    pergunta = "Qual o bairro mais perigoso?"
+    assert montar_prompt("xyzzy blorp", data) is None
+
+    # Pergunta do catálogo: o mesmo prompt de antes do roteamento (as respostas em cache continuam valendo)
+    catalogo = "Qual o sexo com mais acidentes?"
+    contexto = pergunta_para_funcao[catalogo](data)
+    assert montar_prompt(catalogo, data) == f"{contexto}\n\n{INSTRUCAO}\n{catalogo}\nResposta:"
+
+    rotas = rotear(pergunta)
+    prompt = montar_prompt(pergunta, data, rotas)
+    assert prompt.startswith(pergunta_para_funcao[rotas[0]](data))
+    assert prompt.endswith(f"{INSTRUCAO}\n{pergunta}\nResposta:")
+    for orcamento in (600, 120, 40):
+        assert estimar_tokens(montar_prompt(pergunta, data, rotas, orcamento_tokens=orcamento)) <= orcamento
+
+
+def test_pergunta_livre_sobre_outro_ano():
+    data = carregar_dados(CAMINHO_CSV, municipios=['FRANCA'])
+    pergunta = "Quantos óbitos em 2022?"
+    rotas = rotear(pergunta)
+    assert rotas[0] == "Quantos óbitos ocorreram em 2021?"
+    prompt = montar_prompt(pergunta, data, rotas)
+    assert f"No ano de 2022, ocorreram {int((data['Ano'] == 2022).sum())} óbitos em Franca." in prompt
+    assert "2021, ocorreram" not in prompt
+
+    comparacao = montar_prompt("Como foi 2020 comparado a 2021?", data)
+    assert "No ano de 2020" in comparacao and "No ano de 2021" in comparacao
+    assert "não incluem o ano de 2015" in montar_prompt("Quantos óbitos em 2015?", data)
@@ -0,0 +1,42 @@
+import filecmp
+import pandas as pd
+from dados import CAMINHO_CSV, ler_csv
+from sintetico import gerar_extrato_sintetico
+
+
+def test_mesma_semente_gera_o_mesmo_extrato(tmp_path):
+    primeiro = gerar_extrato_sintetico(str(tmp_path / 'a.csv'), 1_000, semente=7, linhas_por_bloco=300)
+    segundo = gerar_extrato_sintetico(str(tmp_path / 'b.csv'), 1_000, semente=7, linhas_por_bloco=300)
+    outro = gerar_extrato_sintetico(str(tmp_path / 'c.csv'), 1_000, semente=8, linhas_por_bloco=300)
+    assert filecmp.cmp(primeiro, segundo, shallow=False)
+    assert not filecmp.cmp(primeiro, outro, shallow=False)
+
+
+def test_extrato_sintetico_preserva_esquema_e_distribuicoes(tmp_path):
+    real = ler_csv(CAMINHO_CSV)
+    sintetico = ler_csv(gerar_extrato_sintetico(str(tmp_path / 'sintetico.csv'), 20_000, linhas_por_bloco=6_000))
+    assert list(sintetico.columns) == list(real.columns)
+    assert (sintetico.dtypes == real.dtypes).all()
+    assert sintetico.index.tolist() == list(range(20_000))
+
+    for coluna, sentinela in [('Bairro', 'Bairro não identificado'), ('Turno', 'NAO DISPONIVEL'), ('Outro Veiculo Envolvido', 'NAO DISPONIVEL')]:
+        assert abs((sintetico[coluna] == sentinela).mean() - (real[coluna] == sentinela).mean()) < 0.02, coluna
+    proporcao_anos = sintetico['Ano'].value_counts(normalize=True)
+    assert (proporcao_anos - real['Ano'].value_counts(normalize=True)).abs().max() < 0.02
+    # Dependência entre grupos: atropelamentos continuam sendo quase todos de pedestres
+    atropelamentos = sintetico[sintetico['Tipo de Sinistro'] == 'ATROPELAMENTO']
+    assert (atropelamentos['Meio de locomocao da vitima'] == 'PEDESTRE').mean() > 0.8
+
+    # Colunas derivadas coerentes com o dia sorteado
+    datas = pd.to_datetime(sintetico['Data do Sinistro'])
+    assert (datas.dt.day == sintetico['Dia do Sinistro']).all()
+    assert (datas.dt.month == sintetico['Mes do Sinistro']).all()
+    assert (sintetico['Ano do Sinistro'] == sintetico['Ano']).all()
+
+
+def test_extrato_sintetico_em_parquet(tmp_path):
+    caminho = gerar_extrato_sintetico(str(tmp_path / 'sintetico.parquet'), 5_000, linhas_por_bloco=2_000)
+    data = pd.read_parquet(caminho)
+    assert len(data) == 5_000
+    assert data['Latitude'].dtype == 'float64'
+    assert data['Idade da vitima'].isna().any()